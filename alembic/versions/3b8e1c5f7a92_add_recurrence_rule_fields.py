@@ -0,0 +1,30 @@
+"""Add RRULE-style fields to recurring_appointments
+
+Revision ID: 3b8e1c5f7a92
+Revises: fd0938d90ac8
+Create Date: 2026-10-17 15:20:11.604183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e1c5f7a92'
+down_revision: Union[str, None] = 'fd0938d90ac8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('recurring_appointments', sa.Column('by_weekday', sa.JSON(), nullable=True))
+    op.add_column('recurring_appointments', sa.Column('by_month_day', sa.JSON(), nullable=True))
+    op.add_column('recurring_appointments', sa.Column('exception_dates', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('recurring_appointments', 'exception_dates')
+    op.drop_column('recurring_appointments', 'by_month_day')
+    op.drop_column('recurring_appointments', 'by_weekday')
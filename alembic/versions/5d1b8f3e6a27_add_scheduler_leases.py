@@ -0,0 +1,33 @@
+"""Add scheduler_leases for scheduler leader election
+
+Revision ID: 5d1b8f3e6a27
+Revises: c2e7a4b90d15
+Create Date: 2026-10-17 17:31:44.902815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1b8f3e6a27'
+down_revision: Union[str, None] = 'c2e7a4b90d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('holder', sa.String(), nullable=False),
+        sa.Column('acquired_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scheduler_leases')
@@ -0,0 +1,73 @@
+"""Add tenant_daily_stats rollup table
+
+Revision ID: 60d144a212de
+Revises: d5d9530d98c2
+Create Date: 2026-10-17 11:20:42.518337
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '60d144a212de'
+down_revision: Union[str, None] = 'd5d9530d98c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tenant_daily_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('scheduled_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cancelled_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('no_show_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_duration_minutes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('new_patients', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'day', name='uq_tenant_daily_stats_tenant_id_day')
+    )
+    op.create_index(op.f('ix_tenant_daily_stats_id'), 'tenant_daily_stats', ['id'], unique=False)
+
+    # Backfill from existing data (date() works on both PostgreSQL and SQLite)
+    op.execute(
+        "INSERT INTO tenant_daily_stats "
+        "(tenant_id, day, scheduled_count, completed_count, cancelled_count, no_show_count, "
+        "completed_duration_minutes, new_patients) "
+        "SELECT tenant_id, day, SUM(s), SUM(c), SUM(x), SUM(n), SUM(d), SUM(p) FROM ("
+        "  SELECT tenant_id, date(appointment_time) AS day, "
+        "    CASE WHEN status = 'scheduled' THEN 1 ELSE 0 END AS s, "
+        "    CASE WHEN status = 'completed' THEN 1 ELSE 0 END AS c, "
+        "    CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END AS x, "
+        "    CASE WHEN status = 'no_show' THEN 1 ELSE 0 END AS n, "
+        "    CASE WHEN status = 'completed' THEN COALESCE(duration_minutes, 30) ELSE 0 END AS d, "
+        "    0 AS p "
+        "  FROM appointments "
+        "  UNION ALL "
+        "  SELECT tenant_id, date(created_at), 0, 0, 0, 0, 0, 1 "
+        "  FROM patients WHERE created_at IS NOT NULL"
+        ") AS daily GROUP BY tenant_id, day"
+    )
+
+    # Each tenant's all-time totals row (app.models.tenant_daily_stats.TOTALS_DAY)
+    op.execute(sa.text(
+        "INSERT INTO tenant_daily_stats "
+        "(tenant_id, day, scheduled_count, completed_count, cancelled_count, no_show_count, "
+        "completed_duration_minutes, new_patients) "
+        "SELECT tenant_id, :totals_day, SUM(scheduled_count), SUM(completed_count), SUM(cancelled_count), "
+        "SUM(no_show_count), SUM(completed_duration_minutes), SUM(new_patients) "
+        "FROM tenant_daily_stats GROUP BY tenant_id"
+    ).bindparams(sa.bindparam("totals_day", date(1, 1, 1), type_=sa.Date)))
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tenant_daily_stats_id'), table_name='tenant_daily_stats')
+    op.drop_table('tenant_daily_stats')
@@ -0,0 +1,27 @@
+"""Add substitutions to email_outbox for batched SendGrid sends
+
+Revision ID: 7b3f5e9a2c41
+Revises: e4a9c7d2b168
+Create Date: 2026-10-17 19:02:51.733608
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3f5e9a2c41'
+down_revision: Union[str, None] = 'e4a9c7d2b168'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rows queued before this are sent one by one, as before
+    op.add_column('email_outbox', sa.Column('substitutions', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('email_outbox', 'substitutions')
@@ -0,0 +1,44 @@
+"""Add keyset pagination indexes
+
+Revision ID: 7e4d03d70836
+Revises: 60d144a212de
+Create Date: 2026-10-17 12:05:17.903244
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4d03d70836'
+down_revision: Union[str, None] = '60d144a212de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (tenant_id, appointment_time, id) also covers everything the old
+    # (tenant_id, appointment_time) index served
+    op.create_index(
+        'ix_appointments_tenant_id_appointment_time_id',
+        'appointments',
+        ['tenant_id', 'appointment_time', 'id'],
+        unique=False
+    )
+    op.drop_index('ix_appointments_tenant_id_appointment_time', table_name='appointments')
+
+    op.create_index('ix_patients_tenant_id_id', 'patients', ['tenant_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_patients_tenant_id_id', table_name='patients')
+
+    op.create_index(
+        'ix_appointments_tenant_id_appointment_time',
+        'appointments',
+        ['tenant_id', 'appointment_time'],
+        unique=False
+    )
+    op.drop_index('ix_appointments_tenant_id_appointment_time_id', table_name='appointments')
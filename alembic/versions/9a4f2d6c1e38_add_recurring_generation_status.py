@@ -0,0 +1,46 @@
+"""Track background generation of recurring appointment templates
+
+Revision ID: 9a4f2d6c1e38
+Revises: 3b8e1c5f7a92
+Create Date: 2026-10-17 16:05:37.281940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f2d6c1e38'
+down_revision: Union[str, None] = '3b8e1c5f7a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+generation_status = sa.Enum('pending', 'running', 'done', 'failed', name='generationstatus')
+
+
+def upgrade() -> None:
+    generation_status.create(op.get_bind(), checkfirst=True)
+    # Existing templates start as pending with no horizon, so the first
+    # nightly top-up brings them all up to date
+    op.add_column('recurring_appointments', sa.Column(
+        'generation_status', generation_status, nullable=False, server_default='pending'
+    ))
+    op.add_column('recurring_appointments', sa.Column('generated_until', sa.DateTime(), nullable=True))
+    op.add_column('recurring_appointments', sa.Column('last_generated_count', sa.Integer(), nullable=True))
+    op.add_column('recurring_appointments', sa.Column('generation_error', sa.String(), nullable=True))
+    op.create_index(
+        'ix_recurring_appointments_is_active_generated_until',
+        'recurring_appointments',
+        ['is_active', 'generated_until'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recurring_appointments_is_active_generated_until', table_name='recurring_appointments')
+    op.drop_column('recurring_appointments', 'generation_error')
+    op.drop_column('recurring_appointments', 'last_generated_count')
+    op.drop_column('recurring_appointments', 'generated_until')
+    op.drop_column('recurring_appointments', 'generation_status')
+    generation_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,57 @@
+"""Add email_template_overrides; render outbox bodies at send time
+
+Revision ID: a81c3f6d9e54
+Revises: 7b3f5e9a2c41
+Create Date: 2026-10-17 20:14:37.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81c3f6d9e54'
+down_revision: Union[str, None] = '7b3f5e9a2c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'email_template_overrides',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        # emailkind was created with email_outbox
+        sa.Column(
+            'kind',
+            sa.Enum('confirmation', 'cancellation', 'reminder', name='emailkind').with_variant(
+                postgresql.ENUM('confirmation', 'cancellation', 'reminder', name='emailkind', create_type=False),
+                'postgresql',
+            ),
+            nullable=False,
+        ),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'kind', name='uq_email_template_overrides_tenant_id_kind'),
+    )
+    op.create_index(op.f('ix_email_template_overrides_id'), 'email_template_overrides', ['id'], unique=False)
+
+    # New rows carry only the template values; the worker renders the body
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.alter_column('html_body', existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    # Unsent rows without a rendered body can't be delivered by the old code
+    op.execute("UPDATE email_outbox SET status = 'dead', last_error = 'Downgraded before delivery' WHERE html_body IS NULL AND status = 'pending'")
+    op.execute("UPDATE email_outbox SET html_body = '' WHERE html_body IS NULL")
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.alter_column('html_body', existing_type=sa.Text(), nullable=False)
+
+    op.drop_index(op.f('ix_email_template_overrides_id'), table_name='email_template_overrides')
+    op.drop_table('email_template_overrides')
@@ -0,0 +1,44 @@
+"""Link generated appointments to their recurring template
+
+Revision ID: b6d2e8f4a173
+Revises: f3c8a1e6b2d7
+Create Date: 2026-10-18 10:14:52.603118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2e8f4a173'
+down_revision: Union[str, None] = 'f3c8a1e6b2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Appointments generated before this stay unlinked (NULL): a later rule
+    # change leaves them alone
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.add_column(sa.Column('recurring_appointment_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_appointments_recurring_appointment_id',
+            'recurring_appointments',
+            ['recurring_appointment_id'],
+            ['id'],
+        )
+    op.create_index(
+        'ix_appointments_recurring_appointment_id_appointment_time',
+        'appointments',
+        ['recurring_appointment_id', 'appointment_time'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_appointments_recurring_appointment_id_appointment_time', table_name='appointments')
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_constraint('fk_appointments_recurring_appointment_id', type_='foreignkey')
+        batch_op.drop_column('recurring_appointment_id')
@@ -0,0 +1,32 @@
+"""Add partial index for the appointment reminder sweep
+
+Revision ID: c2e7a4b90d15
+Revises: 9a4f2d6c1e38
+Create Date: 2026-10-17 16:48:02.553190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e7a4b90d15'
+down_revision: Union[str, None] = '9a4f2d6c1e38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_appointments_reminder_due',
+        'appointments',
+        ['appointment_time'],
+        postgresql_where=sa.text("reminder_sent_at IS NULL AND status = 'scheduled'"),
+        sqlite_where=sa.text("reminder_sent_at IS NULL AND status = 'scheduled'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_appointments_reminder_due', table_name='appointments')
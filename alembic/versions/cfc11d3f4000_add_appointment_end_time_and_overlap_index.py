@@ -0,0 +1,102 @@
+"""Add appointment end_time and overlap index
+
+Revision ID: cfc11d3f4000
+Revises: 6c4c83e58268
+Create Date: 2026-10-17 09:12:31.408113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# app.models.appointment.MAX_DURATION_MINUTES, as of this revision
+MAX_DURATION_MINUTES = 8 * 60
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cfc11d3f4000'
+down_revision: Union[str, None] = '6c4c83e58268'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Conflict checks only look MAX_DURATION_MINUTES back for bookings that
+    # could still be running, so nothing may be longer than that. Before the
+    # cap, the API accepted any duration; how to split or shorten those
+    # bookings is the clinic's call, so stop and list them instead
+    too_long = bind.execute(sa.text(
+        "SELECT id, duration_minutes FROM appointments WHERE duration_minutes > :max "
+        "ORDER BY id LIMIT 500"
+    ), {"max": MAX_DURATION_MINUTES}).all()
+    if too_long:
+        raise RuntimeError(
+            f"Cannot cap appointment durations at {MAX_DURATION_MINUTES} minutes: these appointments "
+            "are longer (id: duration, first 500): "
+            + ", ".join(f"{row.id}: {row.duration_minutes}" for row in too_long)
+            + ". Shorten or split them, then run the upgrade again."
+        )
+
+    op.add_column('appointments', sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    # Backfill end_time for existing appointments
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE appointments "
+            "SET end_time = appointment_time + COALESCE(duration_minutes, 30) * INTERVAL '1 minute'"
+        )
+    else:
+        op.execute(
+            "UPDATE appointments "
+            "SET end_time = datetime(appointment_time, '+' || COALESCE(duration_minutes, 30) || ' minutes')"
+        )
+
+    op.create_index(
+        'ix_appointments_tenant_id_appointment_time',
+        'appointments',
+        ['tenant_id', 'appointment_time'],
+        unique=False
+    )
+
+    # On PostgreSQL the database itself rejects overlapping, non-cancelled
+    # appointments for the same tenant (closes the check-then-insert race)
+    if bind.dialect.name == 'postgresql':
+        # EXCLUDE constraints can't be added NOT VALID, and which booking of
+        # an overlapping pair to move is the clinic's call: stop and report
+        overlaps = bind.execute(sa.text(
+            "SELECT a.tenant_id, a.id AS first_id, b.id AS second_id "
+            "FROM appointments a JOIN appointments b "
+            "ON b.tenant_id = a.tenant_id AND b.id > a.id "
+            "AND b.appointment_time < a.end_time AND a.appointment_time < b.end_time "
+            "WHERE a.status <> 'cancelled' AND b.status <> 'cancelled' "
+            "ORDER BY a.tenant_id, a.id, b.id LIMIT 100"
+        )).all()
+        if overlaps:
+            raise RuntimeError(
+                "Cannot add ex_appointments_no_overlap: these non-cancelled appointments overlap "
+                "(tenant: id / id, first 100): "
+                + ", ".join(f"{row.tenant_id}: {row.first_id} / {row.second_id}" for row in overlaps)
+                + ". Cancel or reschedule one of each pair, then run the upgrade again."
+            )
+
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        op.execute(
+            "ALTER TABLE appointments ADD CONSTRAINT ex_appointments_no_overlap "
+            "EXCLUDE USING gist ("
+            "tenant_id WITH =, "
+            "tsrange(appointment_time, end_time) WITH &&"
+            ") WHERE (status <> 'cancelled')"
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        op.execute("ALTER TABLE appointments DROP CONSTRAINT IF EXISTS ex_appointments_no_overlap")
+
+    op.drop_index('ix_appointments_tenant_id_appointment_time', table_name='appointments')
+    op.drop_column('appointments', 'end_time')
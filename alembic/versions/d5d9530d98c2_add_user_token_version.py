@@ -0,0 +1,26 @@
+"""Add user token_version
+
+Revision ID: d5d9530d98c2
+Revises: cfc11d3f4000
+Create Date: 2026-10-17 10:03:54.210871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5d9530d98c2'
+down_revision: Union[str, None] = 'cfc11d3f4000'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
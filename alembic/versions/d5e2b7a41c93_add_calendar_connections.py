@@ -0,0 +1,35 @@
+"""Add calendar_connections (encrypted Google OAuth tokens per tenant)
+
+Revision ID: d5e2b7a41c93
+Revises: a81c3f6d9e54
+Create Date: 2026-10-17 21:03:12.584210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e2b7a41c93'
+down_revision: Union[str, None] = 'a81c3f6d9e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'calendar_connections',
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('calendar_id', sa.String(), nullable=False),
+        sa.Column('encrypted_token_info', sa.Text(), nullable=False),
+        sa.Column('connected_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('tenant_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('calendar_connections')
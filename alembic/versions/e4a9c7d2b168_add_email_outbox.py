@@ -0,0 +1,58 @@
+"""Add email_outbox
+
+Revision ID: e4a9c7d2b168
+Revises: 5d1b8f3e6a27
+Create Date: 2026-10-17 18:12:09.417352
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c7d2b168'
+down_revision: Union[str, None] = '5d1b8f3e6a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.Enum('confirmation', 'cancellation', 'reminder', name='emailkind'), nullable=False),
+        sa.Column('recipient', sa.String(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('html_body', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('pending', 'sent', 'dead', name='outboxstatus'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['appointment_id'], ['appointments.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_email_outbox_id'), 'email_outbox', ['id'], unique=False)
+    op.create_index(op.f('ix_email_outbox_tenant_id'), 'email_outbox', ['tenant_id'], unique=False)
+    op.create_index(
+        'ix_email_outbox_pending_next_attempt_at',
+        'email_outbox',
+        ['next_attempt_at'],
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_outbox_pending_next_attempt_at', table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_tenant_id'), table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_id'), table_name='email_outbox')
+    op.drop_table('email_outbox')
+    sa.Enum(name='outboxstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='emailkind').drop(op.get_bind(), checkfirst=True)
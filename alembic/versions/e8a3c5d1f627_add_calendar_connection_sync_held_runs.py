@@ -0,0 +1,28 @@
+"""Count calendar sync runs that held the watermark back
+
+Revision ID: e8a3c5d1f627
+Revises: b6d2e8f4a173
+Create Date: 2026-10-18 11:02:17.884390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a3c5d1f627'
+down_revision: Union[str, None] = 'b6d2e8f4a173'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('calendar_connections', sa.Column(
+        'sync_held_runs', sa.Integer(), nullable=False, server_default='0'
+    ))
+
+
+def downgrade() -> None:
+    op.drop_column('calendar_connections', 'sync_held_runs')
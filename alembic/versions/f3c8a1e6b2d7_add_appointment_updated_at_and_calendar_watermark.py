@@ -0,0 +1,32 @@
+"""Add appointments.updated_at and calendar_connections.synced_until for batched calendar sync
+
+Revision ID: f3c8a1e6b2d7
+Revises: d5e2b7a41c93
+Create Date: 2026-10-17 22:26:40.915337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1e6b2d7'
+down_revision: Union[str, None] = 'd5e2b7a41c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('appointments', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Existing appointments count as changed, so the first sync pushes them
+    op.execute("UPDATE appointments SET updated_at = CURRENT_TIMESTAMP")
+    op.create_index('ix_appointments_tenant_id_updated_at', 'appointments', ['tenant_id', 'updated_at'], unique=False)
+    op.add_column('calendar_connections', sa.Column('synced_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('calendar_connections', 'synced_until')
+    op.drop_index('ix_appointments_tenant_id_updated_at', table_name='appointments')
+    op.drop_column('appointments', 'updated_at')
@@ -0,0 +1,60 @@
+"""Add patient search columns and indexes
+
+Revision ID: f70d8d9fa556
+Revises: 7e4d03d70836
+Create Date: 2026-10-17 12:48:09.215530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f70d8d9fa556'
+down_revision: Union[str, None] = '7e4d03d70836'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Kept in sync with SEARCH_FIELDS in app/services/patient_search.py
+SEARCH_TEXT = (
+    "lower("
+    "coalesce(pet_name, '') || ' ' || "
+    "coalesce(owner_first_name, '') || ' ' || "
+    "coalesce(owner_last_name, '') || ' ' || "
+    "coalesce(owner_phone, '') || ' ' || "
+    "coalesce(owner_email, '') || ' ' || "
+    "coalesce(chip_number, '')"
+    ")"
+)
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(pet_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(owner_first_name, '') || ' ' || coalesce(owner_last_name, '')), 'B') || "
+    "setweight(to_tsvector('simple', "
+    "coalesce(owner_phone, '') || ' ' || coalesce(owner_email, '') || ' ' || coalesce(chip_number, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    # SQLite has no text indexes; the app falls back to an in-process index
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(f"ALTER TABLE patients ADD COLUMN search_text text GENERATED ALWAYS AS ({SEARCH_TEXT}) STORED")
+    op.execute(f"ALTER TABLE patients ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED")
+    op.execute("CREATE INDEX ix_patients_search_text_trgm ON patients USING gin (search_text gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_patients_search_vector ON patients USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_patients_search_vector")
+    op.execute("DROP INDEX IF EXISTS ix_patients_search_text_trgm")
+    op.execute("ALTER TABLE patients DROP COLUMN IF EXISTS search_vector")
+    op.execute("ALTER TABLE patients DROP COLUMN IF EXISTS search_text")
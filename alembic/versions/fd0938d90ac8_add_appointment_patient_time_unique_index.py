@@ -0,0 +1,60 @@
+"""Add unique (tenant_id, patient_id, appointment_time) index on appointments
+
+Revision ID: fd0938d90ac8
+Revises: f70d8d9fa556
+Create Date: 2026-10-17 14:02:48.115907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fd0938d90ac8'
+down_revision: Union[str, None] = 'f70d8d9fa556'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Recurring generation used to be able to book the same patient twice at
+    # the same time (only possible without the PostgreSQL overlap constraint).
+    # Which of the bookings to keep is the clinic's call, so don't touch
+    # them here: stop and list them instead
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT a.tenant_id, a.patient_id, a.appointment_time, a.id FROM appointments a "
+        "WHERE a.status <> 'cancelled' AND EXISTS ("
+        "SELECT 1 FROM appointments b WHERE b.status <> 'cancelled' AND b.id <> a.id "
+        "AND b.tenant_id = a.tenant_id AND b.patient_id = a.patient_id "
+        "AND b.appointment_time = a.appointment_time"
+        ") ORDER BY a.tenant_id, a.patient_id, a.appointment_time, a.id LIMIT 500"
+    )).all()
+    if duplicates:
+        groups = {}
+        for tenant_id, patient_id, appointment_time, appointment_id in duplicates:
+            groups.setdefault((tenant_id, patient_id, appointment_time), []).append(appointment_id)
+        raise RuntimeError(
+            "Cannot add uq_appointments_tenant_id_patient_id_appointment_time: patients are booked "
+            "more than once at the same time (tenant / patient / time: ids): "
+            + "; ".join(
+                f"{tenant_id} / {patient_id} / {appointment_time}: {', '.join(map(str, ids))}"
+                for (tenant_id, patient_id, appointment_time), ids in groups.items()
+            )
+            + ". Cancel all but one booking of each, then run the upgrade again."
+        )
+
+    # Partial: cancelled appointments don't block rebooking the same slot
+    op.create_index(
+        'uq_appointments_tenant_id_patient_id_appointment_time',
+        'appointments',
+        ['tenant_id', 'patient_id', 'appointment_time'],
+        unique=True,
+        postgresql_where=sa.text("status <> 'cancelled'"),
+        sqlite_where=sa.text("status <> 'cancelled'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_appointments_tenant_id_patient_id_appointment_time', table_name='appointments')
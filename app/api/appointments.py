@@ -1,29 +1,33 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from fastapi import status as status_codes  # get_appointments has a `status` query parameter
+from sqlalchemy import case, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from datetime import datetime, date, timedelta
+import heapq
 from app.database import get_db
-from app.models.appointment import Appointment, AppointmentStatus
+from app.models.appointment import Appointment, AppointmentStatus, MAX_DURATION_MINUTES
 from app.models.patient import Patient
-from app.models.user import User
-from app.schemas.appointment import Appointment as AppointmentSchema, AppointmentCreate, AppointmentUpdate
-from app.auth.dependencies import get_current_active_user
+from app.models.recurring_appointment import RecurringAppointment
+from app.schemas.appointment import Appointment as AppointmentSchema, AppointmentCreate, AppointmentUpdate, CalendarEntry
+from app.services import recurrence
+from app.auth.dependencies import Principal, get_current_active_user
 from app.utils.email_service import email_service
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, next_cursor
 from pydantic import BaseModel
-from fastapi import BackgroundTasks
 
 #create router
 router = APIRouter(prefix="/appointments", tags=["Appointments"])
 
 
 # Helper function to check for time conflicts
-def check_time_conflict(
+async def check_time_conflict(
     appointment_time: datetime,
     tenant_id: int,
     duration_minutes: int,
-    db: Session,
+    db: AsyncSession,
     exclude_appointment_id: Optional[int] = None,
 ) -> bool:
     """
@@ -41,29 +45,25 @@ def check_time_conflict(
     """
     new_start_time = appointment_time
     new_end_time = appointment_time + timedelta(minutes=duration_minutes)
-    
-    # Get all active appointments for the same tenant
-    query = db.query(Appointment).filter(
+
+    # Two appointments overlap if:
+    # new_start < existing_end AND new_end > existing_start
+    #
+    # Any overlapping appointment must start within MAX_DURATION_MINUTES before
+    # the new start, so the scan on (tenant_id, appointment_time) stays bounded
+    # no matter how much history the tenant has.
+    query = select(Appointment.id).where(
         Appointment.tenant_id == tenant_id,
         Appointment.status != AppointmentStatus.cancelled,
+        Appointment.appointment_time > new_start_time - timedelta(minutes=MAX_DURATION_MINUTES),
+        Appointment.appointment_time < new_end_time,
+        Appointment.end_time > new_start_time,
     )
 
     if exclude_appointment_id:
-        query = query.filter(Appointment.id != exclude_appointment_id)
-
-    appointments = query.all()
-
-    # Check each appointment for time overlap
-    for appointment in appointments:
-        existing_start_time = appointment.appointment_time
-        existing_end_time = appointment.appointment_time + timedelta(minutes=appointment.duration_minutes)
-
-        # Two appointments overlap if:
-        # new_start < existing_end AND new_end > existing_start
-        if new_start_time < existing_end_time and new_end_time > existing_start_time:
-            return True  # Conflict found
+        query = query.where(Appointment.id != exclude_appointment_id)
 
-    return False  # No conflicts
+    return await db.scalar(select(query.exists()))
 
 
 # Helper function to validate business hours
@@ -116,16 +116,15 @@ def is_future_appointment(appointment_time: datetime) -> bool:
 @router.post("/", response_model=AppointmentSchema, status_code=status.HTTP_201_CREATED)
 async def create_appointment(
     appointment_data: AppointmentCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
     ):
 
      # Verify patient belongs to same tenant
-    patient = db.query(Patient).filter(
+    patient = await db.scalar(select(Patient).where(
         Patient.id == appointment_data.patient_id,
         Patient.tenant_id == current_user.tenant_id
-    ).first()
+    ))
 
     # If patient not found, raise 404 error
     if not patient:
@@ -146,7 +145,7 @@ async def create_appointment(
         )
 
     # Check for time conflicts
-    if check_time_conflict(
+    if await check_time_conflict(
         appointment_data.appointment_time,
         current_user.tenant_id,
         appointment_data.duration_minutes,
@@ -159,22 +158,26 @@ async def create_appointment(
 
     # Create appointment
     new_appointment = Appointment(
-        **appointment_data.model_dump(),
+        **appointment_data.model_dump(exclude={"patient_id"}),
         tenant_id=current_user.tenant_id,
         patient_id=patient.id,
         status=AppointmentStatus.scheduled
     )
 
     db.add(new_appointment)
-    db.commit()
-    db.refresh(new_appointment)
-    
-    # Send confirmation email in background
-    background_tasks.add_task(
-        email_service.send_appointment_confirmation,
-        new_appointment,
-        patient
-    )
+    try:
+        await db.flush()
+        # Queued in the same transaction: no email for a booking that didn't commit
+        email_service.queue_appointment_confirmation(db, new_appointment, patient)
+        await db.commit()
+    except IntegrityError:
+        # PostgreSQL exclusion constraint caught a concurrent booking
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Time slot is already booked. Please choose another time."
+        )
+    await db.refresh(new_appointment)
     
     return new_appointment
 
@@ -183,46 +186,237 @@ async def create_appointment(
 # Get appointments endpoint (with filters)
 @router.get("/", response_model=List[AppointmentSchema])
 async def get_appointments(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     patient_id: Optional[int] = None,
     status: Optional[AppointmentStatus] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
     ):
+    """
+    List appointments ordered by (appointment_time, id).
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
 
     # Base query with tenant filter
-    query = db.query(Appointment).filter(
+    query = select(Appointment).where(
         Appointment.tenant_id == current_user.tenant_id
-    )
+    ).order_by(Appointment.appointment_time, Appointment.id)
 
     # Apply optional filters
     if patient_id:
-        query = query.filter(Appointment.patient_id == patient_id)
+        query = query.where(Appointment.patient_id == patient_id)
     if status:
-        query = query.filter(Appointment.status == status)
+        query = query.where(Appointment.status == status)
     if date_from:
-        query = query.filter(Appointment.appointment_time >= date_from)
+        query = query.where(Appointment.appointment_time >= date_from)
     if date_to:
-        query = query.filter(Appointment.appointment_time <= date_to)
-    # Execute query with pagination
-    appointments = query.offset(skip).limit(limit).all()
+        query = query.where(Appointment.appointment_time <= date_to)
+
+    # Keyset pagination: seek past the last row of the previous page
+    if cursor:
+        try:
+            last_time, last_id = decode_cursor(cursor, 2)
+        except ValueError:
+            raise HTTPException(status_code=status_codes.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        query = query.where(
+            tuple_(Appointment.appointment_time, Appointment.id) > tuple_(last_time, last_id)
+        )
+    elif skip:
+        # Kept for existing clients; every skipped row is still read
+        query = query.offset(skip)
+
+    appointments = (await db.scalars(query.limit(limit))).all()
+
+    cursor_for_next_page = next_cursor(appointments, limit, "appointment_time", "id")
+    if cursor_for_next_page:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_for_next_page
     return appointments
 
 
+# Appointment Statistics Response Model
+class AppointmentStats(BaseModel):
+    total_appointments: int
+    scheduled_count: int
+    completed_count: int
+    cancelled_count: int
+    no_show_count: int
+    no_show_rate: float  # Percentage of no-shows
+    average_duration_minutes: Optional[float] = None
+    appointments_this_month: int
+    appointments_this_week: int
+    upcoming_appointments: int  # Future scheduled appointments
+    
+    class Config:
+        from_attributes = True
+
+
+def _count_where(condition, dialect: str):
+    """
+    COUNT of rows matching `condition`, for use alongside other aggregates.
+    PostgreSQL gets COUNT(*) FILTER (WHERE ...); elsewhere SUM(CASE ...),
+    wrapped in COALESCE because SUM over zero rows is NULL.
+    """
+    if dialect == "postgresql":
+        return func.count().filter(condition)
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+# Get appointment statistics endpoint
+# (declared before /{appointment_id} so "stats" is not parsed as an id)
+@router.get("/stats", response_model=AppointmentStats)
+async def get_appointment_statistics(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    Calculate comprehensive appointment statistics for the current tenant.
+    Includes counts by status, no-show rate, and time-based metrics.
+    """
+    now = datetime.now()
+    today_start = datetime(now.year, now.month, now.day, 0, 0, 0)
+    
+    # First day of current month
+    month_start = datetime(now.year, now.month, 1, 0, 0, 0)
+    
+    # First day of current week (Monday)
+    days_since_monday = now.weekday()
+    week_start = today_start - timedelta(days=days_since_monday)
+    
+    dialect = db.get_bind().dialect.name
+
+    # All counters in one pass over the tenant's appointments
+    row = (await db.execute(
+        select(
+            func.count(Appointment.id).label("total_appointments"),
+            _count_where(Appointment.status == AppointmentStatus.scheduled, dialect).label("scheduled_count"),
+            _count_where(Appointment.status == AppointmentStatus.completed, dialect).label("completed_count"),
+            _count_where(Appointment.status == AppointmentStatus.cancelled, dialect).label("cancelled_count"),
+            _count_where(Appointment.status == AppointmentStatus.no_show, dialect).label("no_show_count"),
+            func.avg(Appointment.duration_minutes).label("avg_duration"),
+            _count_where(Appointment.appointment_time >= month_start, dialect).label("appointments_this_month"),
+            _count_where(Appointment.appointment_time >= week_start, dialect).label("appointments_this_week"),
+            _count_where(
+                (Appointment.status == AppointmentStatus.scheduled) & (Appointment.appointment_time > now),
+                dialect
+            ).label("upcoming_appointments"),
+        ).where(Appointment.tenant_id == current_user.tenant_id)
+    )).one()
+
+    completed_count = row.completed_count
+    no_show_count = row.no_show_count
+
+    # Calculate no-show rate (no-shows / (completed + no-shows))
+    total_attended = completed_count + no_show_count
+    no_show_rate = (no_show_count / total_attended * 100) if total_attended > 0 else 0.0
+
+    average_duration_minutes = float(row.avg_duration) if row.avg_duration else None
+    
+    return AppointmentStats(
+        total_appointments=row.total_appointments,
+        scheduled_count=row.scheduled_count,
+        completed_count=completed_count,
+        cancelled_count=row.cancelled_count,
+        no_show_count=no_show_count,
+        no_show_rate=round(no_show_rate, 2),
+        average_duration_minutes=average_duration_minutes,
+        appointments_this_month=row.appointments_this_month,
+        appointments_this_week=row.appointments_this_week,
+        upcoming_appointments=row.upcoming_appointments
+    )
+
+
+# Longest window the calendar view expands recurring templates over
+MAX_CALENDAR_DAYS = 92
+
+
+@router.get("/calendar", response_model=List[CalendarEntry])
+async def get_calendar(
+    start: datetime,
+    end: datetime,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    Everything on the calendar between start and end, ordered by time:
+    stored appointments plus the future occurrences of active recurring
+    templates that haven't been generated as appointments (is_virtual).
+    Occurrences are expanded on the fly; nothing is written.
+    """
+    # Appointment times are stored naive
+    start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    if end <= start or end - start > timedelta(days=MAX_CALENDAR_DAYS):
+        raise HTTPException(
+            status_code=status_codes.HTTP_400_BAD_REQUEST,
+            detail=f"end must be after start and at most {MAX_CALENDAR_DAYS} days later"
+        )
+
+    appointments = (await db.scalars(select(Appointment).where(
+        Appointment.tenant_id == current_user.tenant_id,
+        Appointment.appointment_time >= start,
+        Appointment.appointment_time < end,
+    ).order_by(Appointment.appointment_time, Appointment.id))).all()
+
+    templates = (await db.scalars(select(RecurringAppointment).where(
+        RecurringAppointment.tenant_id == current_user.tenant_id,
+        RecurringAppointment.is_active == True,
+        RecurringAppointment.start_date < end,
+        or_(RecurringAppointment.end_date.is_(None), RecurringAppointment.end_date >= start),
+    ))).all()
+
+    # An occurrence that was generated (or cancelled) shows as the stored row
+    booked = {(appointment.patient_id, appointment.appointment_time) for appointment in appointments}
+    # Past occurrences that were never generated didn't happen
+    virtual_start = max(start, datetime.now())
+
+    def stored():
+        for appointment in appointments:
+            yield {
+                "appointment_id": appointment.id,
+                "patient_id": appointment.patient_id,
+                "start": appointment.appointment_time,
+                "end": appointment.end_time or appointment.appointment_time + timedelta(minutes=appointment.duration_minutes or 30),
+                "status": appointment.status,
+                "notes": appointment.notes,
+            }
+
+    def virtual(template):
+        duration = timedelta(minutes=template.duration_minutes or 30)
+        for occurrence in recurrence.occurrences(template, virtual_start, end):
+            if (template.patient_id, occurrence) in booked:
+                continue
+            yield {
+                "recurring_appointment_id": template.id,
+                "patient_id": template.patient_id,
+                "start": occurrence,
+                "end": occurrence + duration,
+                "status": AppointmentStatus.scheduled,
+                "notes": template.notes,
+                "is_virtual": True,
+            }
+
+    # Each source is already in time order
+    return list(heapq.merge(
+        stored(), *(virtual(template) for template in templates),
+        key=lambda entry: entry["start"]
+    ))
+
+
 # Get single appointment endpoint
 @router.get("/{appointment_id}", response_model=AppointmentSchema)
 async def get_appointment(
     appointment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
     ):
-    appointment = db.query(Appointment).filter(
+    appointment = await db.scalar(select(Appointment).where(
         Appointment.id == appointment_id,
         Appointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     if not appointment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment not found")
     return appointment
@@ -234,13 +428,13 @@ async def get_appointment(
 async def update_appointment(
     appointment_id: int,
     appointment_data: AppointmentUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
     ):
-    appointment = db.query(Appointment).filter(
+    appointment = await db.scalar(select(Appointment).where(
         Appointment.id == appointment_id,
         Appointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     if not appointment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment not found")
 
@@ -267,7 +461,7 @@ async def update_appointment(
             )
 
         # Check for time conflicts (excluding current appointment)
-        if check_time_conflict(
+        if await check_time_conflict(
             new_time,
             current_user.tenant_id,
             new_duration,
@@ -279,12 +473,21 @@ async def update_appointment(
                 detail="Time slot is already booked. Please choose another time."
             )
 
+        update_data['end_time'] = new_time + timedelta(minutes=new_duration)
+
     # update appointment
     for field, value in update_data.items():
         setattr(appointment, field, value)
 
-    db.commit()
-    db.refresh(appointment)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Time slot is already booked. Please choose another time."
+        )
+    await db.refresh(appointment)
     return appointment
 
 
@@ -292,32 +495,26 @@ async def update_appointment(
 @router.post("/{appointment_id}/cancel", response_model=AppointmentSchema)
 async def cancel_appointment(
     appointment_id: int,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
     ):
 
-    appointment = db.query(Appointment).filter(
+    appointment = await db.scalar(select(Appointment).where(
         Appointment.id == appointment_id,
         Appointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     if not appointment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment not found")
 
     appointment.status = AppointmentStatus.cancelled
-    db.commit()
-    db.refresh(appointment)
     
-    # Get patient for email notification
-    patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
+    # Get patient for email notification (queued with the status change)
+    patient = await db.scalar(select(Patient).where(Patient.id == appointment.patient_id))
     if patient:
-        # Send cancellation email in background
-        background_tasks.add_task(
-            email_service.send_appointment_cancellation,
-            appointment,
-            patient
-        )
+        email_service.queue_appointment_cancellation(db, appointment, patient)
     
+    await db.commit()
+    await db.refresh(appointment)
     return appointment
 
 
@@ -325,17 +522,17 @@ async def cancel_appointment(
 @router.post("/{appointment_id}/no-show", response_model=AppointmentSchema)
 async def mark_no_show(
     appointment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Mark an appointment as no-show.
     Only works for appointments that are scheduled and in the past.
     """
-    appointment = db.query(Appointment).filter(
+    appointment = await db.scalar(select(Appointment).where(
         Appointment.id == appointment_id,
         Appointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not appointment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment not found")
@@ -355,129 +552,28 @@ async def mark_no_show(
         )
     
     appointment.status = AppointmentStatus.no_show
-    db.commit()
-    db.refresh(appointment)
+    await db.commit()
+    await db.refresh(appointment)
     return appointment
 
 
-# Appointment Statistics Response Model
-class AppointmentStats(BaseModel):
-    total_appointments: int
-    scheduled_count: int
-    completed_count: int
-    cancelled_count: int
-    no_show_count: int
-    no_show_rate: float  # Percentage of no-shows
-    average_duration_minutes: Optional[float] = None
-    appointments_this_month: int
-    appointments_this_week: int
-    upcoming_appointments: int  # Future scheduled appointments
-    
-    class Config:
-        from_attributes = True
-
-
-# Get appointment statistics endpoint
-@router.get("/stats", response_model=AppointmentStats)
-async def get_appointment_statistics(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """
-    Calculate comprehensive appointment statistics for the current tenant.
-    Includes counts by status, no-show rate, and time-based metrics.
-    """
-    now = datetime.now()
-    today_start = datetime(now.year, now.month, now.day, 0, 0, 0)
-    
-    # First day of current month
-    month_start = datetime(now.year, now.month, 1, 0, 0, 0)
-    
-    # First day of current week (Monday)
-    days_since_monday = now.weekday()
-    week_start = today_start - timedelta(days=days_since_monday)
-    
-    # Base query for tenant
-    base_query = db.query(Appointment).filter(
-        Appointment.tenant_id == current_user.tenant_id
-    )
-    
-    # Total appointments
-    total_appointments = base_query.count()
-    
-    # Count by status
-    scheduled_count = base_query.filter(
-        Appointment.status == AppointmentStatus.scheduled
-    ).count()
-    
-    completed_count = base_query.filter(
-        Appointment.status == AppointmentStatus.completed
-    ).count()
-    
-    cancelled_count = base_query.filter(
-        Appointment.status == AppointmentStatus.cancelled
-    ).count()
-    
-    no_show_count = base_query.filter(
-        Appointment.status == AppointmentStatus.no_show
-    ).count()
-    
-    # Calculate no-show rate (no-shows / (completed + no-shows))
-    total_attended = completed_count + no_show_count
-    no_show_rate = (no_show_count / total_attended * 100) if total_attended > 0 else 0.0
-    
-    # Average duration
-    avg_duration = db.query(func.avg(Appointment.duration_minutes)).filter(
-        Appointment.tenant_id == current_user.tenant_id
-    ).scalar()
-    average_duration_minutes = float(avg_duration) if avg_duration else None
-    
-    # Appointments this month
-    appointments_this_month = base_query.filter(
-        Appointment.appointment_time >= month_start
-    ).count()
-    
-    # Appointments this week
-    appointments_this_week = base_query.filter(
-        Appointment.appointment_time >= week_start
-    ).count()
-    
-    # Upcoming appointments (future scheduled)
-    upcoming_appointments = base_query.filter(
-        Appointment.status == AppointmentStatus.scheduled,
-        Appointment.appointment_time > now
-    ).count()
-    
-    return AppointmentStats(
-        total_appointments=total_appointments,
-        scheduled_count=scheduled_count,
-        completed_count=completed_count,
-        cancelled_count=cancelled_count,
-        no_show_count=no_show_count,
-        no_show_rate=round(no_show_rate, 2),
-        average_duration_minutes=average_duration_minutes,
-        appointments_this_month=appointments_this_month,
-        appointments_this_week=appointments_this_week,
-        upcoming_appointments=upcoming_appointments
-    )
-
-
 # Send appointment reminder endpoint
 @router.post("/{appointment_id}/send-reminder", status_code=status.HTTP_200_OK)
 async def send_appointment_reminder(
     appointment_id: int,
     reminder_hours: int = 24,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Manually send an appointment reminder email.
-    In production, this would be automated via a background job scheduler.
+    Reminders are also sent automatically about 24 hours ahead (see
+    app/services/reminders.py); a reminder sent here isn't sent again.
     """
-    appointment = db.query(Appointment).filter(
+    appointment = await db.scalar(select(Appointment).where(
         Appointment.id == appointment_id,
         Appointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not appointment:
         raise HTTPException(
@@ -492,22 +588,25 @@ async def send_appointment_reminder(
         )
     
     # Get patient
-    patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
+    patient = await db.scalar(select(Patient).where(Patient.id == appointment.patient_id))
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Patient not found"
         )
     
-    # Send reminder
-    success = await email_service.send_appointment_reminder(
+    # Queue reminder
+    queued = email_service.queue_appointment_reminder(
+        db,
         appointment,
         patient,
         reminder_hours
     )
     
-    if success:
-        return {"message": "Reminder sent successfully"}
+    if queued:
+        appointment.reminder_sent_at = datetime.now()
+        await db.commit()
+        return {"message": "Reminder queued for delivery"}
     else:
         return {"message": "Reminder could not be sent (check patient email or timing)"}
 
@@ -515,14 +614,13 @@ async def send_appointment_reminder(
 # TODO: ADVANCED FEATURES (To be implemented):
 # - Calendar sync (Google Calendar, etc.)
 # - SMS reminders (Twilio integration)
-# - Automated reminder scheduling (background job)
 
 
 # IMPORTANT:
 # - Use timezone-aware datetimes
 # - Handle daylight saving time
 # - Consider different time zones (future)
-# - Add proper indexes on appointment_time
+# - Keep end_time in sync when changing appointment_time/duration_minutes
 
 #  TESTING:
 # 1. Book an appointment
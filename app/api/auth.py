@@ -4,27 +4,28 @@ Create endpoints for user registration and login
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import user
 from app.models.tenant import Tenant
 from app.schemas import user as user_schema
-from app.utils.security import hash_password, verify_password, create_access_token
+from app.utils.security import hash_password_async, verify_password_async, create_access_token_for_user
 from app.auth.dependencies import get_current_active_user, require_tenant
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/register", response_model=user_schema.User, status_code=status.HTTP_201_CREATED)
-async def register(user_data: user_schema.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(user.User).filter(user.User.email == user_data.email).first()
+async def register(user_data: user_schema.UserCreate, db: AsyncSession = Depends(get_db)):
+    existing_user = await db.scalar(select(user.User).where(user.User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
             )
     
-    tenant = db.query(Tenant).filter(Tenant.id == user_data.tenant_id).first()
+    tenant = await db.scalar(select(Tenant).where(Tenant.id == user_data.tenant_id))
     if not tenant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -37,7 +38,7 @@ async def register(user_data: user_schema.UserCreate, db: Session = Depends(get_
             detail=f"Tenant '{tenant.name}' is not active. Registration is disabled."
         )
 
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     new_user = user.User(
         email=user_data.email,
         full_name=user_data.full_name,
@@ -52,15 +53,15 @@ async def register(user_data: user_schema.UserCreate, db: Session = Depends(get_
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
 
 @router.post("/login", response_model=user_schema.Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    db_existing_user = db.query(user.User).filter(user.User.email == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    db_existing_user = await db.scalar(select(user.User).where(user.User.email == form_data.username))
     if not db_existing_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -68,7 +69,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    if not verify_password(form_data.password, db_existing_user.hashed_password):
+    if not await verify_password_async(form_data.password, db_existing_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -82,7 +83,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    access_token = create_access_token(data={"sub": db_existing_user.email})
+    access_token = create_access_token_for_user(db_existing_user)
     return {"access_token": access_token, "token_type": "bearer", "user": db_existing_user}
 
 
@@ -96,14 +97,14 @@ async def get_me(current_user: user.User = Depends(require_tenant)) -> user.User
 async def update_profile(
     user_update: user_schema.UserUpdate,
     current_user: user.User = Depends(require_tenant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update current user's profile."""
     if user_update.email and user_update.email != current_user.email:
-        existing_user = db.query(user.User).filter(
+        existing_user = await db.scalar(select(user.User).where(
             user.User.email == user_update.email,
             user.User.id != current_user.id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -114,8 +115,8 @@ async def update_profile(
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     
     return current_user
 
@@ -124,18 +125,21 @@ async def update_profile(
 async def change_password(
     password_data: user_schema.PasswordChange,
     current_user: user.User = Depends(require_tenant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Change current user's password."""
-    if not verify_password(password_data.old_password, current_user.hashed_password):
+    """
+    Change current user's password.
+    Revokes every token issued before (this one included); log in again.
+    """
+    if not await verify_password_async(password_data.old_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect current password"
         )
     
-    current_user.hashed_password = hash_password(password_data.new_password)
+    current_user.hashed_password = await hash_password_async(password_data.new_password)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     
     return current_user
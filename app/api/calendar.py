@@ -4,21 +4,27 @@ Handles OAuth2 flow and calendar event synchronization
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from typing import Optional
-from app.database import get_db
-from app.models.user import User
+from fastapi.concurrency import run_in_threadpool
+from google.auth.exceptions import RefreshError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from datetime import date
+from typing import Dict, Optional
+from app.database import SessionLocal, get_db
 from app.models.appointment import Appointment
+from app.models.calendar_connection import CalendarConnection
 from app.models.tenant import Tenant
-from app.auth.dependencies import get_current_active_user, get_tenant
+from app.auth.dependencies import Principal, get_current_active_user, get_tenant
 from app.services.calendar_service import calendar_service
+from app.services.calendar_sync import sync_calendar, write_event_ids
 
 router = APIRouter(prefix="/calendar", tags=["Calendar"])
 
 
 @router.get("/authorize")
 async def authorize_calendar(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     tenant: Tenant = Depends(get_tenant)
 ):
     """Start Google Calendar OAuth2 authorization flow."""
@@ -52,7 +58,7 @@ async def calendar_callback(
     code: str,
     state: str,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Handle OAuth2 callback from Google.
@@ -77,18 +83,16 @@ async def calendar_callback(
         # Exchange code for tokens
         tokens = calendar_service.exchange_code_for_tokens(code, flow)
         
-        # TODO: Store tokens in database
-        # HINT: Update tenant model with tokens
-        # HINT: Encrypt tokens before storing!
-        # HINT: Store: access_token, refresh_token, expires_at
-        
-        tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+        # Tokens are stored encrypted (CalendarConnection.token_info)
+        tenant = await db.scalar(select(Tenant).where(Tenant.id == tenant_id))
         if tenant:
-            # TODO: Store encrypted tokens
-            # tenant.google_calendar_token = encrypt(tokens['token'])
-            # tenant.google_calendar_refresh_token = encrypt(tokens['refresh_token'])
-            # tenant.google_calendar_enabled = True
-            db.commit()
+            connection = await db.get(CalendarConnection, tenant.id)
+            if connection is None:
+                connection = CalendarConnection(tenant_id=tenant.id)
+                db.add(connection)
+            connection.token_info = tokens
+            await db.commit()
+            calendar_service.forget_client(tenant.id)
         
         return {
             "message": "Calendar connected successfully",
@@ -102,51 +106,63 @@ async def calendar_callback(
         )
 
 
+def _sync_appointment(tenant_id: int, appointment_id: int) -> bool:
+    # googleapiclient is synchronous (HTTP round trip, token refresh, client
+    # lock); runs in the threadpool on its own session
+    with SessionLocal() as db:
+        appointment = db.scalar(select(Appointment).options(joinedload(Appointment.patient)).where(
+            Appointment.id == appointment_id,
+            Appointment.tenant_id == tenant_id
+        ))
+        connection = db.get(CalendarConnection, tenant_id)
+        if appointment is None or connection is None:
+            return False
+        
+        if appointment.google_calendar_event_id:
+            success = calendar_service.update_calendar_event(
+                appointment.google_calendar_event_id,
+                appointment,
+                connection
+            )
+        else:
+            event_id = calendar_service.create_calendar_event(appointment, connection)
+            if event_id:
+                # Keeps updated_at, so the background sync doesn't send it again
+                write_event_ids(db, [dict(appointment_id=appointment.id, event_id=event_id)])
+            success = event_id is not None
+        # Saves the event id and any refreshed access token
+        db.commit()
+        return success
+
+
 @router.post("/appointments/{appointment_id}/sync")
 async def sync_appointment_to_calendar(
     appointment_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     tenant: Tenant = Depends(get_tenant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Sync a specific appointment to Google Calendar."""
-    appointment = db.query(Appointment).filter(
+    found = await db.scalar(select(Appointment.id).where(
         Appointment.id == appointment_id,
         Appointment.tenant_id == tenant.id
-    ).first()
+    ))
     
-    if not appointment:
+    if not found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found"
         )
     
-    # TODO: Get tenant's Google Calendar token
-    access_token = None
+    connection = await db.get(CalendarConnection, tenant.id)
     
-    if not access_token:
+    if not connection:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Google Calendar not connected. Please authorize first."
         )
     
-    if appointment.google_calendar_event_id:
-        success = calendar_service.update_calendar_event(
-            appointment.google_calendar_event_id,
-            appointment,
-            access_token
-        )
-    else:
-        event_id = calendar_service.create_calendar_event(
-            appointment,
-            access_token
-        )
-        if event_id:
-            appointment.google_calendar_event_id = event_id
-            db.commit()
-            success = True
-        else:
-            success = False
+    success = await run_in_threadpool(_sync_appointment, tenant.id, appointment_id)
     
     if success:
         return {"message": "Appointment synced to calendar", "status": "success"}
@@ -157,18 +173,52 @@ async def sync_appointment_to_calendar(
         )
 
 
+def _sync_calendar(tenant_id: int, day: Optional[date]) -> Dict[str, int]:
+    # calendar_sync is synchronous (googleapiclient); runs in the threadpool
+    with SessionLocal() as db:
+        return sync_calendar(db, tenant_id, day=day)
+
+
+@router.post("/sync")
+async def sync_calendar_now(
+    day: Optional[date] = None,
+    current_user: Principal = Depends(get_current_active_user),
+    tenant: Tenant = Depends(get_tenant),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Push appointment changes to Google Calendar now instead of waiting for
+    the background sync, in batches of 50 calls per request. With `day`,
+    every appointment on that day is pushed again (full-day resync).
+    """
+    if not await db.get(CalendarConnection, tenant.id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Google Calendar not connected. Please authorize first."
+        )
+
+    try:
+        stats = await run_in_threadpool(_sync_calendar, tenant.id, day)
+    except RefreshError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Google Calendar access was revoked. Please reconnect."
+        )
+    return {"status": "success", **stats}
+
+
 @router.delete("/disconnect")
 async def disconnect_calendar(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     tenant: Tenant = Depends(get_tenant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Disconnect Google Calendar integration."""
-    # TODO: Clear tenant's calendar tokens
-    # tenant.google_calendar_token = None
-    # tenant.google_calendar_refresh_token = None
-    # tenant.google_calendar_enabled = False
-    db.commit()
+    connection = await db.get(CalendarConnection, tenant.id)
+    if connection:
+        await db.delete(connection)
+    await db.commit()
+    calendar_service.forget_client(tenant.id)
     
     return {"message": "Calendar disconnected successfully"}
 
@@ -181,8 +231,8 @@ async def disconnect_calendar(
 # 4. User grants permissions
 # 5. Google redirects to /callback with code
 # 6. Backend exchanges code for tokens
-# 7. Store tokens securely
-# 8. Use tokens for API calls
+# 7. Store tokens securely (CalendarConnection, encrypted)
+# 8. Use tokens for API calls (one cached client per tenant; refreshed tokens are saved back)
 #
 # Security:
 # - Always encrypt tokens in database
@@ -0,0 +1,123 @@
+"""
+Email Templates API
+Lets a clinic replace the body of its appointment emails
+
+Bodies are Mako templates limited to plain ${name} expressions (see
+app/utils/email_templates.py); values are HTML-escaped when rendered.
+Changes apply to emails sent from now on, including ones already queued.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_db
+from app.models.email_outbox import EmailKind
+from app.models.email_template import EmailTemplateOverride
+from app.schemas.email_template import EmailTemplate as EmailTemplateSchema, EmailTemplateUpdate
+from app.utils.email_templates import (
+    DEFAULT_TEMPLATES,
+    VARIABLES,
+    EmailTemplateError,
+    compile_override,
+    invalidate_template,
+)
+from app.auth.dependencies import Principal, get_current_active_user, get_current_superuser
+
+router = APIRouter(prefix="/email-templates", tags=["Email Templates"])
+
+
+def _to_schema(kind: EmailKind, override: Optional[EmailTemplateOverride]) -> EmailTemplateSchema:
+    return EmailTemplateSchema(
+        kind=kind,
+        body=override.body if override else DEFAULT_TEMPLATES[kind].source,
+        is_default=override is None,
+        variables=list(VARIABLES),
+        updated_at=override.updated_at if override else None,
+    )
+
+
+async def _get_override(db: AsyncSession, tenant_id: int, kind: EmailKind) -> Optional[EmailTemplateOverride]:
+    return await db.scalar(select(EmailTemplateOverride).where(
+        EmailTemplateOverride.tenant_id == tenant_id,
+        EmailTemplateOverride.kind == kind
+    ))
+
+
+@router.get("/", response_model=List[EmailTemplateSchema])
+async def list_email_templates(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    The template in use for every kind of email, the clinic's own or the default.
+    """
+    overrides = {
+        override.kind: override
+        for override in await db.scalars(select(EmailTemplateOverride).where(
+            EmailTemplateOverride.tenant_id == current_user.tenant_id
+        ))
+    }
+    return [_to_schema(kind, overrides.get(kind)) for kind in EmailKind]
+
+
+@router.get("/{kind}", response_model=EmailTemplateSchema)
+async def get_email_template(
+    kind: EmailKind,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    The template in use for one kind of email.
+    """
+    return _to_schema(kind, await _get_override(db, current_user.tenant_id, kind))
+
+
+@router.put("/{kind}", response_model=EmailTemplateSchema)
+async def update_email_template(
+    kind: EmailKind,
+    template_data: EmailTemplateUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_superuser)
+):
+    """
+    Replace the clinic's template for one kind of email (admins only).
+    """
+    try:
+        compile_override(template_data.body, f"tenant-{current_user.tenant_id}/{kind.value}")
+    except EmailTemplateError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    override = await _get_override(db, current_user.tenant_id, kind)
+    if override:
+        override.body = template_data.body
+    else:
+        override = EmailTemplateOverride(tenant_id=current_user.tenant_id, kind=kind, body=template_data.body)
+        db.add(override)
+    await db.commit()
+    await db.refresh(override)
+
+    invalidate_template(current_user.tenant_id, kind)
+    return _to_schema(kind, override)
+
+
+@router.delete("/{kind}", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_email_template(
+    kind: EmailKind,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_superuser)
+):
+    """
+    Go back to the default template for one kind of email (admins only).
+    """
+    override = await _get_override(db, current_user.tenant_id, kind)
+    if not override:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No custom template for this email"
+        )
+
+    await db.delete(override)
+    await db.commit()
+    invalidate_template(current_user.tenant_id, kind)
+    return None
@@ -0,0 +1,167 @@
+"""
+Tenant Data Export Endpoints
+Streams all of a tenant's records out as NDJSON or CSV (GDPR requests, backups)
+
+- Rows are read with a server-side cursor (yield_per) and written to the
+  response partition by partition, so memory stays flat however large
+  the tenant is
+- Responses are gzipped on the fly when the client sends
+  Accept-Encoding: gzip
+- The export holds one pooled DB connection until the download finishes
+"""
+
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import AsyncIterator, Dict, Iterable, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Table, select
+
+from app.auth.dependencies import Principal, get_current_active_user
+from app.database import AsyncSessionLocal
+from app.models.appointment import Appointment
+from app.models.patient import Patient
+from app.models.treatment import Treatment
+from app.models.vaccine import Vaccine
+from app.models.waitlist import Waitlist
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+# Entity name (URL + "type" in combined exports) -> model
+EXPORT_MODELS: Dict[str, type] = {
+    "patients": Patient,
+    "appointments": Appointment,
+    "vaccines": Vaccine,
+    "treatments": Treatment,
+    "waitlist": Waitlist,
+}
+
+# Rows fetched from the cursor (and written to the response) at a time
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+# ==========================================
+# ENCODING
+# ==========================================
+
+def _plain(value):
+    """Column value -> str/int/float/bool/None"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _ndjson_lines(columns: Sequence[str], rows: Iterable[Sequence], entity_type: Optional[str] = None) -> str:
+    lines = []
+    for row in rows:
+        record = {column: _plain(value) for column, value in zip(columns, row)}
+        if entity_type:
+            record = {"type": entity_type, "data": record}
+        lines.append(json.dumps(record, ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n"
+
+
+def _csv_lines(rows: Iterable[Sequence]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else _plain(value) for value in row])
+    return buffer.getvalue()
+
+
+async def _gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+# ==========================================
+# STREAMING
+# ==========================================
+
+async def _export(tenant_id: int, entities: Sequence[str], format: str) -> AsyncIterator[bytes]:
+    """
+    Rows of `entities` for one tenant, encoded in `format`. Combined
+    exports (several entities) are NDJSON lines of {"type", "data"}.
+    """
+    # Own session: the request's get_db session is closed before the body streams
+    async with AsyncSessionLocal() as db:
+        if db.get_bind().dialect.name == "postgresql":
+            # One snapshot for every table, so cross-references stay consistent
+            await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+        for entity in entities:
+            table: Table = EXPORT_MODELS[entity].__table__
+            columns = [column.name for column in table.columns]
+            if format == "csv":
+                yield _csv_lines([columns]).encode()
+
+            result = await db.stream(
+                select(table)
+                .where(table.c.tenant_id == tenant_id)
+                .execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for rows in result.partitions():
+                if format == "csv":
+                    yield _csv_lines(rows).encode()
+                else:
+                    yield _ndjson_lines(columns, rows, entity if len(entities) > 1 else None).encode()
+
+
+def _export_response(request: Request, tenant_id: int, entities: Sequence[str], name: str, format: str):
+    body = _export(tenant_id, entities, format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}-{date.today().isoformat()}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        body = _gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
+
+
+@router.get("/")
+async def export_all(
+    request: Request,
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    Export every entity of the current tenant as one NDJSON stream.
+    Each line is {"type": "patients" | "appointments" | ..., "data": {...row}}.
+    """
+    return _export_response(request, current_user.tenant_id, list(EXPORT_MODELS), "export", "ndjson")
+
+
+@router.get("/{entity}")
+async def export_entity(
+    entity: str,
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    Export one entity of the current tenant (patients, appointments,
+    vaccines, treatments, waitlist) as NDJSON (one row object per line)
+    or CSV (header row of column names).
+    """
+    if entity not in EXPORT_MODELS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown entity; expected one of: {', '.join(EXPORT_MODELS)}"
+        )
+    return _export_response(request, current_user.tenant_id, [entity], entity, format)
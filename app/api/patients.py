@@ -7,16 +7,22 @@ Create RESTful endpoints for patient management
 - FastAPI Path Parameters: https://fastapi.tiangolo.com/tutorial/path-params/
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import re
 # modules
 from app.database import get_db
 from app.models.patient import Patient
-from app.schemas.patient import Patient as PatientSchema, PatientCreate, PatientUpdate
-from app.auth.dependencies import get_current_active_user
-from app.models.user import User
-from sqlalchemy import or_
+from app.schemas.patient import (
+    Patient as PatientSchema, PatientCreate, PatientUpdate,
+    PatientLookupRequest, PatientLookupResult, PatientImportReport,
+    normalize_chip_number, normalize_phone,
+)
+from app.auth.dependencies import Principal, get_current_active_user
+from app.services import patient_import, patient_search
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, next_cursor
+from sqlalchemy import and_, select
 
 
 # create router
@@ -25,8 +31,8 @@ router = APIRouter(prefix='/patients', tags=['Patients'])
 @router.post("/", response_model=PatientSchema, status_code=status.HTTP_201_CREATED)
 async def create_patient(
         patient_data: PatientCreate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_user)
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(get_current_active_user)
 ):
 
 # Create new patient
@@ -38,12 +44,53 @@ async def create_patient(
             #   Patient(name="Alice", dob="2000-01-01", tenant_id=current_user.tenant_id)
             new_patient = Patient(**patient_data.model_dump(), tenant_id=current_user.tenant_id)
             db.add(new_patient)
-            db.commit()
-            db.refresh(new_patient)
+            await db.commit()
+            await db.refresh(new_patient)
 
             return new_patient
 
 
+# Bulk import endpoint (new-tenant onboarding)
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+@router.post("/import", response_model=PatientImportReport)
+async def import_patients(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    Import many patients from the raw request body, CSV (header row with
+    PatientCreate field names) or NDJSON (one PatientCreate object per line).
+    The format comes from `format` or the Content-Type.
+    
+    The body is streamed: rows are validated and inserted in batches as
+    they arrive. Invalid rows are reported and skipped; the rest are still
+    imported. Send the file as-is, e.g.:
+        curl -X POST --data-binary @pets.csv -H "Content-Type: text/csv" ...
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        format = IMPORT_CONTENT_TYPES.get(content_type)
+        if format is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson"
+            )
+
+    parse = patient_import.csv_records if format == "csv" else patient_import.ndjson_records
+    try:
+        return await patient_import.import_patients(db, current_user.tenant_id, parse(request.stream()))
+    except patient_import.ImportFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 # ⚠️ IMPORTANT: Search routes MUST come BEFORE /{patient_id} route!
 # Otherwise FastAPI thinks "search" is a patient_id
 
@@ -51,70 +98,201 @@ async def create_patient(
 @router.get("/search", response_model=List[PatientSchema])
 async def search_patients(
     search_query: str,
-    db: Session= Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
-    Search patients across all text fields.
-    Case-insensitive search using ILIKE.
-    """
-    # or must be in brackets
-    patients = db.query(Patient).filter(
-        Patient.tenant_id == current_user.tenant_id, 
-        or_(
-        Patient.first_name.ilike(f"%{search_query}%"),
-        Patient.last_name.ilike(f"%{search_query}%"),
-        Patient.email.ilike(f"%{search_query}%"),
-        Patient.phone.ilike(f"%{search_query}%"),
-        Patient.address.ilike(f"%{search_query}%"),
-        Patient.medical_history.ilike(f"%{search_query}%"), 
-        )
-    ).all()
-    return patients
+    Search patients by pet name, owner name, phone, email and chip number.
+    Every word of the query must match; results are ranked, best first.
+    """
+    return await patient_search.search_patients(
+        db, current_user.tenant_id, search_query, skip=skip, limit=limit
+    )
 
 
 # Search patients by name endpoint
 @router.get("/search/by_name", response_model=List[PatientSchema])
 async def search_patients_by_name(
     search_query: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
-    Search patients by first or last name only.
+    Search patients by pet name or owner first/last name only.
     More specific than general search.
     """
-    patients = db.query(Patient).filter(
-        Patient.tenant_id == current_user.tenant_id,
-        or_(
-        Patient.first_name.ilike(f"%{search_query}%"),
-        Patient.last_name.ilike(f"%{search_query}%"),
-        )
-    ).all()
-    return patients
+    return await patient_search.search_patients(
+        db, current_user.tenant_id, search_query,
+        fields=patient_search.NAME_FIELDS, skip=skip, limit=limit
+    )
+
+
+# ==========================================
+# EXACT LOOKUPS (chip scanner / phone at the front desk)
+# ==========================================
+# These normalise input exactly like PatientCreate does and hit the
+# chip_number / owner_phone indexes with = or a range, never a LIKE scan.
+
+MIN_PREFIX_DIGITS = 3
+
+
+def _normalize_lookup(value: str, normalize, prefix: bool) -> str:
+    """Normalised full value, or (prefix=True) a digits-only prefix; 422 if invalid"""
+    try:
+        if not prefix:
+            return normalize(value)
+        digits = re.sub(r'[\s\-()]', '', value)
+        if not re.match(rf'^\d{{{MIN_PREFIX_DIGITS},15}}$', digits):
+            raise ValueError(f"Prefix must be {MIN_PREFIX_DIGITS}-15 digits")
+        return digits
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+
+def _starts_with(column, prefix: str):
+    """
+    column LIKE 'prefix%' written as a range, which any btree index can
+    answer (LIKE only uses one under C collation / case-sensitive LIKE)
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+@router.get("/lookup/chip/{chip_number}", response_model=List[PatientSchema])
+async def lookup_by_chip(
+    chip_number: str,
+    prefix: bool = False,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    Find a patient by microchip number (separators ignored).
+    Exact match returns at most one patient; prefix=true matches chips
+    starting with the given digits.
+    """
+    chip = _normalize_lookup(chip_number, normalize_chip_number, prefix)
+    condition = _starts_with(Patient.chip_number, chip) if prefix else Patient.chip_number == chip
+    query = select(Patient).where(
+        Patient.tenant_id == current_user.tenant_id, condition
+    ).order_by(Patient.chip_number).limit(limit)
+    return (await db.scalars(query)).all()
+
+
+@router.get("/lookup/phone/{phone}", response_model=List[PatientSchema])
+async def lookup_by_phone(
+    phone: str,
+    prefix: bool = False,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    Find every pet whose owner has this phone number (separators ignored).
+    prefix=true matches numbers starting with the given digits.
+    """
+    number = _normalize_lookup(phone, normalize_phone, prefix)
+    condition = _starts_with(Patient.owner_phone, number) if prefix else Patient.owner_phone == number
+    query = select(Patient).where(
+        Patient.tenant_id == current_user.tenant_id, condition
+    ).order_by(Patient.owner_phone, Patient.id).limit(limit)
+    return (await db.scalars(query)).all()
+
+
+@router.post("/lookup", response_model=PatientLookupResult)
+async def lookup_batch(
+    lookup: PatientLookupRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """
+    Look up many chip numbers and phone numbers in one request
+    (one indexed IN query per kind), e.g. to reconcile an import file.
+    """
+    invalid = []
+
+    def normalized(values, normalize):
+        by_value = {}
+        for value in values:
+            try:
+                by_value[value] = normalize(value)
+            except ValueError:
+                invalid.append(value)
+        return by_value
+
+    chips = normalized(lookup.chip_numbers, normalize_chip_number)
+    phones = normalized(lookup.phones, normalize_phone)
+
+    found_chips = {}
+    if chips:
+        found_chips = {
+            patient.chip_number: patient
+            for patient in await db.scalars(select(Patient).where(
+                Patient.tenant_id == current_user.tenant_id,
+                Patient.chip_number.in_(set(chips.values()))
+            ))
+        }
+
+    found_phones = {}
+    if phones:
+        for patient in await db.scalars(select(Patient).where(
+            Patient.tenant_id == current_user.tenant_id,
+            Patient.owner_phone.in_(set(phones.values()))
+        ).order_by(Patient.id)):
+            found_phones.setdefault(patient.owner_phone, []).append(patient)
+
+    return {
+        "chips": {value: found_chips.get(chip) for value, chip in chips.items()},
+        "phones": {value: found_phones.get(number, []) for value, number in phones.items()},
+        "invalid": invalid,
+    }
 
 
 # Get all patients endpoint (with pagination)
 @router.get("/", response_model=List[PatientSchema])
 async def get_patients(
+    response: Response,
     skip: int = 0, # means skip the first 0 patients
     limit: int = 100, # limit the number of patients returned
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    cursor: Optional[str] = None, # X-Next-Cursor from the previous page
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
-    Get all patients for the current tenant with pagination.
+    Get all patients for the current tenant with pagination, ordered by id.
     Only returns patients from current user's tenant (security).
+    
+    Pass the X-Next-Cursor response header back as `cursor` to get the
+    next page; unlike `skip`, its cost doesn't grow with the page number.
     """
     # This line queries the database for all Patient records that belong to the current user's tenant.
-    # - db.query(Patient): starts a query for Patient objects.
-    # - .filter(Patient.tenant_id == current_user.tenant_id): ensures only patients from the same tenant (clinic) as the user are selected (important for security and multi-tenancy).
-    # - .offset(skip).limit(limit): pagination to skip a number of records and limit how many are returned.
-    # - .all(): executes the query and returns a list of Patient objects.
-    patients = db.query(Patient).filter(
+    # - select(Patient): builds a query for Patient objects.
+    # - .where(Patient.tenant_id == current_user.tenant_id): ensures only patients from the same tenant (clinic) as the user are selected (important for security and multi-tenancy).
+    # - .order_by(Patient.id): stable order, served by ix_patients_tenant_id_id.
+    # - await db.scalars(...).all(): executes the query without blocking and returns a list of Patient objects.
+    query = select(Patient).where(
         Patient.tenant_id == current_user.tenant_id
-    ).offset(skip).limit(limit).all()
+    ).order_by(Patient.id)
+    
+    if cursor:
+        try:
+            (last_id,) = decode_cursor(cursor, 1)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        query = query.where(Patient.id > last_id)
+    elif skip:
+        # Kept for existing clients; every skipped row is still read
+        query = query.offset(skip)
+    
+    patients = (await db.scalars(query.limit(limit))).all()
     
+    cursor_for_next_page = next_cursor(patients, limit, "id")
+    if cursor_for_next_page:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_for_next_page
     return patients
 
 
@@ -122,16 +300,16 @@ async def get_patients(
 @router.get("/{patient_id}", response_model=PatientSchema)
 async def get_patient(
     patient_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
 
    
-    patient = db.query(Patient).filter(
+    patient = await db.scalar(select(Patient).where(
         Patient.id == patient_id,
         # security check!
         Patient.tenant_id == current_user.tenant_id
-    ).first()
+    ))
 
 
     # if patient not found, raise 404 error
@@ -146,16 +324,16 @@ async def get_patient(
 async def update_patient(
     patient_id: int,
     patient_data: PatientUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
 
     # get patient (with tenant check)
-    updated_patient = db.query(Patient).filter(
+    updated_patient = await db.scalar(select(Patient).where(
         Patient.id == patient_id,
         Patient.tenant_id == current_user.tenant_id,
         
-    ).first()
+    ))
 
 
     if not updated_patient:
@@ -170,8 +348,8 @@ async def update_patient(
     for field, value in update_data.items():
         setattr(updated_patient, field, value)
 
-    db.commit()
-    db.refresh(updated_patient)
+    await db.commit()
+    await db.refresh(updated_patient)
     return updated_patient
 
 
@@ -179,23 +357,23 @@ async def update_patient(
 @router.delete("/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_patient(
     patient_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Delete a patient from the system.
     Only works if patient belongs to current user's tenant.
     """
-    patient = db.query(Patient).filter(
+    patient = await db.scalar(select(Patient).where(
         Patient.id == patient_id,
         Patient.tenant_id == current_user.tenant_id
-    ).first()
+    ))
 
     if not patient:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient not found")
 
-    db.delete(patient)
-    db.commit()
+    await db.delete(patient)
+    await db.commit()
     return None # 204 No Content
 
 
@@ -204,7 +382,7 @@ async def delete_patient(
 
 # - Get patient's appointment history
 # - Upload patient documents
-# - Export patient data (GDPR compliance)
+# - Export patient data (GDPR compliance) → done: GET /export/patients
 
 
 
@@ -229,6 +407,9 @@ async def delete_patient(
 # - skip: How many records to skip
 # - limit: How many records to return
 # - Example: skip=10, limit=10 → records 11-20
+# - cursor: Preferred for deep pages. Send back the X-Next-Cursor header
+#   from the previous response; the DB seeks to it via the index instead of
+#   reading and discarding `skip` rows
 
 
 
@@ -1,42 +1,79 @@
 """
 Recurring Appointments API
 Manages recurring appointment templates
+
+Appointments are generated from a template in the background (see
+app/services/recurring_generation.py): creating or changing a template
+only queues the work, and the template's generation_status /
+generated_until report how far it has got. Changing the rule or
+deactivating the template cancels its upcoming generated appointments.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
 from typing import List
-from datetime import datetime, timedelta
 from app.database import get_db
-from app.models.recurring_appointment import RecurringAppointment, RecurrencePattern
-from app.models.patient import Patient
 from app.models.appointment import Appointment, AppointmentStatus
-from app.models.user import User
+from app.models.recurring_appointment import GenerationStatus, RecurringAppointment
+from app.models.patient import Patient
+from app.services.scheduler_service import enqueue_recurring_generation
 from app.schemas.recurring_appointment import (
     RecurringAppointment as RecurringAppointmentSchema,
     RecurringAppointmentCreate,
-    RecurringAppointmentUpdate
+    RecurringAppointmentUpdate,
+    check_weekday_ordinals
 )
-from app.auth.dependencies import get_current_active_user
+from app.auth.dependencies import Principal, get_current_active_user
+
+# Changing any of these invalidates the appointments generated so far
+RULE_FIELDS = {
+    "pattern", "interval", "start_date", "end_date", "time_of_day",
+    "duration_minutes", "by_weekday", "by_month_day", "exception_dates", "is_active",
+}
+
+def _naive_utc(value):
+    """Columns hold naive UTC; request datetimes may carry any offset"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 
 router = APIRouter(prefix="/recurring-appointments", tags=["Recurring Appointments"])
 
 
+async def _cancel_upcoming_appointments(db: AsyncSession, recurring: RecurringAppointment) -> None:
+    """
+    Cancel the template's generated appointments that haven't happened yet
+    and are still scheduled. Through the ORM, so the rollups and the
+    calendar sync see the change; the caller commits.
+    """
+    upcoming = await db.scalars(select(Appointment).where(
+        Appointment.recurring_appointment_id == recurring.id,
+        Appointment.appointment_time >= datetime.now(),
+        Appointment.status == AppointmentStatus.scheduled
+    ))
+    for appointment in upcoming:
+        appointment.status = AppointmentStatus.cancelled
+
+
 @router.post("/", response_model=RecurringAppointmentSchema, status_code=status.HTTP_201_CREATED)
 async def create_recurring_appointment(
     recurring_data: RecurringAppointmentCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Create a recurring appointment template.
-    This will generate individual appointments based on the pattern.
+    Its appointments are generated in the background; poll the template
+    (generation_status) to see when they're in.
     """
     # Verify patient belongs to same tenant
-    patient = db.query(Patient).filter(
+    patient = await db.scalar(select(Patient).where(
         Patient.id == recurring_data.patient_id,
         Patient.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not patient:
         raise HTTPException(
@@ -46,17 +83,15 @@ async def create_recurring_appointment(
     
     # Create recurring appointment template
     new_recurring = RecurringAppointment(
-        **recurring_data.model_dump(),
-        tenant_id=current_user.tenant_id
+        **{field: _naive_utc(value) for field, value in recurring_data.model_dump().items()},
+        tenant_id=current_user.tenant_id,
+        generation_status=GenerationStatus.pending
     )
     
     db.add(new_recurring)
-    db.commit()
-    db.refresh(new_recurring)
+    await db.commit()
     
-    # Generate initial appointments from the template
-    # This is a simplified version - in production, you'd use a background job
-    await generate_appointments_from_template(new_recurring.id, db, current_user)
+    enqueue_recurring_generation(new_recurring.id)
     
     return new_recurring
 
@@ -64,31 +99,31 @@ async def create_recurring_appointment(
 @router.get("/", response_model=List[RecurringAppointmentSchema])
 async def get_recurring_appointments(
     active_only: bool = True,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """Get all recurring appointment templates"""
-    query = db.query(RecurringAppointment).filter(
+    query = select(RecurringAppointment).where(
         RecurringAppointment.tenant_id == current_user.tenant_id
     )
     
     if active_only:
-        query = query.filter(RecurringAppointment.is_active == True)
+        query = query.where(RecurringAppointment.is_active == True)
     
-    return query.all()
+    return (await db.scalars(query)).all()
 
 
 @router.get("/{recurring_id}", response_model=RecurringAppointmentSchema)
 async def get_recurring_appointment(
     recurring_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """Get a specific recurring appointment template"""
-    recurring = db.query(RecurringAppointment).filter(
+    recurring = await db.scalar(select(RecurringAppointment).where(
         RecurringAppointment.id == recurring_id,
         RecurringAppointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not recurring:
         raise HTTPException(
@@ -103,14 +138,14 @@ async def get_recurring_appointment(
 async def update_recurring_appointment(
     recurring_id: int,
     recurring_data: RecurringAppointmentUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """Update a recurring appointment template"""
-    recurring = db.query(RecurringAppointment).filter(
+    recurring = await db.scalar(select(RecurringAppointment).where(
         RecurringAppointment.id == recurring_id,
         RecurringAppointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not recurring:
         raise HTTPException(
@@ -119,25 +154,47 @@ async def update_recurring_appointment(
         )
     
     update_data = recurring_data.model_dump(exclude_unset=True)
+    rule_changed = any(
+        _naive_utc(getattr(recurring, field)) != _naive_utc(value)
+        for field, value in update_data.items() if field in RULE_FIELDS
+    )
     for field, value in update_data.items():
-        setattr(recurring, field, value)
-    
-    db.commit()
-    db.refresh(recurring)
+        setattr(recurring, field, _naive_utc(value))
+    
+    # The request alone may not show the combination (e.g. only pattern changes)
+    try:
+        check_weekday_ordinals(recurring.pattern, recurring.by_weekday)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    
+    # A new rule is generated from scratch, in place of the old one's
+    # upcoming appointments (cancelled in the same transaction)
+    if rule_changed:
+        await _cancel_upcoming_appointments(db, recurring)
+    regenerate = recurring.is_active and rule_changed
+    if regenerate:
+        recurring.generated_until = None
+        recurring.generation_status = GenerationStatus.pending
+    
+    await db.commit()
+    await db.refresh(recurring)
+    
+    if regenerate:
+        enqueue_recurring_generation(recurring.id)
     return recurring
 
 
 @router.delete("/{recurring_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_recurring_appointment(
     recurring_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """Delete (deactivate) a recurring appointment template"""
-    recurring = db.query(RecurringAppointment).filter(
+    recurring = await db.scalar(select(RecurringAppointment).where(
         RecurringAppointment.id == recurring_id,
         RecurringAppointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not recurring:
         raise HTTPException(
@@ -145,26 +202,28 @@ async def delete_recurring_appointment(
             detail="Recurring appointment not found"
         )
     
-    # Soft delete: mark as inactive
+    # Soft delete: mark as inactive; its upcoming appointments go with it
     recurring.is_active = False
-    db.commit()
+    await _cancel_upcoming_appointments(db, recurring)
+    await db.commit()
     return None
 
 
-@router.post("/{recurring_id}/generate", status_code=status.HTTP_200_OK)
+@router.post("/{recurring_id}/generate", response_model=RecurringAppointmentSchema, status_code=status.HTTP_202_ACCEPTED)
 async def generate_appointments(
     recurring_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
-    Manually trigger generation of appointments from a recurring template.
-    This is useful for generating appointments in advance.
+    Queue generation of a template's appointments for the next 90 days.
+    Returns the template straight away; generation_status goes
+    pending -> running -> done (or failed, with generation_error).
     """
-    recurring = db.query(RecurringAppointment).filter(
+    recurring = await db.scalar(select(RecurringAppointment).where(
         RecurringAppointment.id == recurring_id,
         RecurringAppointment.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not recurring:
         raise HTTPException(
@@ -172,88 +231,16 @@ async def generate_appointments(
             detail="Recurring appointment not found"
         )
     
-    generated_count = await generate_appointments_from_template(recurring_id, db, current_user)
-    
-    return {"message": f"Generated {generated_count} appointments", "count": generated_count}
-
-
-async def generate_appointments_from_template(
-    recurring_id: int,
-    db: Session,
-    current_user: User,
-    days_ahead: int = 90  # Generate appointments for next 90 days
-) -> int:
-    """
-    Helper function to generate individual appointments from a recurring template.
-    This is a simplified version - in production, use a background job scheduler.
-    """
-    recurring = db.query(RecurringAppointment).filter(
-        RecurringAppointment.id == recurring_id
-    ).first()
-    
-    if not recurring or not recurring.is_active:
-        return 0
-    
-    now = datetime.now()
-    end_date = recurring.end_date if recurring.end_date else (now + timedelta(days=days_ahead))
-    current_date = max(recurring.start_date, now)
-    
-    # Parse time_of_day
-    hour, minute = map(int, recurring.time_of_day.split(':'))
-    
-    generated_count = 0
+    if not recurring.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Recurring appointment is inactive"
+        )
     
-    while current_date <= end_date and current_date <= (now + timedelta(days=days_ahead)):
-        # Create appointment datetime
-        appointment_time = current_date.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        
-        # Skip if appointment is in the past
-        if appointment_time <= now:
-            # Move to next occurrence
-            current_date = _get_next_occurrence(current_date, recurring.pattern, recurring.interval)
-            continue
-        
-        # Check if appointment already exists
-        existing = db.query(Appointment).filter(
-            Appointment.tenant_id == recurring.tenant_id,
-            Appointment.patient_id == recurring.patient_id,
-            Appointment.appointment_time == appointment_time
-        ).first()
-        
-        if not existing:
-            # Create new appointment
-            new_appointment = Appointment(
-                tenant_id=recurring.tenant_id,
-                patient_id=recurring.patient_id,
-                appointment_time=appointment_time,
-                duration_minutes=recurring.duration_minutes,
-                status=AppointmentStatus.scheduled,
-                notes=recurring.notes
-            )
-            db.add(new_appointment)
-            generated_count += 1
-        
-        # Move to next occurrence
-        current_date = _get_next_occurrence(current_date, recurring.pattern, recurring.interval)
+    if recurring.generation_status != GenerationStatus.running:
+        recurring.generation_status = GenerationStatus.pending
+        await db.commit()
     
-    # Update last_generated timestamp
-    recurring.last_generated = now
-    db.commit()
+    enqueue_recurring_generation(recurring.id)
     
-    return generated_count
-
-
-def _get_next_occurrence(current_date: datetime, pattern: RecurrencePattern, interval: int) -> datetime:
-    """Calculate the next occurrence date based on pattern"""
-    if pattern == RecurrencePattern.daily:
-        return current_date + timedelta(days=interval)
-    elif pattern == RecurrencePattern.weekly:
-        return current_date + timedelta(weeks=interval)
-    elif pattern == RecurrencePattern.monthly:
-        # Simple monthly: add 30 days (for production, use proper month calculation)
-        return current_date + timedelta(days=30 * interval)
-    elif pattern == RecurrencePattern.yearly:
-        return current_date + timedelta(days=365 * interval)
-    else:
-        return current_date + timedelta(days=1)
-
+    return recurring
@@ -4,14 +4,13 @@ Provides aggregated statistics for the dashboard
 """
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from datetime import datetime, timedelta, date
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, date
 from app.database import get_db
-from app.models.patient import Patient
 from app.models.appointment import Appointment, AppointmentStatus
-from app.models.user import User
-from app.auth.dependencies import get_current_active_user
+from app.models.tenant_daily_stats import TOTALS_DAY, TenantDailyStats
+from app.auth.dependencies import Principal, get_current_active_user
 from pydantic import BaseModel
 
 # Create router
@@ -33,82 +32,82 @@ class DashboardStats(BaseModel):
 
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Get all statistics for the dashboard in one request.
     All data is filtered by the current user's tenant.
     """
     
-    # Get current date/time for filtering
+    # Counters come from tenant_daily_stats: the tenant's all-time totals
+    # row and its day rows from this month on, so this reads the same
+    # handful of rows however long the tenant's history gets
     now = datetime.now()
-    today_start = datetime(now.year, now.month, now.day, 0, 0, 0)
+    today = now.date()
     today_end = datetime(now.year, now.month, now.day, 23, 59, 59)
     
     # First day of current month
-    month_start = datetime(now.year, now.month, 1, 0, 0, 0)
+    month_start = date(now.year, now.month, 1)
     
-    # 1. Total patients count
-    total_patients = db.query(func.count(Patient.id)).filter(
-        Patient.tenant_id == current_user.tenant_id
-    ).scalar() or 0
+    def summed(column, condition=None):
+        if condition is not None:
+            column = case((condition, column), else_=0)
+        return func.coalesce(func.sum(column), 0)
     
-    # 2. Patients added this month
-    patients_this_month = db.query(func.count(Patient.id)).filter(
-        Patient.tenant_id == current_user.tenant_id,
-        Patient.created_at >= month_start
-    ).scalar() or 0
+    today_row = TenantDailyStats.day == today
+    row = (await db.execute(
+        select(
+            # 1. Total patients count
+            summed(TenantDailyStats.new_patients, TenantDailyStats.day == TOTALS_DAY).label("total_patients"),
+            # 2. Patients added this month
+            summed(TenantDailyStats.new_patients, TenantDailyStats.day >= month_start).label("patients_this_month"),
+            # 3. Today's appointments (all statuses)
+            summed(
+                TenantDailyStats.scheduled_count + TenantDailyStats.completed_count
+                + TenantDailyStats.cancelled_count + TenantDailyStats.no_show_count,
+                today_row
+            ).label("today_appointments"),
+            # 4. Today's completed appointments
+            summed(TenantDailyStats.completed_count, today_row).label("today_completed"),
+            # 5. Pending appointments on later days (today is counted below)
+            summed(TenantDailyStats.scheduled_count, TenantDailyStats.day > today).label("pending_after_today"),
+            # 6. Completed appointments this month, for revenue
+            summed(TenantDailyStats.completed_count, TenantDailyStats.day >= month_start).label("completed_this_month"),
+        ).where(
+            TenantDailyStats.tenant_id == current_user.tenant_id,
+            or_(TenantDailyStats.day >= month_start, TenantDailyStats.day == TOTALS_DAY)
+        )
+    )).one()
     
-    # 3. Today's appointments (all statuses)
-    today_appointments = db.query(func.count(Appointment.id)).filter(
-        Appointment.tenant_id == current_user.tenant_id,
-        Appointment.appointment_time >= today_start,
-        Appointment.appointment_time <= today_end
-    ).scalar() or 0
-    
-    # 4. Today's completed appointments
-    today_completed = db.query(func.count(Appointment.id)).filter(
-        Appointment.tenant_id == current_user.tenant_id,
-        Appointment.appointment_time >= today_start,
-        Appointment.appointment_time <= today_end,
-        Appointment.status == AppointmentStatus.completed
-    ).scalar() or 0
-    
-    # 5. Pending appointments (scheduled for future)
-    pending_appointments = db.query(func.count(Appointment.id)).filter(
+    # The rest of today's scheduled appointments need the time of day,
+    # which the rollup doesn't have: a one-day range scan on the raw table
+    pending_today = (await db.scalar(select(func.count(Appointment.id)).where(
         Appointment.tenant_id == current_user.tenant_id,
         Appointment.status == AppointmentStatus.scheduled,
-        Appointment.appointment_time > now
-    ).scalar() or 0
-    
-    # 6. Revenue this month (calculated from completed appointments)
-    # Assuming each appointment has a cost/fee field (you may need to add this)
-    # For now, we'll calculate as: completed_appointments * average_fee
-    completed_this_month = db.query(func.count(Appointment.id)).filter(
-        Appointment.tenant_id == current_user.tenant_id,
-        Appointment.status == AppointmentStatus.completed,
-        Appointment.appointment_time >= month_start
-    ).scalar() or 0
+        Appointment.appointment_time > now,
+        Appointment.appointment_time <= today_end
+    ))) or 0
     
+    # Revenue this month (calculated from completed appointments)
     # TODO: Replace this with actual fee calculation when you add pricing
     # Assuming average appointment fee of $50
     AVERAGE_APPOINTMENT_FEE = 50.0
-    revenue_this_month = completed_this_month * AVERAGE_APPOINTMENT_FEE
+    revenue_this_month = row.completed_this_month * AVERAGE_APPOINTMENT_FEE
     
     return DashboardStats(
-        total_patients=total_patients,
-        patients_this_month=patients_this_month,
-        today_appointments=today_appointments,
-        today_completed=today_completed,
-        pending_appointments=pending_appointments,
+        total_patients=row.total_patients,
+        patients_this_month=row.patients_this_month,
+        today_appointments=row.today_appointments,
+        today_completed=row.today_completed,
+        pending_appointments=row.pending_after_today + pending_today,
         revenue_this_month=revenue_this_month
     )
 
 # 🎯 TODO:
 # 1. Add actual revenue tracking (appointment fees)
 # 2. Add more stats (average wait time, etc.)
-# 3. Add caching for better performance
+# 3. Add caching for better performance (counters already come from tenant_daily_stats)
 # 4. Add date range parameters for custom reports
 
 
@@ -122,7 +121,7 @@ async def get_dashboard_stats(
 # - Easier to maintain
 #
 # SQL Aggregation Functions:
-# - func.count() → Count records
+# - func.count() → Count records (select(func.count(...)), awaited with db.scalar)
 # - func.sum() → Sum values
 # - func.avg() → Calculate average
 # - func.max() → Get maximum value
@@ -4,15 +4,15 @@ Handles waitlist entries for appointment scheduling
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 from app.database import get_db
 from app.models.waitlist import Waitlist
 from app.models.patient import Patient
-from app.models.user import User
 from app.schemas.waitlist import Waitlist as WaitlistSchema, WaitlistCreate, WaitlistUpdate
-from app.auth.dependencies import get_current_active_user
+from app.auth.dependencies import Principal, get_current_active_user
 
 router = APIRouter(prefix="/waitlist", tags=["Waitlist"])
 
@@ -20,17 +20,17 @@ router = APIRouter(prefix="/waitlist", tags=["Waitlist"])
 @router.post("/", response_model=WaitlistSchema, status_code=status.HTTP_201_CREATED)
 async def create_waitlist_entry(
     waitlist_data: WaitlistCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Add a patient to the waitlist for a desired appointment time.
     """
     # Verify patient belongs to same tenant
-    patient = db.query(Patient).filter(
+    patient = await db.scalar(select(Patient).where(
         Patient.id == waitlist_data.patient_id,
         Patient.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not patient:
         raise HTTPException(
@@ -39,12 +39,12 @@ async def create_waitlist_entry(
         )
     
     # Check if patient already has an active waitlist entry for similar time
-    existing_entry = db.query(Waitlist).filter(
+    existing_entry = await db.scalar(select(Waitlist).where(
         Waitlist.patient_id == waitlist_data.patient_id,
         Waitlist.tenant_id == current_user.tenant_id,
         Waitlist.is_active == True,
         Waitlist.desired_date == waitlist_data.desired_date.date()
-    ).first()
+    ))
     
     if existing_entry:
         raise HTTPException(
@@ -59,33 +59,33 @@ async def create_waitlist_entry(
     )
     
     db.add(new_entry)
-    db.commit()
-    db.refresh(new_entry)
+    await db.commit()
+    await db.refresh(new_entry)
     return new_entry
 
 
 @router.get("/", response_model=List[WaitlistSchema])
 async def get_waitlist(
     active_only: bool = True,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Get all waitlist entries for the current tenant.
     By default, returns only active entries.
     """
-    query = db.query(Waitlist).filter(
+    query = select(Waitlist).where(
         Waitlist.tenant_id == current_user.tenant_id
     )
     
     if active_only:
-        query = query.filter(Waitlist.is_active == True)
+        query = query.where(Waitlist.is_active == True)
     
     # Order by priority (highest first), then by creation date
-    entries = query.order_by(
+    entries = (await db.scalars(query.order_by(
         Waitlist.priority.desc(),
         Waitlist.created_at.asc()
-    ).all()
+    ))).all()
     
     return entries
 
@@ -93,14 +93,14 @@ async def get_waitlist(
 @router.get("/{waitlist_id}", response_model=WaitlistSchema)
 async def get_waitlist_entry(
     waitlist_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """Get a specific waitlist entry"""
-    entry = db.query(Waitlist).filter(
+    entry = await db.scalar(select(Waitlist).where(
         Waitlist.id == waitlist_id,
         Waitlist.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not entry:
         raise HTTPException(
@@ -115,14 +115,14 @@ async def get_waitlist_entry(
 async def update_waitlist_entry(
     waitlist_id: int,
     waitlist_data: WaitlistUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """Update a waitlist entry"""
-    entry = db.query(Waitlist).filter(
+    entry = await db.scalar(select(Waitlist).where(
         Waitlist.id == waitlist_id,
         Waitlist.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not entry:
         raise HTTPException(
@@ -135,24 +135,24 @@ async def update_waitlist_entry(
     for field, value in update_data.items():
         setattr(entry, field, value)
     
-    db.commit()
-    db.refresh(entry)
+    await db.commit()
+    await db.refresh(entry)
     return entry
 
 
 @router.delete("/{waitlist_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_waitlist_entry(
     waitlist_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Delete a waitlist entry (or mark as inactive).
     """
-    entry = db.query(Waitlist).filter(
+    entry = await db.scalar(select(Waitlist).where(
         Waitlist.id == waitlist_id,
         Waitlist.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not entry:
         raise HTTPException(
@@ -162,24 +162,24 @@ async def delete_waitlist_entry(
     
     # Soft delete: mark as inactive instead of hard delete
     entry.is_active = False
-    db.commit()
+    await db.commit()
     return None
 
 
 @router.post("/{waitlist_id}/fulfill", response_model=WaitlistSchema)
 async def fulfill_waitlist_entry(
     waitlist_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Mark a waitlist entry as fulfilled.
     This should be called when an appointment is created from the waitlist.
     """
-    entry = db.query(Waitlist).filter(
+    entry = await db.scalar(select(Waitlist).where(
         Waitlist.id == waitlist_id,
         Waitlist.tenant_id == current_user.tenant_id
-    ).first()
+    ))
     
     if not entry:
         raise HTTPException(
@@ -189,7 +189,7 @@ async def fulfill_waitlist_entry(
     
     entry.is_active = False
     entry.fulfilled_at = datetime.now()
-    db.commit()
-    db.refresh(entry)
+    await db.commit()
+    await db.refresh(entry)
     return entry
 
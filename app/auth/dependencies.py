@@ -7,24 +7,64 @@ Authentication Dependencies - Protect routes and get current user
 """
 
 # Import necessary modules
+import hashlib
+from dataclasses import dataclass
 from typing import Optional
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.database import get_db
+from app.utils.cache import TTLCache
 from app.utils.security import verify_token
 from app.models.user import User
-from app.models.tenant import Tenant 
+from app.middleware.tenant import TenantSnapshot
 
 
 # Create OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login") # login endpoint
 
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    Read-only snapshot of the authenticated user.
+    Returned by get_current_user and cached per token, so protected
+    endpoints don't need to load the User row on every request.
+    Use require_tenant when the full User object is needed.
+    """
+    id: int
+    email: str
+    tenant_id: Optional[int]
+    is_active: bool
+    is_superuser: bool
+
+
+# Principals keyed by token fingerprint
+principal_cache = TTLCache(
+    "principal",
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+    max_size=settings.principal_cache_max_size,
+)
+
+
+def _token_fingerprint(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_principal(mapper, connection, target):
+    """Profile/password changes and deactivation must not be served from cache."""
+    principal_cache.invalidate_where(lambda cached: cached.id == target.id)
+
+
 # Dependency to get current user from token
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
 
     # Create exception for authentication failures 
     credentials_exception = HTTPException(
@@ -44,16 +84,51 @@ async def get_current_user(
     # (verify_token already checks this internally)
     email: str = payload.email  # Type is str, not Optional[str]
 
-    # Get user from database
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
+    # Token signature/expiry is checked above on every request;
+    # only the revocation/user lookup below is cached
+    fingerprint = _token_fingerprint(token)
+    principal = principal_cache.get(fingerprint)
+    if principal is not None:
+        return principal
 
-    return user
+    if payload.user_id is not None:
+        # Identity, tenant and role come straight from the token claims.
+        # A primary-key lookup of two columns confirms it hasn't been revoked.
+        result = await db.execute(
+            select(User.token_version, User.is_active).where(User.id == payload.user_id)
+        )
+        row = result.first()
+        if row is None or row.token_version != payload.token_version:
+            raise credentials_exception
+
+        principal = Principal(
+            id=payload.user_id,
+            email=email,
+            tenant_id=payload.tenant_id,
+            is_active=bool(row.is_active),
+            is_superuser=payload.is_superuser,
+        )
+    else:
+        # Tokens issued before identity claims were added
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
+        if user is None:
+            raise credentials_exception
+
+        principal = Principal(
+            id=user.id,
+            email=user.email,
+            tenant_id=user.tenant_id,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser),
+        )
+
+    principal_cache.set(fingerprint, principal)
+    return principal
 
 # Dependency to get active user only
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)) -> User:
+    current_user: Principal = Depends(get_current_user)) -> Principal:
     if not current_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -65,8 +140,8 @@ async def get_current_active_user(
 
 #  get_current_superuser (only admins)
 async def get_current_superuser(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
 
     if not current_user.is_superuser:
         raise HTTPException(
@@ -78,14 +153,14 @@ async def get_current_superuser(
     return current_user
 
 # Dependency to get tenant from request (set by middleware)
-async def get_tenant(request: Request) -> Tenant:
+async def get_tenant(request: Request) -> TenantSnapshot:
     """
     Get the current tenant from request.state.
-    The tenant is set by TenantMiddleware.
+    The tenant is set by TenantMiddleware as a read-only TenantSnapshot.
     
     Usage:
         @app.get("/endpoint")
-        async def my_endpoint(tenant: Tenant = Depends(get_tenant)):
+        async def my_endpoint(tenant: TenantSnapshot = Depends(get_tenant)):
             return {"tenant": tenant.name}
     """
     if not hasattr(request.state, "tenant"):
@@ -100,11 +175,13 @@ async def get_tenant(request: Request) -> Tenant:
 # Dependency to verify user belongs to current tenant
 async def require_tenant(
     request: Request,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """
     Verify that the current user belongs to the tenant in the request context.
-    Returns the user if they belong to the tenant, raises exception otherwise.
+    Returns the full User row if they belong to the tenant, raises exception otherwise.
+    The tenancy check runs on the cached principal; the row is only loaded once it passes.
     
     Usage:
         @app.get("/protected-endpoint")
@@ -122,7 +199,7 @@ async def require_tenant(
             detail="Tenant context not found"
         )
     
-    tenant: Tenant = request.state.tenant
+    tenant: TenantSnapshot = request.state.tenant
     
     # Check if user belongs to this tenant
     if current_user.tenant_id is None:
@@ -137,7 +214,15 @@ async def require_tenant(
             detail=f"Access denied. User does not belong to tenant '{tenant.name}'"
         )
     
-    return current_user
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    return user
 
 
 #  rate_limiting (prevent abuse)
@@ -150,13 +235,13 @@ async def require_tenant(
 # How to use these in endpoints:
 # 
 # @app.get("/protected")
-# async def protected_route(current_user: User = Depends(get_current_active_user)):
+# async def protected_route(current_user: Principal = Depends(get_current_active_user)):
 #     return {"message": f"Hello {current_user.email}"}
 # 
 # What happens:
 # 1. Client sends request with Authorization header
 # 2. oauth2_scheme extracts the token
-# 3. get_current_user verifies token and fetches user
+# 3. get_current_user verifies token and fetches user (cached per token)
 # 4. get_current_active_user checks if user is active
 # 5. Your endpoint receives the user object
 # 
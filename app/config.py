@@ -12,12 +12,68 @@ class Settings(BaseSettings):
     debug: bool = True
     
     sendgrid_api_key: Optional[str] = None
+    sendgrid_api_host: str = "https://api.sendgrid.com"
     email_from_address: str = "noreply@example.com"
     email_enabled: bool = True
+    # "sendgrid", or "fake" to keep emails in memory (offline development)
+    email_transport: str = "sendgrid"
+    
+    # Email outbox delivery (scheduler job): poll interval, rows per batch,
+    # sends in flight at once, and retry policy (exponential backoff, then dead-letter)
+    email_outbox_poll_seconds: int = 5
+    email_outbox_batch_size: int = 1000
+    email_send_concurrency: int = 10
+    email_max_attempts: int = 8
+    email_retry_base_seconds: int = 30
+    email_retry_max_seconds: int = 3600
+    # Compiled per-tenant email templates (per worker process)
+    email_template_cache_ttl_seconds: int = 60
+    email_template_cache_max_size: int = 1024
     
     google_client_id: Optional[str] = None
     google_client_secret: Optional[str] = None
     google_redirect_uri: str = "http://localhost:8000/auth/google/callback"
+    # Google Calendar API clients, one per tenant (per worker process)
+    google_client_cache_ttl_seconds: int = 3600
+    google_client_cache_max_size: int = 256
+    # Base URL override for the Calendar API, e.g. a local fake in development
+    google_calendar_api_endpoint: Optional[str] = None
+    # "google", or "fake" to keep events in memory (offline development)
+    google_calendar_transport: str = "google"
+    # Calendar sync (scheduler job): push appointment changes this often
+    calendar_sync_interval_seconds: int = 300
+
+    # Database connection pool (per engine, per worker process)
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle_seconds: int = 1800
+    db_pool_timeout_seconds: int = 30
+    # PostgreSQL only; 0 disables the limit
+    db_statement_timeout_ms: int = 30000
+
+    # Tenant lookup cache (per worker process)
+    tenant_cache_ttl_seconds: int = 60
+    tenant_cache_max_size: int = 1024
+    
+    # Authenticated user cache (per worker process)
+    principal_cache_ttl_seconds: int = 30
+    principal_cache_max_size: int = 10000
+    
+    # In-process patient search index (SQLite only; PostgreSQL uses GIN indexes)
+    search_index_ttl_seconds: int = 300
+    search_index_max_tenants: int = 64
+    
+    # Background scheduler: periodic jobs only run in the process holding
+    # the leader lease; another process takes over this long after it dies
+    scheduler_lease_ttl_seconds: int = 60
+    
+    # Reminder sweep (scheduler job): appointments queued per transaction
+    reminder_batch_size: int = 200
+    
+    # Password hashing pool (bcrypt runs off the event loop)
+    password_hash_workers: int = 4
+    password_hash_queue_limit: int = 32
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -52,6 +108,29 @@ class Settings(BaseSettings):
         return v
 
 
+    @field_validator('db_pool_size', 'db_pool_timeout_seconds', 'reminder_batch_size', 'scheduler_lease_ttl_seconds',
+                     'email_outbox_poll_seconds', 'email_outbox_batch_size', 'email_send_concurrency',
+                     'email_max_attempts', 'email_retry_base_seconds', 'calendar_sync_interval_seconds')
+    def validate_positive_setting(cls, v, info):
+        if v < 1:
+            raise ValueError(f"{info.field_name.upper()} must be at least 1")
+        return v
+
+
+    @field_validator('email_transport')
+    def validate_email_transport(cls, v):
+        if v not in ["sendgrid", "fake"]:
+            raise ValueError("EMAIL_TRANSPORT must be either sendgrid or fake")
+        return v
+
+
+    @field_validator('google_calendar_transport')
+    def validate_google_calendar_transport(cls, v):
+        if v not in ["google", "fake"]:
+            raise ValueError("GOOGLE_CALENDAR_TRANSPORT must be either google or fake")
+        return v
+
+
     @field_validator('app_name')
     def validate_app_name(cls, v):
         if len(v) < 1:
@@ -1,18 +1,111 @@
 """
 Database connection and session management
+
+Two engines share the same DATABASE_URL:
+- `async_engine` / `get_db`: used by the API. Every router is `async def`,
+  so queries must be awaited instead of blocking the event loop.
+  (asyncpg for PostgreSQL, aiosqlite for SQLite)
+- `engine` / `SessionLocal`: synchronous, for code that runs outside the
+  event loop (background scheduler jobs, scripts).
+
+Pool sizing, SQL echo and the statement timeout come from Settings
+(DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_ECHO, ...). Both engines get their own
+pool of that size, so size them against the number of uvicorn workers.
 """
 
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.config import settings
 
+try:
+    from prometheus_client import Gauge, Histogram  # pyright: ignore[reportMissingImports]
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+if PROMETHEUS_AVAILABLE:
+    POOL_CHECKOUT_WAIT = Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled DB connection",
+        ["engine"],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "DB connections currently in use", ["engine"])
+    POOL_OVERFLOW = Gauge("db_pool_overflow", "DB connections open beyond pool_size", ["engine"])
+
+
+def _async_database_url(url: str) -> str:
+    """Pick the async driver for the configured database"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+def _instrumented(pool_class):
+    """Pool class that records how long each checkout waited for a connection"""
+    class InstrumentedPool(pool_class):
+        engine_label = "unknown"
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                POOL_CHECKOUT_WAIT.labels(engine=self.engine_label).observe(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+def _engine_options(url: str, pool_class, connect_args: dict) -> dict:
+    """Shared create_engine() keyword arguments built from Settings"""
+    options = {"echo": settings.db_echo, "pool_pre_ping": True}
+
+    # In-memory SQLite uses a single shared connection, there is no pool to size
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return options
+
+    options.update(
+        poolclass=_instrumented(pool_class) if PROMETHEUS_AVAILABLE else pool_class,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_timeout=settings.db_pool_timeout_seconds,
+    )
+    if url.startswith("postgresql") and settings.db_statement_timeout_ms > 0:
+        options["connect_args"] = connect_args
+    return options
+
+
+def _register_pool_metrics(engine, label: str) -> None:
+    """Export in-use and overflow counts, read from the pool at scrape time"""
+    if not PROMETHEUS_AVAILABLE or not isinstance(engine.pool, QueuePool):
+        return
+    # Set on the class so pools recreated by engine.dispose() keep the label
+    type(engine.pool).engine_label = label
+    # engine.pool is looked up on every scrape for the same reason
+    POOL_CHECKED_OUT.labels(engine=label).set_function(lambda: engine.pool.checkedout())
+    # overflow() starts at -pool_size until the pool has filled up
+    POOL_OVERFLOW.labels(engine=label).set_function(lambda: max(engine.pool.overflow(), 0))
+
 
 engine = create_engine(
     settings.database_url,
-    echo=True,
-    pool_pre_ping=True,
+    **_engine_options(
+        settings.database_url,
+        QueuePool,
+        # psycopg2: server-side limit so a runaway query cannot hold a connection forever
+        {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"},
+    ),
 )
+_register_pool_metrics(engine, "sync")
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -20,19 +113,36 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+async_engine = create_async_engine(
+    _async_database_url(settings.database_url),
+    **_engine_options(
+        settings.database_url,
+        AsyncAdaptedQueuePool,
+        # asyncpg takes server settings directly
+        {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}},
+    ),
+)
+_register_pool_metrics(async_engine.sync_engine, "async")
+
+# expire_on_commit=False: objects stay readable after commit (lazy refresh
+# is not possible with AsyncSession, and response models read them)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """
-    FastAPI dependency that provides a database session.
+    FastAPI dependency that provides an async database session.
     Automatically closes the session after the request.
     """
-    db = SessionLocal()
-    try:
-        yield db
-    except Exception as e:
-        db.rollback()
-        raise e
-    finally:
-        db.close()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            await db.rollback()
+            raise e
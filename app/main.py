@@ -1,14 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from datetime import datetime
 
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.middleware.tenant import TenantMiddleware
 
-from app.api import auth, patients, appointments, stats, waitlist, recurring_appointments, calendar
+from app.api import auth, patients, appointments, stats, waitlist, recurring_appointments, calendar, export, email_templates
 
 from app.services.scheduler_service import start_scheduler, stop_scheduler
 
+from app.database import async_engine
+
+from app.utils.security import PasswordHashingBusy
+from app.utils.pagination import NEXT_CURSOR_HEADER
+
 try:
     from prometheus_fastapi_instrumentator import Instrumentator  # pyright: ignore[reportMissingImports]
     PROMETHEUS_AVAILABLE = True
@@ -21,6 +27,15 @@ if PROMETHEUS_AVAILABLE:
     instrumentator = Instrumentator()
     instrumentator.instrument(app).expose(app)
 
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    """Shed login/register bursts instead of queueing them without bound"""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many authentication requests. Please retry shortly."},
+        headers={"Retry-After": "1"}
+    )
+
 app.include_router(auth.router)
 app.include_router(patients.router)
 app.include_router(appointments.router)
@@ -28,6 +43,8 @@ app.include_router(stats.router)
 app.include_router(waitlist.router)
 app.include_router(recurring_appointments.router)
 app.include_router(calendar.router)
+app.include_router(export.router)
+app.include_router(email_templates.router)
 
 # Add middlewares (ORDER MATTERS!)
 # ⚠️ CRITICAL: Middleware executes in REVERSE order (last added = first executed)
@@ -53,6 +70,8 @@ app.add_middleware(
     allow_credentials=True, 
     allow_methods=["*"], 
     allow_headers=["*"],
+    # Let browsers read the keyset pagination cursor
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
@@ -103,3 +122,6 @@ async def shutdown_event():
         stop_scheduler()
     except Exception as e:
         print(f"Warning: Error stopping scheduler: {e}")
+
+    # Close pooled async connections (aiosqlite keeps a thread per connection)
+    await async_engine.dispose()
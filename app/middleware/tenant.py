@@ -5,19 +5,89 @@ Middleware that runs before every request to identify which tenant (clinic)
 is making the request and store that context for the endpoint to use.
 """
 
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.database import SessionLocal
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import status
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, select
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.database import AsyncSessionLocal
 from app.models.tenant import Tenant
 from app.models.user import User
+from app.utils.cache import TTLCache
 
 
-class TenantMiddleware(BaseHTTPMiddleware):
+@dataclass(frozen=True, slots=True)
+class TenantSnapshot:
+    """
+    Detached, read-only copy of a Tenant row.
+    This is what gets cached and stored in request.state.tenant, so it is
+    safe to share between requests and never lazy-loads from the DB.
+    """
+    id: int
+    name: str
+    subdomain: str
+    is_active: bool
+
+
+# Active tenants keyed by subdomain
+tenant_cache = TTLCache(
+    "tenant",
+    ttl_seconds=settings.tenant_cache_ttl_seconds,
+    max_size=settings.tenant_cache_max_size,
+)
+
+
+async def get_active_tenant(subdomain: str) -> Optional[TenantSnapshot]:
+    """
+    Resolve an active tenant by subdomain.
+    Cache hits never touch the DB; on a miss the session is closed
+    before returning, so no connection is held for the rest of the request.
+    """
+    tenant = tenant_cache.get(subdomain)
+    if tenant is not None:
+        return tenant
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Tenant).where(
+                Tenant.subdomain == subdomain,
+                Tenant.is_active == True
+            )
+        )
+        row = result.scalars().first()
+        if not row:
+            return None
+        tenant = TenantSnapshot(
+            id=row.id,
+            name=row.name,
+            subdomain=row.subdomain,
+            is_active=row.is_active,
+        )
+
+    tenant_cache.set(subdomain, tenant)
+    return tenant
+
+
+@event.listens_for(Tenant, "after_update")
+@event.listens_for(Tenant, "after_delete")
+def _invalidate_cached_tenant(mapper, connection, target):
+    """Drop cached copies when a tenant is renamed, deactivated or deleted."""
+    tenant_cache.invalidate_where(lambda cached: cached.id == target.id)
+
+
+class TenantMiddleware:
     """
     Middleware to identify tenant from request and store in request.state.
     
     For development, we use a custom header: X-Tenant-ID
     In production, you might use subdomain instead.
+    
+    Written as a plain ASGI middleware (not BaseHTTPMiddleware) so the
+    response is passed through untouched: streaming responses and
+    BackgroundTasks work normally and there is no extra task per request.
     """
     
     EXCLUDED_PATHS = [
@@ -26,57 +96,68 @@ class TenantMiddleware(BaseHTTPMiddleware):
         "/openapi.json",
         "/health",
         "/",
-        "/favicon.ico"
+        "/favicon.ico",
+        "/metrics"
     ]
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process each request to extract and validate tenant."""
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        path = scope["path"]
         
-        if request.method == "OPTIONS":
-            return await call_next(request)
+        if scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
         
-        if request.url.path in self.EXCLUDED_PATHS:
-            return await call_next(request)
+        if path in self.EXCLUDED_PATHS:
+            return await self.app(scope, receive, send)
         
-        if request.url.path.startswith(("/static", "/api/openapi")):
-            return await call_next(request)
+        if path.startswith(("/static", "/api/openapi")):
+            return await self.app(scope, receive, send)
         
-        tenant_subdomain = request.headers.get("X-Tenant-ID")
+        tenant_subdomain = Headers(scope=scope).get("X-Tenant-ID")
         
         if not tenant_subdomain:
-            if request.url.path.startswith("/auth/register") or request.url.path.startswith("/auth/login"):
-                return await call_next(request)
+            if path.startswith("/auth/register") or path.startswith("/auth/login"):
+                return await self.app(scope, receive, send)
             
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Tenant identifier missing. Please provide X-Tenant-ID header."
+            response = _error_response(
+                status.HTTP_400_BAD_REQUEST,
+                "Tenant identifier missing. Please provide X-Tenant-ID header."
             )
+            return await response(scope, receive, send)
         
-        db = SessionLocal()
-        try:
-            tenant = db.query(Tenant).filter(
-                Tenant.subdomain == tenant_subdomain,
-                Tenant.is_active == True
-            ).first()
-            
-            if not tenant:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Tenant '{tenant_subdomain}' not found or inactive"
-                )
-            
-            request.state.tenant = tenant
-            request.state.tenant_id = tenant.id
-            
-            response = await call_next(request)
-            
-            response.headers["X-Tenant-ID"] = tenant.subdomain
-            response.headers["X-Tenant-Name"] = tenant.name
-            
-            return response
-            
-        finally:
-            db.close()
+        tenant = await get_active_tenant(tenant_subdomain)
+        
+        if not tenant:
+            response = _error_response(
+                status.HTTP_404_NOT_FOUND,
+                f"Tenant '{tenant_subdomain}' not found or inactive"
+            )
+            return await response(scope, receive, send)
+        
+        # Same storage Request.state reads from
+        state = scope.setdefault("state", {})
+        state["tenant"] = tenant
+        state["tenant_id"] = tenant.id
+        
+        async def send_with_tenant_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-Tenant-ID"] = tenant.subdomain
+                headers["X-Tenant-Name"] = tenant.name
+            await send(message)
+        
+        await self.app(scope, receive, send_with_tenant_headers)
+
+
+def _error_response(status_code: int, detail: str) -> JSONResponse:
+    """Same body shape FastAPI uses for HTTPException"""
+    return JSONResponse(status_code=status_code, content={"detail": detail})
 
 #  UNDERSTANDING MIDDLEWARE:
 # 
@@ -108,7 +189,8 @@ class TenantMiddleware(BaseHTTPMiddleware):
 # - Always verify tenant is active
 # - Handle missing tenant gracefully
 # - Log tenant access for security
-# - Cache tenant lookups for performance
+# - Tenant lookups are cached per worker (see tenant_cache); changes made
+#   by another process show up after tenant_cache_ttl_seconds
 
 
 
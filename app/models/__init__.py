@@ -6,4 +6,8 @@ from app.models.patient import Patient
 from app.models.appointment import Appointment, AppointmentStatus
 from app.models.vaccine import Vaccine
 from app.models.treatment import Treatment
-
+from app.models.tenant_daily_stats import TenantDailyStats
+from app.models.scheduler_lease import SchedulerLease
+from app.models.email_outbox import EmailOutbox
+from app.models.email_template import EmailTemplateOverride
+from app.models.calendar_connection import CalendarConnection
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Index, text
 from sqlalchemy.orm import relationship
 from app.database import Base
+from datetime import datetime, timedelta, timezone
 import enum
 
 
@@ -11,22 +12,76 @@ class AppointmentStatus(str, enum.Enum):
     no_show = "no_show"
 
 
+# Longest bookable appointment: a full business day (9 AM - 5 PM).
+# check_time_conflict relies on this to bound its range scan.
+MAX_DURATION_MINUTES = 8 * 60
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, like the column
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _default_end_time(context):
+    """Derive end_time from appointment_time + duration_minutes on insert"""
+    params = context.get_current_parameters()
+    start = params.get("appointment_time")
+    if start is None:
+        return None
+    return start + timedelta(minutes=params.get("duration_minutes") or 30)
+
+
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Serves the overlap check in check_time_conflict, date-range listings
+        # and keyset pagination on (appointment_time, id)
+        Index("ix_appointments_tenant_id_appointment_time_id", "tenant_id", "appointment_time", "id"),
+        # A patient can't be booked twice at the same time (makes recurring
+        # generation idempotent). Cancelled rows are exempt so a cancelled
+        # slot can be rebooked.
+        Index(
+            "uq_appointments_tenant_id_patient_id_appointment_time",
+            "tenant_id", "patient_id", "appointment_time",
+            unique=True,
+            postgresql_where=text("status <> 'cancelled'"),
+            sqlite_where=text("status <> 'cancelled'"),
+        ),
+        # Reminder sweep (app/services/reminders.py): only appointments still
+        # waiting for a reminder, so the index stays small
+        Index(
+            "ix_appointments_reminder_due",
+            "appointment_time",
+            postgresql_where=text("reminder_sent_at IS NULL AND status = 'scheduled'"),
+            sqlite_where=text("reminder_sent_at IS NULL AND status = 'scheduled'"),
+        ),
+        # Calendar sync (app/services/calendar_sync.py): a tenant's changes since its watermark
+        Index("ix_appointments_tenant_id_updated_at", "tenant_id", "updated_at"),
+        # A template's upcoming appointments, cancelled when its rule changes
+        Index("ix_appointments_recurring_appointment_id_appointment_time", "recurring_appointment_id", "appointment_time"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
 
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
     patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False, index=True)
     appointment_time = Column(DateTime, nullable=False, index=True)
     duration_minutes = Column(Integer, default=30)
+    # Stored so overlap checks can compare columns instead of computing start + duration per row.
+    # Must be kept in sync whenever appointment_time or duration_minutes change.
+    end_time = Column(DateTime, nullable=True, default=_default_end_time)
     status = Column(Enum(AppointmentStatus), default=AppointmentStatus.scheduled)
     notes = Column(Text)
     diagnosis = Column(Text)
     medicine_given = Column(Text)
+    # Template this was generated from (app/services/recurring_generation.py); None = booked directly
+    recurring_appointment_id = Column(Integer, ForeignKey("recurring_appointments.id"), nullable=True)
     
     # Calendar sync
     google_calendar_event_id = Column(String, nullable=True)  # Store Google Calendar event ID
     reminder_sent_at = Column(DateTime, nullable=True)  # Track when reminder was sent
+    # Set on every insert/UPDATE (Core statements too); UTC
+    updated_at = Column(DateTime, nullable=True, default=_utcnow, onupdate=_utcnow)
     
     # Define relationships
     tenant = relationship("Tenant", back_populates="appointments")
@@ -37,7 +92,7 @@ class Appointment(Base):
 
 
 # Later:
-# - Prevent double-booking (same time, same doctor)
-# - Send reminders before appointments
+# - Prevent double-booking per doctor (tenant-wide double-booking is blocked by
+#   check_time_conflict, and by an exclusion constraint on PostgreSQL)
 # - Calculate no-show rates
 # - Generate revenue reports
@@ -0,0 +1,44 @@
+"""
+Calendar Connection Model
+A tenant's Google Calendar authorization
+
+The OAuth token info (access and refresh token, client, expiry) is kept
+encrypted; token_info reads and writes it as a dict in the format of
+google.oauth2.credentials.Credentials.to_json().
+"""
+
+import json
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from datetime import datetime, timezone
+from app.database import Base
+from app.utils.security import decrypt_secret, encrypt_secret
+
+
+class CalendarConnection(Base):
+    __tablename__ = "calendar_connections"
+
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), primary_key=True)
+    calendar_id = Column(String, nullable=False, default="primary")
+    encrypted_token_info = Column(Text, nullable=False)
+    # Appointments updated up to here are in the calendar (UTC; NULL: nothing synced yet)
+    synced_until = Column(DateTime, nullable=True)
+    # Runs in a row that held synced_until back for a retryable failure
+    sync_held_runs = Column(Integer, nullable=False, default=0, server_default="0")
+    connected_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    @property
+    def token_info(self) -> dict:
+        return json.loads(decrypt_secret(self.encrypted_token_info))
+
+    @token_info.setter
+    def token_info(self, value: dict) -> None:
+        self.encrypted_token_info = encrypt_secret(json.dumps(value))
+
+    def __repr__(self):
+        return f"<CalendarConnection tenant {self.tenant_id} ({self.calendar_id})>"
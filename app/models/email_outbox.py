@@ -0,0 +1,71 @@
+"""
+Email Outbox Model
+Emails waiting to be delivered, written in the same transaction as the
+change they're about (appointment created, cancelled, reminder due)
+
+Requests only insert rows here; app/services/email_outbox.py delivers
+them in the background, retrying with exponential backoff and giving up
+(status dead) after EMAIL_MAX_ATTEMPTS.
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Index, JSON, text
+from datetime import datetime, timezone
+from app.database import Base
+import enum
+
+
+class EmailKind(str, enum.Enum):
+    confirmation = "confirmation"
+    cancellation = "cancellation"
+    reminder = "reminder"
+
+
+class OutboxStatus(str, enum.Enum):
+    pending = "pending"  # Waiting for (another) delivery attempt
+    sent = "sent"
+    dead = "dead"  # Gave up; see last_error
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, like the columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The delivery worker's queue: only rows still to be sent
+        Index(
+            "ix_email_outbox_pending_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
+    # Kept (unlinked) when the appointment is deleted: it records what was sent
+    appointment_id = Column(Integer, ForeignKey("appointments.id", ondelete="SET NULL"), nullable=True)
+    kind = Column(Enum(EmailKind), nullable=False)
+
+    # Captured when queued, so later edits don't change what was announced
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    # The template's values (app/utils/email_templates.py VARIABLES); the
+    # body is rendered from the tenant's template when it's sent
+    substitutions = Column(JSON, nullable=True)
+    # Only set on rows queued before templates, which carry the rendered body
+    html_body = Column(Text, nullable=True)
+
+    # Delivery
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=_utcnow)  # UTC
+    last_error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=_utcnow)  # UTC
+    sent_at = Column(DateTime, nullable=True)  # UTC
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} {self.kind} to {self.recipient} ({self.status})>"
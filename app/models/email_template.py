@@ -0,0 +1,33 @@
+"""
+Email Template Override Model
+A tenant's own body for one kind of appointment email
+
+Without a row the default in app/templates/email/<kind>.html is used.
+Compiled and cached by app/utils/email_templates.py.
+"""
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Enum, Text, UniqueConstraint
+from datetime import datetime, timezone
+from app.database import Base
+from app.models.email_outbox import EmailKind
+
+
+class EmailTemplateOverride(Base):
+    __tablename__ = "email_template_overrides"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "kind", name="uq_email_template_overrides_tenant_id_kind"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    kind = Column(Enum(EmailKind), nullable=False)
+    body = Column(Text, nullable=False)  # Mako source, ${name} expressions only
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    def __repr__(self):
+        return f"<EmailTemplateOverride {self.kind} for tenant {self.tenant_id}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, Float, Enum
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, Float, Enum, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime, timezone, date
@@ -30,6 +30,10 @@ class Patient(Base):
     Each patient is a pet (dog, cat, etc.) with owner information.
     """
     __tablename__ = "patients"
+    __table_args__ = (
+        # Tenant-scoped listing ordered by id (keyset pagination)
+        Index("ix_patients_tenant_id_id", "tenant_id", "id"),
+    )
 
     # Primary Key & Tenant
     id = Column(Integer, primary_key=True, index=True)
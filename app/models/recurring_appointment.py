@@ -3,7 +3,7 @@ Recurring Appointment Model
 For appointments that repeat on a schedule (daily, weekly, monthly, etc.)
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.database import Base
@@ -18,8 +18,20 @@ class RecurrencePattern(str, enum.Enum):
     yearly = "yearly"
 
 
+class GenerationStatus(str, enum.Enum):
+    """Where the background generation of a template's appointments is at"""
+    pending = "pending"  # Queued (new template or changed rule)
+    running = "running"
+    done = "done"
+    failed = "failed"  # See generation_error; the nightly top-up retries it
+
+
 class RecurringAppointment(Base):
     __tablename__ = "recurring_appointments"
+    __table_args__ = (
+        # Nightly top-up: active templates whose horizon is running out
+        Index("ix_recurring_appointments_is_active_generated_until", "is_active", "generated_until"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
@@ -27,7 +39,7 @@ class RecurringAppointment(Base):
     
     # Recurrence settings
     pattern = Column(Enum(RecurrencePattern), nullable=False)  # daily, weekly, monthly, yearly
-    interval = Column(Integer, default=1)  # Every N days/weeks/months (e.g., every 2 weeks)
+    interval = Column(Integer, default=1)  # Every N days/weeks/months/years (e.g., every 2 weeks)
     
     # Start and end dates
     start_date = Column(DateTime, nullable=False, index=True)
@@ -35,6 +47,11 @@ class RecurringAppointment(Base):
     time_of_day = Column(String, nullable=False)  # "09:00" format (HH:MM)
     duration_minutes = Column(Integer, default=30)
     
+    # Optional RRULE-style refinements (see app/services/recurrence.py)
+    by_weekday = Column(JSON, nullable=True)  # ["MO", "TH"], or ["1MO", "-1FR"] for monthly/yearly
+    by_month_day = Column(JSON, nullable=True)  # [1, 15], [-1] = last day of the month
+    exception_dates = Column(JSON, nullable=True)  # ["2026-12-25"]: occurrences skipped on these dates
+    
     # Status
     is_active = Column(Boolean, default=True, index=True)
     
@@ -45,6 +62,12 @@ class RecurringAppointment(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     last_generated = Column(DateTime)  # When we last created appointments from this template
     
+    # Background generation (see app/services/recurring_generation.py)
+    generation_status = Column(Enum(GenerationStatus), default=GenerationStatus.pending, nullable=False)
+    generated_until = Column(DateTime)  # Occurrences before this are materialised; None = nothing yet
+    last_generated_count = Column(Integer)  # Appointments created by the last run
+    generation_error = Column(String)
+    
     # Relationships
     tenant = relationship("Tenant", back_populates="recurring_appointments")
     patient = relationship("Patient", back_populates="recurring_appointments")
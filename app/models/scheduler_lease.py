@@ -0,0 +1,81 @@
+"""
+Scheduler leases
+
+A lease is a named row saying which process holds it until when. The
+background scheduler runs in every uvicorn worker of every replica; its
+periodic jobs only run in the process holding the "scheduler-leader"
+lease (see app/services/scheduler_service.py).
+
+Works the same on PostgreSQL and SQLite: taking a lease is one
+conditional UPDATE (ours already, or expired), or an INSERT if the row
+doesn't exist yet, so two processes can never both get it.
+Expiry is compared against each process's clock, in UTC; keep the TTL
+well above any clock skew between hosts.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, String, case, delete, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.database import Base
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)  # "<host>:<pid>:<random>" of the holding process
+    acquired_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<SchedulerLease {self.name} held by {self.holder} until {self.expires_at}>"
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, like the column
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def try_acquire_lease(db: Session, name: str, holder: str, ttl_seconds: int, now: Optional[datetime] = None) -> bool:
+    """
+    Take or renew lease `name` for `holder` for ttl_seconds.
+    Returns False if another holder has an unexpired lease. Commits.
+    """
+    now = now or _utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+
+    renewed = db.execute(
+        update(SchedulerLease)
+        .where(
+            SchedulerLease.name == name,
+            or_(SchedulerLease.holder == holder, SchedulerLease.expires_at <= now),
+        )
+        .values(
+            holder=holder,
+            expires_at=expires_at,
+            # Renewals keep the original acquired_at; a takeover resets it
+            acquired_at=case((SchedulerLease.holder == holder, SchedulerLease.acquired_at), else_=now),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    if not renewed:
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        renewed = db.execute(
+            insert(SchedulerLease)
+            .values(name=name, holder=holder, acquired_at=now, expires_at=expires_at)
+            .on_conflict_do_nothing()
+        ).rowcount
+
+    db.commit()
+    return bool(renewed)
+
+
+def release_lease(db: Session, name: str, holder: str) -> None:
+    """Give lease `name` up early (shutdown) so another process can take it straight away. Commits."""
+    db.execute(delete(SchedulerLease).where(SchedulerLease.name == name, SchedulerLease.holder == holder))
+    db.commit()
@@ -0,0 +1,248 @@
+"""
+Per-tenant daily rollups for the dashboard
+
+One row per (tenant, day). Rows are kept current by the mapper listeners
+below, inside the same transaction as the appointment/patient change, and
+rebuilt nightly from the raw tables by rebuild_tenant_daily_stats() to
+correct any drift (e.g. bulk UPDATEs that bypass the ORM).
+
+Appointments are bucketed by the day of appointment_time, patients by
+the day of created_at. Each tenant also has a row for day TOTALS_DAY
+holding its all-time totals, so all-time counters read one row instead
+of summing the tenant's whole history.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Column, Integer, Date, ForeignKey, UniqueConstraint, case, delete, event, func, inspect, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import Base
+from app.models.appointment import Appointment, AppointmentStatus
+from app.models.patient import Patient
+
+
+# The `day` of a tenant's all-time totals row; no appointment or patient falls on it
+TOTALS_DAY = date(1, 1, 1)
+
+
+class TenantDailyStats(Base):
+    __tablename__ = "tenant_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "day", name="uq_tenant_daily_stats_tenant_id_day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    day = Column(Date, nullable=False)
+
+    # Appointments on this day, by current status
+    scheduled_count = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_count = Column(Integer, nullable=False, default=0, server_default="0")
+    cancelled_count = Column(Integer, nullable=False, default=0, server_default="0")
+    no_show_count = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_duration_minutes = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Patients created on this day
+    new_patients = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<TenantDailyStats tenant={self.tenant_id} day={self.day}>"
+
+
+COUNTER_COLUMNS = (
+    "scheduled_count",
+    "completed_count",
+    "cancelled_count",
+    "no_show_count",
+    "completed_duration_minutes",
+    "new_patients",
+)
+
+Deltas = Dict[Tuple[int, date], Dict[str, int]]
+
+
+def _day(value) -> Optional[date]:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _add_appointment(deltas: Deltas, tenant_id, appointment_time, status, duration_minutes, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) one appointment's contribution"""
+    day = _day(appointment_time)
+    if tenant_id is None or day is None:
+        return
+    status = AppointmentStatus(status or AppointmentStatus.scheduled)
+    bucket = deltas[(tenant_id, day)]
+    bucket[f"{status.value}_count"] += sign
+    if status == AppointmentStatus.completed:
+        bucket["completed_duration_minutes"] += sign * (duration_minutes or 30)
+
+
+def _apply(connection, deltas: Deltas) -> None:
+    """
+    Upsert the deltas, and add them to each tenant's totals row; concurrent
+    writers just add to the same rows. Days that change the same counters
+    share one statement.
+    """
+    totals: Deltas = defaultdict(lambda: defaultdict(int))
+    for (tenant_id, _), changes in deltas.items():
+        for column, value in changes.items():
+            totals[(tenant_id, TOTALS_DAY)][column] += value
+
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    by_columns: Dict[Tuple[str, ...], list] = defaultdict(list)
+    for (tenant_id, day), changes in [*deltas.items(), *totals.items()]:
+        changes = {column: value for column, value in changes.items() if value}
+        if changes:
+            by_columns[tuple(sorted(changes))].append(dict(tenant_id=tenant_id, day=day, **changes))
+
+    for columns, rows in by_columns.items():
+        # executemany rather than one multi-row VALUES: the statement is the
+        # same for every batch, so SQLAlchemy compiles it once
+        stmt = insert(TenantDailyStats)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "day"],
+            set_={
+                column: getattr(TenantDailyStats, column) + stmt.excluded[column]
+                for column in columns
+            },
+        )
+        connection.execute(stmt, rows)
+
+
+APPOINTMENT_FIELDS = ("tenant_id", "appointment_time", "status", "duration_minutes")
+
+
+def _stored_appointment(connection, target) -> tuple:
+    """
+    APPOINTMENT_FIELDS as they are in the database, before this flush.
+    Taken from attribute history when possible; if the object was expired
+    before being changed the old values were never loaded, so read the row.
+    """
+    state = inspect(target)
+    histories = [state.attrs[field].history for field in APPOINTMENT_FIELDS]
+    if all(history.deleted or history.unchanged for history in histories):
+        return tuple((history.deleted or history.unchanged)[0] for history in histories)
+    return tuple(connection.execute(
+        select(*(getattr(Appointment, field) for field in APPOINTMENT_FIELDS))
+        .where(Appointment.id == target.id)
+    ).one())
+
+
+@event.listens_for(Appointment, "after_insert")
+def _rollup_appointment_insert(mapper, connection, target):
+    deltas: Deltas = defaultdict(lambda: defaultdict(int))
+    _add_appointment(deltas, *(getattr(target, field) for field in APPOINTMENT_FIELDS), 1)
+    _apply(connection, deltas)
+
+
+@event.listens_for(Appointment, "before_update")
+def _rollup_appointment_update(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in APPOINTMENT_FIELDS):
+        return
+    deltas: Deltas = defaultdict(lambda: defaultdict(int))
+    _add_appointment(deltas, *_stored_appointment(connection, target), -1)
+    _add_appointment(deltas, *(getattr(target, field) for field in APPOINTMENT_FIELDS), 1)
+    _apply(connection, deltas)
+
+
+@event.listens_for(Appointment, "before_delete")
+def _rollup_appointment_delete(mapper, connection, target):
+    deltas: Deltas = defaultdict(lambda: defaultdict(int))
+    _add_appointment(deltas, *_stored_appointment(connection, target), -1)
+    _apply(connection, deltas)
+
+
+@event.listens_for(Patient, "after_insert")
+def _rollup_patient_insert(mapper, connection, target):
+    if target.created_at is not None:
+        _apply(connection, {(target.tenant_id, _day(target.created_at)): {"new_patients": 1}})
+
+
+@event.listens_for(Patient, "before_delete")
+def _rollup_patient_delete(mapper, connection, target):
+    if target.created_at is not None:
+        _apply(connection, {(target.tenant_id, _day(target.created_at)): {"new_patients": -1}})
+
+
+def count_new_patients(connection, tenant_id: int, created_at_values) -> None:
+    """
+    Add patients created outside the ORM unit of work (bulk inserts), which
+    the mapper listeners above never see. Same transaction as the insert.
+    """
+    deltas: Deltas = defaultdict(lambda: defaultdict(int))
+    for created_at in created_at_values:
+        if created_at is not None:
+            deltas[(tenant_id, _day(created_at))]["new_patients"] += 1
+    _apply(connection, deltas)
+
+
+def count_new_appointments(connection, appointments) -> None:
+    """
+    Add appointments inserted outside the ORM unit of work (bulk inserts).
+    `appointments` yields (tenant_id, appointment_time, status, duration_minutes).
+    """
+    deltas: Deltas = defaultdict(lambda: defaultdict(int))
+    for tenant_id, appointment_time, status, duration_minutes in appointments:
+        _add_appointment(deltas, tenant_id, appointment_time, status, duration_minutes, 1)
+    _apply(connection, deltas)
+
+
+def rebuild_tenant_daily_stats(db, tenant_id: Optional[int] = None) -> None:
+    """
+    Recompute rollup rows from the raw tables (all tenants, or one).
+    Runs in the caller's transaction; the caller commits.
+    """
+    def counted(status):
+        return case((Appointment.status == status, 1), else_=0)
+
+    appointment_rows = select(
+        Appointment.tenant_id.label("tenant_id"),
+        func.date(Appointment.appointment_time).label("day"),
+        counted(AppointmentStatus.scheduled).label("scheduled_count"),
+        counted(AppointmentStatus.completed).label("completed_count"),
+        counted(AppointmentStatus.cancelled).label("cancelled_count"),
+        counted(AppointmentStatus.no_show).label("no_show_count"),
+        case(
+            (Appointment.status == AppointmentStatus.completed, func.coalesce(Appointment.duration_minutes, 30)),
+            else_=0
+        ).label("completed_duration_minutes"),
+        literal(0).label("new_patients"),
+    )
+    patient_rows = select(
+        Patient.tenant_id,
+        func.date(Patient.created_at),
+        literal(0), literal(0), literal(0), literal(0), literal(0),
+        literal(1),
+    ).where(Patient.created_at.isnot(None))
+
+    clear = delete(TenantDailyStats)
+    if tenant_id is not None:
+        appointment_rows = appointment_rows.where(Appointment.tenant_id == tenant_id)
+        patient_rows = patient_rows.where(Patient.tenant_id == tenant_id)
+        clear = clear.where(TenantDailyStats.tenant_id == tenant_id)
+
+    rows = union_all(appointment_rows, patient_rows).subquery()
+    totals = select(
+        rows.c.tenant_id,
+        rows.c.day,
+        *(func.sum(rows.c[column]) for column in COUNTER_COLUMNS),
+    ).group_by(rows.c.tenant_id, rows.c.day)
+
+    db.execute(clear)
+    db.execute(
+        TenantDailyStats.__table__.insert().from_select(["tenant_id", "day", *COUNTER_COLUMNS], totals)
+    )
+
+    # Then each tenant's totals row, from the daily rows just written
+    daily = TenantDailyStats.__table__
+    all_time = select(
+        daily.c.tenant_id,
+        literal(TOTALS_DAY, Date),
+        *(func.sum(daily.c[column]) for column in COUNTER_COLUMNS),
+    ).group_by(daily.c.tenant_id)
+    if tenant_id is not None:
+        all_time = all_time.where(daily.c.tenant_id == tenant_id)
+    db.execute(daily.insert().from_select(["tenant_id", "day", *COUNTER_COLUMNS], all_time))
@@ -2,7 +2,7 @@
 User database models
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, func, event, inspect
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from datetime import timezone
@@ -20,11 +20,27 @@ class User(Base):
     is_active = Column(Boolean, default=False)
     is_superuser = Column(Boolean, default=False)
     tenant_id = Column(Integer, ForeignKey("tenants.id"))
+    # Embedded in access tokens; bumping it revokes every token issued before
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     tenant = relationship("Tenant", back_populates="users")
     last_logins = relationship("LastLogin", back_populates="user")
 
 
+# Fields that are copied into JWT claims - changing any of them revokes old tokens
+TOKEN_CLAIM_FIELDS = ("email", "tenant_id", "is_active", "is_superuser")
+
+# A new password revokes old tokens too (e.g. changed after a compromise)
+TOKEN_REVOKING_FIELDS = TOKEN_CLAIM_FIELDS + ("hashed_password",)
+
+
+@event.listens_for(User, "before_update")
+def _bump_token_version(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in TOKEN_REVOKING_FIELDS):
+        target.token_version = (target.token_version or 0) + 1
+
+
 class LastLogin(Base):
     """Table to track user login history"""
     __tablename__ = "last_logins"
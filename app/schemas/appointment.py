@@ -1,7 +1,18 @@
 from pydantic import BaseModel, ConfigDict, field_validator
 from typing import Optional
-from datetime import datetime, timezone
-from app.models.appointment import AppointmentStatus
+from datetime import datetime
+from app.models.appointment import AppointmentStatus, MAX_DURATION_MINUTES
+
+
+def _wall_clock(v: datetime) -> datetime:
+    """
+    Appointment times are stored naive, in the clinic's (server's) local
+    time like datetime.now(); an aware value is converted to that
+    """
+    if v.tzinfo is not None:
+        return v.astimezone().replace(tzinfo=None)
+    return v
+
 
 class AppointmentBase(BaseModel):
     patient_id: int
@@ -18,11 +29,17 @@ class AppointmentCreate(AppointmentBase):
     @field_validator('appointment_time')
     @classmethod
     def validate_future_time(cls, v: datetime) -> datetime:
-        if v < datetime.now(timezone.utc):
+        v = _wall_clock(v)
+        if v < datetime.now():
             raise ValueError("Appointment must be in the future")
         return v
 
-    # optionall add validator for duration_minutes
+    @field_validator('duration_minutes')
+    @classmethod
+    def validate_duration(cls, v: int) -> int:
+        if v < 1 or v > MAX_DURATION_MINUTES:
+            raise ValueError(f"Duration must be between 1 and {MAX_DURATION_MINUTES} minutes")
+        return v
 
 class AppointmentUpdate(BaseModel):
     appointment_time: Optional[datetime] = None
@@ -32,6 +49,18 @@ class AppointmentUpdate(BaseModel):
     diagnosis: Optional[str] = None
     medicine_given: Optional[str] = None
 
+    @field_validator('appointment_time')
+    @classmethod
+    def validate_appointment_time(cls, v: Optional[datetime]) -> Optional[datetime]:
+        return _wall_clock(v) if v is not None else None
+
+    @field_validator('duration_minutes')
+    @classmethod
+    def validate_duration(cls, v: Optional[int]) -> Optional[int]:
+        if v is not None and (v < 1 or v > MAX_DURATION_MINUTES):
+            raise ValueError(f"Duration must be between 1 and {MAX_DURATION_MINUTES} minutes")
+        return v
+
 
 class Appointment(AppointmentBase):
     id: int
@@ -42,6 +71,22 @@ class Appointment(AppointmentBase):
     medicine_given: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
+
+class CalendarEntry(BaseModel):
+    """
+    One slot in the calendar view: a stored appointment, or an occurrence
+    of a recurring template that hasn't been generated yet (is_virtual,
+    no appointment_id).
+    """
+    appointment_id: Optional[int] = None
+    recurring_appointment_id: Optional[int] = None
+    patient_id: int
+    start: datetime
+    end: datetime
+    status: AppointmentStatus
+    notes: Optional[str] = None
+    is_virtual: bool = False
+
   
   
  
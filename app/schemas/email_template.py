@@ -0,0 +1,28 @@
+"""
+Email Template Schemas
+"""
+
+from pydantic import BaseModel, field_validator
+from typing import List, Optional
+from datetime import datetime
+from app.models.email_outbox import EmailKind
+
+
+class EmailTemplateUpdate(BaseModel):
+    body: str
+
+    @field_validator('body')
+    def validate_body(cls, v):
+        if not v.strip():
+            raise ValueError("Template body must not be empty")
+        if len(v) > 100_000:
+            raise ValueError("Template body must be at most 100000 characters")
+        return v
+
+
+class EmailTemplate(BaseModel):
+    kind: EmailKind
+    body: str
+    is_default: bool  # False when the tenant has its own override
+    variables: List[str]  # Names usable as ${name}
+    updated_at: Optional[datetime] = None
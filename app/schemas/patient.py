@@ -9,10 +9,30 @@ These schemas define what data is required/optional when:
 
 from datetime import date
 from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_validator
-from typing import Optional
+from typing import Dict, List, Optional
 import re
 
 
+def normalize_phone(v: str) -> str:
+    """Strip separators from a phone number; ValueError unless 10-15 digits"""
+    # Remove spaces, dashes, and parentheses
+    phone = v.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
+    # Check if it's a valid format (10-15 digits)
+    if not re.match(r'^\d{10,15}$', phone):
+        raise ValueError("Phone number must be 10-15 digits")
+    return phone
+
+
+def normalize_chip_number(v: str) -> str:
+    """Strip separators from a microchip number; ValueError unless 9-15 digits"""
+    # Remove spaces and dashes
+    chip = v.replace(' ', '').replace('-', '')
+    # Microchips are typically 9-15 digits
+    if not re.match(r'^\d{9,15}$', chip):
+        raise ValueError("Chip number must be 9-15 digits")
+    return chip
+
+
 class PatientBase(BaseModel):
     """
     Base Patient Schema
@@ -50,12 +70,7 @@ class PatientBase(BaseModel):
         """Validate and format phone number"""
         if v is None:
             return None
-        # Remove spaces, dashes, and parentheses
-        phone = v.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-        # Check if it's a valid format (10-15 digits)
-        if not re.match(r'^\d{10,15}$', phone):
-            raise ValueError("Phone number must be 10-15 digits")
-        return phone
+        return normalize_phone(v)
     
     @field_validator('species')
     @classmethod
@@ -86,12 +101,7 @@ class PatientBase(BaseModel):
         """Validate microchip number format"""
         if v is None:
             return None
-        # Remove spaces and dashes
-        chip = v.replace(' ', '').replace('-', '')
-        # Microchips are typically 9-15 digits
-        if not re.match(r'^\d{9,15}$', chip):
-            raise ValueError("Chip number must be 9-15 digits")
-        return chip
+        return normalize_chip_number(v)
 
 
 class PatientCreate(PatientBase):
@@ -133,6 +143,21 @@ class PatientUpdate(BaseModel):
     medical_history: Optional[str] = None
     allergies: Optional[str] = None
     special_notes: Optional[str] = None
+    
+    # Same normalisation as on create, so lookups by chip/phone still match
+    @field_validator('owner_phone')
+    @classmethod
+    def validate_phone(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return None
+        return normalize_phone(v)
+    
+    @field_validator('chip_number')
+    @classmethod
+    def validate_chip_number(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return None
+        return normalize_chip_number(v)
 
 
 class Patient(PatientBase):
@@ -155,6 +180,50 @@ class Patient(PatientBase):
     # Pydantic V2 config - allows reading from SQLAlchemy models
     model_config = ConfigDict(from_attributes=True)
 
+
+class PatientLookupRequest(BaseModel):
+    """
+    Schema for looking up many patients at once (import reconciliation)
+    
+    Values are normalised like chip_number/owner_phone on create; ones that
+    can't be are returned in `invalid` instead of failing the request.
+    """
+    chip_numbers: List[str] = Field(default_factory=list, max_length=500)
+    phones: List[str] = Field(default_factory=list, max_length=500)
+
+
+class PatientLookupResult(BaseModel):
+    """
+    Batch lookup result, keyed by the values exactly as sent
+    
+    chips: the patient with that chip, or null
+    phones: every patient whose owner has that phone (possibly none)
+    """
+    chips: Dict[str, Optional[Patient]] = {}
+    phones: Dict[str, List[Patient]] = {}
+    invalid: List[str] = []
+
+
+class PatientImportError(BaseModel):
+    """Why one row of an import file was skipped"""
+    row: int = Field(..., description="1-based data row (CSV: not counting the header)")
+    errors: List[str]
+
+
+class PatientImportReport(BaseModel):
+    """
+    Result of a bulk import
+    
+    Only the first 1000 row errors are listed (errors_truncated is then
+    true); `failed` counts all of them. `aborted` is set if the file
+    couldn't be parsed past some point - rows before it were imported.
+    """
+    imported: int
+    failed: int
+    errors: List[PatientImportError] = []
+    errors_truncated: bool = False
+    aborted: Optional[str] = None
+
     
     
 # Why PatientUpdate has all Optional fields?
@@ -2,10 +2,65 @@
 Recurring Appointment Schemas
 """
 
-from pydantic import BaseModel, ConfigDict, field_validator
-from typing import Optional
-from datetime import datetime, timezone
-from app.models.recurring_appointment import RecurrencePattern
+from pydantic import BaseModel, ConfigDict, field_serializer, field_validator, model_validator
+from typing import List, Optional
+from datetime import date, datetime, timezone
+from app.models.recurring_appointment import GenerationStatus, RecurrencePattern
+from app.models.appointment import MAX_DURATION_MINUTES
+from app.services.recurrence import parse_weekday
+
+
+def _validate_weekdays(v: Optional[List[str]]) -> Optional[List[str]]:
+    """'mo', ' 1mo' -> 'MO', '1MO'; raises ValueError on anything else"""
+    if not v:
+        return None
+    tokens = [token.strip().upper() for token in v]
+    for token in tokens:
+        parse_weekday(token)
+    return tokens
+
+
+def _validate_month_days(v: Optional[List[int]]) -> Optional[List[int]]:
+    if not v:
+        return None
+    for day in v:
+        if day == 0 or not -31 <= day <= 31:
+            raise ValueError("Month days must be 1..31, or -31..-1 counting from the end of the month")
+    return sorted(set(v))
+
+
+def _validate_time_of_day(v: str) -> str:
+    """Validate time format is HH:MM"""
+    try:
+        hour, minute = v.split(':')
+        hour_int = int(hour)
+        minute_int = int(minute)
+        if not (0 <= hour_int < 24 and 0 <= minute_int < 60):
+            raise ValueError("Invalid time")
+        return v
+    except (ValueError, AttributeError):
+        raise ValueError("Time must be in HH:MM format (e.g., '09:00')")
+
+
+def _validate_interval(v: int) -> int:
+    """Interval must be positive"""
+    if v < 1:
+        raise ValueError("Interval must be at least 1")
+    return v
+
+
+def _validate_duration(v: int) -> int:
+    """Duration must fit in a business day (check_time_conflict relies on the cap)"""
+    if v < 1 or v > MAX_DURATION_MINUTES:
+        raise ValueError(f"Duration must be between 1 and {MAX_DURATION_MINUTES} minutes")
+    return v
+
+
+def check_weekday_ordinals(pattern: RecurrencePattern, by_weekday: Optional[List[str]]) -> None:
+    """'1MO' (first Monday) only means something within a month or year"""
+    ordinals = [token for token in by_weekday or () if token[0] in "+-0123456789"]
+    if ordinals and pattern in (RecurrencePattern.daily, RecurrencePattern.weekly):
+        raise ValueError("Weekday ordinals like 1MO need a monthly or yearly pattern")
 
 
 class RecurringAppointmentBase(BaseModel):
@@ -16,32 +71,49 @@ class RecurringAppointmentBase(BaseModel):
     time_of_day: str  # "09:00" format
     duration_minutes: int = 30
     notes: Optional[str] = None
+    # RRULE-style refinements (see app/services/recurrence.py)
+    by_weekday: Optional[List[str]] = None  # ["MO", "TH"]; ["1MO"], ["-1FR"] for monthly/yearly
+    by_month_day: Optional[List[int]] = None  # [1, 15]; [-1] = last day of the month
+    exception_dates: Optional[List[date]] = None  # occurrences on these dates are skipped
+    
+    # Stored in a JSON column, so keep dates as ISO strings
+    @field_serializer('exception_dates')
+    def serialize_exception_dates(self, v: Optional[List[date]]) -> Optional[List[str]]:
+        return [day.isoformat() for day in v] if v else None
 
 
 class RecurringAppointmentCreate(RecurringAppointmentBase):
     patient_id: int
     
+    @field_validator('by_weekday')
+    @classmethod
+    def validate_by_weekday(cls, v: Optional[List[str]]) -> Optional[List[str]]:
+        return _validate_weekdays(v)
+    
+    @field_validator('by_month_day')
+    @classmethod
+    def validate_by_month_day(cls, v: Optional[List[int]]) -> Optional[List[int]]:
+        return _validate_month_days(v)
+    
+    @model_validator(mode='after')
+    def validate_weekday_ordinals(self):
+        check_weekday_ordinals(self.pattern, self.by_weekday)
+        return self
+    
     @field_validator('time_of_day')
     @classmethod
     def validate_time_format(cls, v: str) -> str:
-        """Validate time format is HH:MM"""
-        try:
-            hour, minute = v.split(':')
-            hour_int = int(hour)
-            minute_int = int(minute)
-            if not (0 <= hour_int < 24 and 0 <= minute_int < 60):
-                raise ValueError("Invalid time")
-            return v
-        except (ValueError, AttributeError):
-            raise ValueError("Time must be in HH:MM format (e.g., '09:00')")
+        return _validate_time_of_day(v)
     
     @field_validator('interval')
     @classmethod
     def validate_interval(cls, v: int) -> int:
-        """Interval must be positive"""
-        if v < 1:
-            raise ValueError("Interval must be at least 1")
-        return v
+        return _validate_interval(v)
+    
+    @field_validator('duration_minutes')
+    @classmethod
+    def validate_duration(cls, v: int) -> int:
+        return _validate_duration(v)
     
     @field_validator('start_date')
     @classmethod
@@ -61,6 +133,53 @@ class RecurringAppointmentUpdate(BaseModel):
     duration_minutes: Optional[int] = None
     notes: Optional[str] = None
     is_active: Optional[bool] = None
+    by_weekday: Optional[List[str]] = None
+    by_month_day: Optional[List[int]] = None
+    exception_dates: Optional[List[date]] = None
+    
+    @field_validator('by_weekday')
+    @classmethod
+    def validate_by_weekday(cls, v: Optional[List[str]]) -> Optional[List[str]]:
+        return _validate_weekdays(v)
+    
+    @field_validator('by_month_day')
+    @classmethod
+    def validate_by_month_day(cls, v: Optional[List[int]]) -> Optional[List[int]]:
+        return _validate_month_days(v)
+    
+    # Omitted means unchanged; null isn't a value these columns can hold
+    @field_validator('pattern', 'interval', 'start_date', 'time_of_day', 'duration_minutes', 'is_active')
+    @classmethod
+    def validate_not_null(cls, v, info):
+        if v is None:
+            raise ValueError(f"{info.field_name} can't be null")
+        return v
+    
+    @field_validator('time_of_day')
+    @classmethod
+    def validate_time_format(cls, v: str) -> str:
+        return _validate_time_of_day(v)
+    
+    @field_validator('interval')
+    @classmethod
+    def validate_interval(cls, v: int) -> int:
+        return _validate_interval(v)
+    
+    @field_validator('duration_minutes')
+    @classmethod
+    def validate_duration(cls, v: int) -> int:
+        return _validate_duration(v)
+    
+    @model_validator(mode='after')
+    def validate_weekday_ordinals(self):
+        # Both in the request; the endpoint checks the merged template too
+        if self.pattern is not None:
+            check_weekday_ordinals(self.pattern, self.by_weekday)
+        return self
+    
+    @field_serializer('exception_dates')
+    def serialize_exception_dates(self, v: Optional[List[date]]) -> Optional[List[str]]:
+        return [day.isoformat() for day in v] if v else None
 
 
 class RecurringAppointment(RecurringAppointmentBase):
@@ -70,6 +189,11 @@ class RecurringAppointment(RecurringAppointmentBase):
     is_active: bool
     created_at: datetime
     last_generated: Optional[datetime] = None
+    # Background generation progress
+    generation_status: GenerationStatus
+    generated_until: Optional[datetime] = None
+    last_generated_count: Optional[int] = None
+    generation_error: Optional[str] = None
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -88,3 +88,8 @@ Token.model_rebuild()
 class TokenData(BaseModel):
     """Data extracted from a decoded JWT token."""
     email: str
+    # Claims below are missing from tokens issued before they were added
+    user_id: Optional[int] = None
+    tenant_id: Optional[int] = None
+    is_superuser: bool = False
+    token_version: Optional[int] = None
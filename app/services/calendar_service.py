@@ -4,24 +4,109 @@ Handles OAuth2 authentication and calendar event synchronization
 
 USAGE:
 1. User authorizes via OAuth2
-2. Store access token
-3. Use token to create/update calendar events
+2. Store the token info in the tenant's CalendarConnection
+3. Pass the connection to create/update calendar events
+
+API clients are built once per tenant and reused (bounded LRU, see
+GOOGLE_CLIENT_CACHE_*): the Calendar discovery document is the one bundled
+with google-api-python-client, parsed once per process, so building a
+client needs no network and syncing many appointments reuses one client
+and its HTTP connection. Expired access tokens are refreshed by the
+client; the refreshed token info is written back to the connection, for
+the caller's commit to save.
+
+sync_events sends many inserts/updates/deletes through the Calendar batch
+endpoint, BATCH_SIZE calls per HTTP request (used by
+app/services/calendar_sync.py). Set GOOGLE_CALENDAR_TRANSPORT=fake to talk
+to an in-memory FakeCalendarHttp instead of Google (offline development,
+tests).
 """
 
-from typing import Optional
+from contextlib import contextmanager
+from email.parser import BytesParser
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+from google.auth.exceptions import RefreshError
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
 from app.config import settings
 from app.models.appointment import Appointment
+from app.models.calendar_connection import CalendarConnection
+from app.utils.cache import TTLCache
 from datetime import timedelta
+import httplib2
+import itertools
+import json
 import logging
+import re
+import threading
 
 logger = logging.getLogger(__name__)
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Calls per batch HTTP request (Google's recommended maximum for Calendar)
+BATCH_SIZE = 50
+
+
+@lru_cache(maxsize=1)
+def _discovery_document() -> dict:
+    """Calendar v3 discovery document shipped with the client library (static discovery)"""
+    return json.loads(discovery_cache.get_static_doc('calendar', 'v3'))
+
+
+class _Client:
+    """A tenant's Calendar API client: credentials, events resource, HTTP connection"""
+    
+    def __init__(self, credentials: Credentials, http=None):
+        self.credentials = credentials
+        document = _discovery_document()
+        endpoint = settings.google_calendar_api_endpoint
+        if http is not None:
+            # Fake transport; credentials go unused
+            self.service = build_from_document(document, http=http)
+        else:
+            client_options = {"api_endpoint": endpoint} if endpoint else None
+            self.service = build_from_document(document, credentials=credentials, client_options=client_options)
+        # The batch URL always comes from the document's rootUrl; follow the endpoint override
+        self.batch_uri = (endpoint or document['rootUrl']) + document['batchPath']
+        # service.events() builds a new resource from the discovery document on every call
+        self.events = self.service.events()
+        # httplib2 connections aren't thread-safe
+        self.lock = threading.Lock()
+
+
+def _event_body(appointment: Appointment) -> Dict[str, Any]:
+    end_time = appointment.appointment_time + timedelta(minutes=appointment.duration_minutes)
+    
+    patient = appointment.patient
+    patient_name = patient.pet_name if hasattr(patient, 'pet_name') else f"Patient {patient.id}"
+    
+    return {
+        'summary': f'Appointment: {patient_name}',
+        'description': appointment.notes or f'Appointment for {patient_name}',
+        'start': {
+            'dateTime': appointment.appointment_time.isoformat(),
+            'timeZone': 'UTC',
+        },
+        'end': {
+            'dateTime': end_time.isoformat(),
+            'timeZone': 'UTC',
+        },
+        'reminders': {
+            'useDefault': False,
+            'overrides': [
+                {'method': 'email', 'minutes': 24 * 60},
+                {'method': 'popup', 'minutes': 60},
+            ],
+        },
+    }
+
 
 class CalendarService:
     """Service for Google Calendar integration."""
@@ -42,6 +127,13 @@ class CalendarService:
                     "redirect_uris": [settings.google_redirect_uri]
                 }
             }
+        self.fake = FakeCalendarHttp() if settings.google_calendar_transport == "fake" else None
+        # tenant_id -> _Client
+        self._clients = TTLCache(
+            "google_calendar_client",
+            ttl_seconds=settings.google_client_cache_ttl_seconds,
+            max_size=settings.google_client_cache_max_size,
+        )
     
     def get_authorization_url(self, tenant_id: int, state: Optional[str] = None) -> tuple[str, Flow]:
         """Generate OAuth2 authorization URL."""
@@ -79,46 +171,51 @@ class CalendarService:
             'expiry': credentials.expiry.isoformat() if credentials.expiry else None
         }
     
+    def _client(self, connection: CalendarConnection) -> _Client:
+        token_info = connection.token_info
+        client = self._clients.get(connection.tenant_id)
+        # A reconnect (new refresh token) replaces the cached client
+        if client is None or client.credentials.refresh_token != token_info.get('refresh_token'):
+            client = _Client(Credentials.from_authorized_user_info(token_info, SCOPES), http=self.fake)
+            self._clients.set(connection.tenant_id, client)
+        return client
+    
+    @contextmanager
+    def _session(self, connection: CalendarConnection) -> Iterator[_Client]:
+        """The tenant's client, for one or more API calls"""
+        client = self._client(connection)
+        with client.lock:
+            token = client.credentials.token
+            try:
+                yield client
+            except RefreshError:
+                # Revoked or invalid grant; don't keep a client that can't authenticate
+                self.forget_client(connection.tenant_id)
+                raise
+            finally:
+                if client.credentials.token != token:
+                    # Refreshed during the call
+                    connection.token_info = json.loads(client.credentials.to_json())
+    
+    def forget_client(self, tenant_id: int) -> None:
+        """Drop a tenant's cached client (disconnect, revoked access)"""
+        self._clients.invalidate(tenant_id)
+    
     def create_calendar_event(
         self,
         appointment: Appointment,
-        access_token: str,
-        calendar_id: str = 'primary'
+        connection: CalendarConnection
     ) -> Optional[str]:
-        """Create a calendar event for an appointment."""
+        """
+        Create a calendar event for an appointment.
+        May refresh connection.token_info; commit the connection afterwards.
+        """
         try:
-            credentials = Credentials(token=access_token)
-            service = build('calendar', 'v3', credentials=credentials)
-            
-            end_time = appointment.appointment_time + timedelta(minutes=appointment.duration_minutes)
-            
-            patient = appointment.patient
-            patient_name = patient.pet_name if hasattr(patient, 'pet_name') else f"Patient {patient.id}"
-            
-            event = {
-                'summary': f'Appointment: {patient_name}',
-                'description': appointment.notes or f'Appointment for {patient_name}',
-                'start': {
-                    'dateTime': appointment.appointment_time.isoformat(),
-                    'timeZone': 'UTC',
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': 'UTC',
-                },
-                'reminders': {
-                    'useDefault': False,
-                    'overrides': [
-                        {'method': 'email', 'minutes': 24 * 60},
-                        {'method': 'popup', 'minutes': 60},
-                    ],
-                },
-            }
-            
-            created_event = service.events().insert(
-                calendarId=calendar_id,
-                body=event
-            ).execute()
+            with self._session(connection) as client:
+                created_event = client.events.insert(
+                    calendarId=connection.calendar_id,
+                    body=_event_body(appointment)
+                ).execute()
             
             logger.info(f"Created calendar event {created_event['id']} for appointment {appointment.id}")
             return created_event['id']
@@ -134,23 +231,173 @@ class CalendarService:
         self,
         event_id: str,
         appointment: Appointment,
-        access_token: str,
-        calendar_id: str = 'primary'
+        connection: CalendarConnection
     ) -> bool:
-        """Update an existing calendar event."""
-        # TODO: Implement event update
-        # HINT: Use service.events().update() instead of insert()
-        return False
+        """
+        Update an existing calendar event.
+        May refresh connection.token_info; commit the connection afterwards.
+        """
+        try:
+            with self._session(connection) as client:
+                client.events.update(
+                    calendarId=connection.calendar_id,
+                    eventId=event_id,
+                    body=_event_body(appointment)
+                ).execute()
+            return True
+        except HttpError as e:
+            logger.error(f"Error updating calendar event {event_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error updating calendar event {event_id}: {e}")
+            return False
     
     def delete_calendar_event(
         self,
         event_id: str,
-        access_token: str,
-        calendar_id: str = 'primary'
+        connection: CalendarConnection
     ) -> bool:
-        """Delete a calendar event."""
-        # TODO: Implement event deletion
-        return False
+        """Delete a calendar event (True if it's gone, including already deleted)."""
+        try:
+            with self._session(connection) as client:
+                client.events.delete(calendarId=connection.calendar_id, eventId=event_id).execute()
+            return True
+        except HttpError as e:
+            if e.resp.status in (404, 410):
+                return True
+            logger.error(f"Error deleting calendar event {event_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error deleting calendar event {event_id}: {e}")
+            return False
+    
+    def sync_events(
+        self,
+        connection: CalendarConnection,
+        operations: List[Tuple[str, Appointment]]
+    ) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        """
+        Run ("insert" | "update" | "delete", appointment) operations through
+        the batch endpoint, BATCH_SIZE per HTTP request. Returns
+        (event id, error) per operation: the new id for inserts, the
+        existing one for updates, None for deletes; error is the HttpError
+        of a failed call, or the exception that failed its whole batch.
+        Raises RefreshError if the tenant's authorization is no longer
+        valid. May refresh connection.token_info; commit it afterwards.
+        """
+        results: List[Tuple[Optional[str], Optional[Exception]]] = [(None, None)] * len(operations)
+        
+        def callback(request_id: str, response, exception: Optional[HttpError]) -> None:
+            index = int(request_id)
+            kind, appointment = operations[index]
+            if exception is not None:
+                results[index] = (None, exception)
+            elif kind == "insert":
+                results[index] = (response["id"], None)
+            elif kind == "update":
+                results[index] = (appointment.google_calendar_event_id, None)
+        
+        with self._session(connection) as client:
+            for start in range(0, len(operations), BATCH_SIZE):
+                batch = BatchHttpRequest(callback=callback, batch_uri=client.batch_uri)
+                for index in range(start, min(start + BATCH_SIZE, len(operations))):
+                    kind, appointment = operations[index]
+                    if kind == "insert":
+                        request = client.events.insert(calendarId=connection.calendar_id, body=_event_body(appointment))
+                    elif kind == "update":
+                        request = client.events.update(
+                            calendarId=connection.calendar_id,
+                            eventId=appointment.google_calendar_event_id,
+                            body=_event_body(appointment)
+                        )
+                    else:
+                        request = client.events.delete(
+                            calendarId=connection.calendar_id,
+                            eventId=appointment.google_calendar_event_id
+                        )
+                    batch.add(request, request_id=str(index))
+                try:
+                    batch.execute()
+                except RefreshError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Calendar batch request failed for tenant {connection.tenant_id}: {e}")
+                    for index in range(start, min(start + BATCH_SIZE, len(operations))):
+                        results[index] = (None, e)
+        return results
+
+
+# ==========================================
+# FAKE
+# ==========================================
+
+class FakeCalendarHttp:
+    """
+    Offline stand-in for the Calendar API at the HTTP level (an httplib2.Http
+    replacement): events insert/update/delete, single or through the batch
+    endpoint. Events are kept in memory, per calendar; requests counts HTTP
+    calls (a batch is one).
+    """
+    
+    _EVENTS_PATH_RE = re.compile(r"/calendars/([^/]+)/events(?:/([^/?]+))?$")
+    
+    def __init__(self):
+        self.events: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None, connection_type=None):
+        with self._lock:
+            self.requests += 1
+            if "/batch/" in uri:
+                return self._batch(body, headers or {})
+            status, content = self._call(method, urlsplit(uri).path, body)
+            return httplib2.Response({"status": status, "content-type": "application/json"}), content
+    
+    def _call(self, method: str, path: str, body) -> Tuple[int, bytes]:
+        match = self._EVENTS_PATH_RE.search(path)
+        if not match:
+            return 404, b'{"error": {"code": 404, "message": "Not Found"}}'
+        calendar = self.events.setdefault(unquote(match.group(1)), {})
+        event_id = match.group(2) and unquote(match.group(2))
+        if isinstance(body, bytes):
+            body = body.decode()
+        
+        if method == "POST" and not event_id:
+            event = dict(json.loads(body or "{}"), id=f"fake{next(self._ids)}")
+            calendar[event["id"]] = event
+            return 200, json.dumps(event).encode()
+        if event_id not in calendar:
+            return 404, b'{"error": {"code": 404, "message": "Not Found"}}'
+        if method == "PUT":
+            calendar[event_id] = dict(json.loads(body or "{}"), id=event_id)
+            return 200, json.dumps(calendar[event_id]).encode()
+        if method == "DELETE":
+            del calendar[event_id]
+            return 204, b""
+        return 405, b'{"error": {"code": 405, "message": "Method Not Allowed"}}'
+    
+    def _batch(self, body, headers: Dict[str, str]):
+        if isinstance(body, str):
+            body = body.encode()
+        content_type = {k.lower(): v for k, v in headers.items()}["content-type"]
+        message = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        boundary = "fake_batch_response"
+        parts = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition("\n")
+            method, path, _ = request_line.split(" ", 2)
+            _, _, request_body = rest.replace("\r\n", "\n").partition("\n\n")
+            status, content = self._call(method, urlsplit(path).path, request_body)
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\n\r\n{content.decode()}\r\n"
+            )
+        content = ("".join(parts) + f"--{boundary}--\r\n").encode()
+        return httplib2.Response({"status": 200, "content-type": f"multipart/mixed; boundary={boundary}"}), content
 
 
 calendar_service = CalendarService()
@@ -0,0 +1,237 @@
+"""
+Google Calendar Sync
+Pushes a tenant's appointment changes to its Google Calendar in batches
+
+Run every CALENDAR_SYNC_INTERVAL_SECONDS by the background scheduler
+(leader only) for every connected tenant, or on demand through
+POST /calendar/sync. Each page of PAGE_SIZE appointments:
+- is loaded in one query: changed since the connection's watermark
+  (updated_at > synced_until), served by ix_appointments_tenant_id_updated_at
+- becomes inserts (no event yet), updates, and deletes (cancelled with an
+  event), sent through the Calendar batch endpoint, 50 calls per HTTP
+  request (CalendarService.sync_events)
+- has its new event ids written back with one executemany UPDATE, then
+  is committed
+
+The watermark stops SETTLE_SECONDS short of now, so a transaction that
+commits a little after its updated_at is still picked up by the next run.
+A failure that may go away (5xx, rate limit, network) holds the watermark
+just below that appointment, so it's sent again next run, along with
+anything changed after it (updates are idempotent). After MAX_HELD_RUNS
+runs in a row that held it, the watermark moves on anyway and the
+failures are logged as given up (a full-day resync sends them again).
+Calls Google rejects (other 4xx, including a 403 that isn't a rate limit)
+are logged and not retried.
+
+With `day`, every appointment on that day is pushed whatever the
+watermark says (full-day resync), and the watermark isn't moved.
+
+USAGE:
+    with SessionLocal() as db:
+        stats = sync_calendar(db, tenant_id)
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from googleapiclient.errors import HttpError
+from sqlalchemy import bindparam, or_, select, tuple_, update
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.appointment import Appointment, AppointmentStatus
+from app.models.calendar_connection import CalendarConnection
+from app.services.calendar_service import calendar_service
+
+logger = logging.getLogger(__name__)
+
+# Appointments per query / commit (each page is ceil(PAGE_SIZE / 50) batch requests)
+PAGE_SIZE = 500
+
+# Longer than any write transaction (see DB_STATEMENT_TIMEOUT_MS)
+SETTLE_SECONDS = 60
+
+# Consecutive runs a retryable failure may hold the watermark
+# (12 = an hour at the default CALENDAR_SYNC_INTERVAL_SECONDS)
+MAX_HELD_RUNS = 12
+
+# Worth retrying next run; other 4xx are permanent
+_RETRYABLE_STATUSES = {401, 408, 429}
+
+# 403 reasons that mean "slow down" rather than "not allowed" (lowercase, no "_")
+_RATE_LIMIT_REASONS = {"ratelimitexceeded", "userratelimitexceeded", "quotaexceeded"}
+
+
+_STATS_KEY = {"insert": "inserted", "update": "updated", "delete": "deleted"}
+
+_appointments = Appointment.__table__
+_WRITE_EVENT_ID = (
+    update(_appointments)
+    .where(_appointments.c.id == bindparam("appointment_id"))
+    .values(google_calendar_event_id=bindparam("event_id"), updated_at=_appointments.c.updated_at)
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _operation(appointment: Appointment) -> Optional[str]:
+    if appointment.status == AppointmentStatus.cancelled:
+        return "delete" if appointment.google_calendar_event_id else None
+    return "update" if appointment.google_calendar_event_id else "insert"
+
+
+def _rate_limited(error: HttpError) -> bool:
+    details = error.error_details if isinstance(error.error_details, list) else []
+    reasons = {
+        str(detail.get("reason", "")).lower().replace("_", "")
+        for detail in details if isinstance(detail, dict)
+    }
+    return bool(reasons & _RATE_LIMIT_REASONS)
+
+
+def _retryable(error: Exception) -> bool:
+    if not isinstance(error, HttpError):
+        return True
+    if error.resp.status == 403:
+        # Also forbidden / forbiddenForNonOrganizer: retrying won't help
+        return _rate_limited(error)
+    return error.resp.status >= 500 or error.resp.status in _RETRYABLE_STATUSES
+
+
+def _page(
+    db: Session,
+    tenant_id: int,
+    since: Optional[datetime],
+    until: datetime,
+    day: Optional[date],
+    after: Optional[Tuple],
+) -> List[Appointment]:
+    query = (
+        select(Appointment)
+        .options(joinedload(Appointment.patient))
+        .where(
+            Appointment.tenant_id == tenant_id,
+            # Cancelled before it ever reached the calendar: nothing to do
+            or_(Appointment.status != AppointmentStatus.cancelled, Appointment.google_calendar_event_id.is_not(None)),
+        )
+        .limit(PAGE_SIZE)
+    )
+    if day is not None:
+        start = datetime.combine(day, time.min)
+        query = query.where(
+            Appointment.appointment_time >= start,
+            Appointment.appointment_time < start + timedelta(days=1),
+        ).order_by(Appointment.id)
+        if after is not None:
+            query = query.where(Appointment.id > after[1])
+    else:
+        query = query.where(Appointment.updated_at <= until).order_by(Appointment.updated_at, Appointment.id)
+        if since is not None:
+            query = query.where(Appointment.updated_at > since)
+        if after is not None:
+            query = query.where(tuple_(Appointment.updated_at, Appointment.id) > after)
+    return list(db.scalars(query).unique())
+
+
+def sync_calendar(
+    db: Session,
+    tenant_id: int,
+    day: Optional[date] = None,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Push the tenant's changed appointments (or all of `day`'s) to its calendar.
+    Returns {"inserted": n, "updated": n, "deleted": n, "failed": n}. Commits.
+    Raises google.auth.exceptions.RefreshError if the tenant must reconnect.
+    """
+    stats = {"inserted": 0, "updated": 0, "deleted": 0, "failed": 0}
+    connection = db.get(CalendarConnection, tenant_id)
+    if connection is None:
+        return stats
+
+    now = now or _utcnow()
+    until = now - timedelta(seconds=SETTLE_SECONDS)
+    since = connection.synced_until
+    # updated_at of the earliest failure worth retrying, and which ones failed
+    retry_from: Optional[datetime] = None
+    retry_ids: List[int] = []
+    after = None
+    while True:
+        page = _page(db, tenant_id, since, until, day, after)
+        if not page:
+            break
+
+        operations = [(kind, appointment) for appointment in page if (kind := _operation(appointment))]
+        results = calendar_service.sync_events(connection, operations)
+
+        event_ids, recreate_ids = [], []
+        for (kind, appointment), (event_id, error) in zip(operations, results):
+            if error is None:
+                stats[_STATS_KEY[kind]] += 1
+                if kind != "update":
+                    event_ids.append(dict(appointment_id=appointment.id, event_id=event_id))
+            elif isinstance(error, HttpError) and error.resp.status in (404, 410) and kind != "insert":
+                # Deleted in Google Calendar already
+                if kind == "delete":
+                    stats["deleted"] += 1
+                    event_ids.append(dict(appointment_id=appointment.id, event_id=None))
+                else:
+                    recreate_ids.append(appointment.id)
+            else:
+                stats["failed"] += 1
+                logger.warning(f"Calendar {kind} for appointment {appointment.id} (tenant {tenant_id}) failed: {error}")
+                if _retryable(error) and appointment.updated_at is not None:
+                    retry_from = min(retry_from or appointment.updated_at, appointment.updated_at)
+                    retry_ids.append(appointment.id)
+
+        if event_ids:
+            write_event_ids(db, event_ids)
+        if recreate_ids:
+            # Bumps updated_at: the next run inserts them again
+            db.execute(
+                update(Appointment)
+                .where(Appointment.id.in_(recreate_ids))
+                .values(google_calendar_event_id=None)
+                .execution_options(synchronize_session=False)
+            )
+        after = (page[-1].updated_at, page[-1].id)
+        # Also saves a refreshed access token (connection.token_info)
+        db.commit()
+        db.expunge_all()
+        connection = db.get(CalendarConnection, tenant_id)
+
+        if len(page) < PAGE_SIZE:
+            break
+
+    if day is None:
+        watermark = until
+        if retry_from is None:
+            connection.sync_held_runs = 0
+        elif connection.sync_held_runs + 1 >= MAX_HELD_RUNS:
+            logger.error(
+                f"Calendar sync for tenant {tenant_id}: giving up on appointments {retry_ids} "
+                f"after {MAX_HELD_RUNS} runs; a full-day resync sends them again"
+            )
+            connection.sync_held_runs = 0
+        else:
+            connection.sync_held_runs += 1
+            watermark = retry_from - timedelta(microseconds=1)
+        if since is None or watermark > since:
+            connection.synced_until = watermark
+        db.commit()
+    return stats
+
+
+def write_event_ids(db: Session, event_ids: List[Dict]) -> None:
+    """
+    Save [{"appointment_id", "event_id"}, ...] in one executemany, keeping each
+    row's current updated_at: recording the event isn't a change to sync
+    (and an edit made meanwhile still is). Doesn't commit.
+    """
+    db.execute(_WRITE_EVENT_ID, event_ids)
+
+
+def connected_tenants(db: Session) -> List[int]:
+    return list(db.scalars(select(CalendarConnection.tenant_id).order_by(CalendarConnection.tenant_id)))
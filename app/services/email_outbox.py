@@ -0,0 +1,200 @@
+"""
+Email Outbox Delivery
+Drains the email_outbox table through the configured transport
+
+Run every EMAIL_OUTBOX_POLL_SECONDS by the background scheduler (leader
+only). Each batch:
+- claims due rows (status pending, next_attempt_at passed) in one query,
+  FOR UPDATE SKIP LOCKED on PostgreSQL
+- renders them with each tenant's compiled template (cached per process,
+  see app/utils/email_templates.py)
+- sends them concurrently, at most EMAIL_SEND_CONCURRENCY requests at a
+  time; messages of the same tenant and kind share one request
+  (SendGrid personalizations, up to MAX_PERSONALIZATIONS recipients)
+- records every outcome with one executemany UPDATE and commits
+
+A failed send is retried after EMAIL_RETRY_BASE_SECONDS * 2^(attempts-1)
+(capped at EMAIL_RETRY_MAX_SECONDS, with jitter). After EMAIL_MAX_ATTEMPTS,
+or straight away for permanent failures (address rejected), the row is
+dead-lettered: status dead, last_error says why.
+
+USAGE:
+    with SessionLocal() as db:
+        stats = deliver_pending(db)
+"""
+
+import asyncio
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.email_outbox import EmailKind, EmailOutbox, OutboxStatus
+from app.utils.email_service import MAX_PERSONALIZATIONS, EmailDeliveryError, email_service
+from app.utils.email_templates import EmailTemplate, get_template, substitutions
+
+try:
+    from prometheus_client import Counter  # pyright: ignore[reportMissingImports]
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+if PROMETHEUS_AVAILABLE:
+    DELIVERIES = Counter("email_outbox_deliveries_total", "Outbox delivery attempts by outcome (sent, retry, dead)", ["outcome"])
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next try, after `attempts` failed ones"""
+    delay = min(settings.email_retry_base_seconds * 2 ** (attempts - 1), settings.email_retry_max_seconds)
+    # Jitter, so a provider outage doesn't turn into synchronized retry waves
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claim(db: Session, now: datetime, limit: int) -> List[EmailOutbox]:
+    query = (
+        select(EmailOutbox)
+        .where(EmailOutbox.status == OutboxStatus.pending, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    return list(db.scalars(query))
+
+
+async def _send_all(
+    transport,
+    batch: List[EmailOutbox],
+    templates: Dict[Tuple[int, EmailKind], EmailTemplate],
+    concurrency: int,
+) -> List[Optional[EmailDeliveryError]]:
+    """None for each delivered message, the error for each failed one"""
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Optional[EmailDeliveryError]] = [None] * len(batch)
+
+    async def send(index: int, html_body: str) -> None:
+        entry = batch[index]
+        async with semaphore:
+            try:
+                await transport.send(entry.recipient, entry.subject, html_body)
+            except EmailDeliveryError as e:
+                results[index] = e
+            except Exception as e:
+                results[index] = EmailDeliveryError(f"{type(e).__name__}: {e}")
+
+    async def send_group(html: str, indexes: List[int]) -> None:
+        async with semaphore:
+            try:
+                failed = await transport.send_batch(html, [
+                    dict(recipient=batch[i].recipient, subject=batch[i].subject, substitutions=substitutions(batch[i].substitutions))
+                    for i in indexes
+                ])
+            except Exception as e:
+                error = e if isinstance(e, EmailDeliveryError) else EmailDeliveryError(f"{type(e).__name__}: {e}")
+                failed = {position: error for position in range(len(indexes))}
+            for position, error in failed.items():
+                results[indexes[position]] = error
+
+    # Group by tenant and template
+    groups: Dict[Tuple[int, EmailKind], List[int]] = defaultdict(list)
+    tasks = []
+    for index, entry in enumerate(batch):
+        if entry.substitutions is not None:
+            groups[(entry.tenant_id, entry.kind)].append(index)
+        else:
+            tasks.append(send(index, entry.html_body))
+
+    batchable = hasattr(transport, "send_batch")
+    for key, indexes in groups.items():
+        template = templates[key]
+        if batchable and len(indexes) > 1:
+            for start in range(0, len(indexes), MAX_PERSONALIZATIONS):
+                tasks.append(send_group(template.shared_html, indexes[start:start + MAX_PERSONALIZATIONS]))
+        else:
+            bodies = template.render_many([batch[i].substitutions for i in indexes])
+            tasks.extend(send(index, body) for index, body in zip(indexes, bodies))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def deliver_pending(
+    db: Session,
+    transport=None,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Deliver every outbox row that is due, one committed batch at a time.
+    Returns {"sent": n, "retry": n, "dead": n}.
+    """
+    transport = transport or email_service.transport
+    batch_size = batch_size or settings.email_outbox_batch_size
+    concurrency = concurrency or settings.email_send_concurrency
+    stats = {"sent": 0, "retry": 0, "dead": 0}
+    if transport is None:
+        return stats
+
+    # Rows retried during this call aren't due again until after it
+    started = _utcnow()
+    while True:
+        batch = _claim(db, started, batch_size)
+        if not batch:
+            break
+
+        # Compiled templates come from a per-process cache; at most one query per tenant and kind on a miss
+        templates = {
+            key: get_template(db, *key)
+            for key in {(entry.tenant_id, entry.kind) for entry in batch if entry.substitutions is not None}
+        }
+        errors = asyncio.run(_send_all(transport, batch, templates, concurrency))
+        now = _utcnow()
+        changes = []
+        for entry, error in zip(batch, errors):
+            attempts = entry.attempts + 1
+            if error is None:
+                outcome = "sent"
+                changes.append(dict(id=entry.id, status=OutboxStatus.sent, attempts=attempts, sent_at=now, last_error=None))
+            elif error.permanent or attempts >= settings.email_max_attempts:
+                outcome = "dead"
+                logger.error(f"Email {entry.id} ({entry.kind.value} to {entry.recipient}) dead-lettered after {attempts} attempts: {error}")
+                changes.append(dict(id=entry.id, status=OutboxStatus.dead, attempts=attempts, last_error=str(error)[:500]))
+            else:
+                outcome = "retry"
+                changes.append(dict(
+                    id=entry.id, attempts=attempts, last_error=str(error)[:500],
+                    next_attempt_at=now + retry_delay(attempts),
+                ))
+            stats[outcome] += 1
+            if PROMETHEUS_AVAILABLE:
+                DELIVERIES.labels(outcome).inc()
+
+        # Bulk UPDATE by primary key (one executemany per distinct column set)
+        db.execute(update(EmailOutbox), changes)
+        # Also releases the batch's row locks
+        db.commit()
+        db.expunge_all()
+
+        if len(batch) < batch_size:
+            break
+    return stats
+
+
+def purge_sent(db: Session, older_than_days: int = 30) -> int:
+    """Delete delivered messages older than `older_than_days` (dead ones are kept). Commits."""
+    cutoff = _utcnow() - timedelta(days=older_than_days)
+    deleted = db.execute(
+        delete(EmailOutbox).where(EmailOutbox.status == OutboxStatus.sent, EmailOutbox.sent_at < cutoff)
+    ).rowcount
+    db.commit()
+    return deleted
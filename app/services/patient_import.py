@@ -0,0 +1,258 @@
+"""
+Patient Import Service
+Bulk-loads patients from a CSV or NDJSON stream (new-tenant onboarding)
+
+- The request body is parsed as it arrives; only the current batch is
+  held in memory, whatever the file size
+- Each row is validated with PatientCreate; bad rows are reported by row
+  number and skipped, the rest of the file is still imported
+- Valid rows are inserted BATCH_SIZE at a time with one multi-row INSERT
+  and one commit per batch (no per-row commit/refresh)
+
+Bulk INSERTs bypass the mapper listeners, so each batch also updates the
+dashboard rollups (count_new_patients) and the in-process search index
+(queue_index_update) itself, in the same transaction.
+
+USAGE:
+    rows = csv_records(request.stream())
+    report = await import_patients(db, tenant_id, rows)
+"""
+
+import asyncio
+import codecs
+import csv
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.patient import Patient
+from app.models.tenant_daily_stats import count_new_patients
+from app.schemas.patient import PatientCreate
+from app.services.patient_search import queue_index_update
+
+BATCH_SIZE = 500
+# A single CSV record / NDJSON line larger than this aborts the import
+MAX_RECORD_BYTES = 1024 * 1024
+# Only the first errors are returned; the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = ("pet_name", "species", "owner_first_name", "owner_last_name")
+
+
+class ImportFormatError(ValueError):
+    """The stream can't be parsed any further (bad header, oversized record)"""
+
+
+# ==========================================
+# STREAM PARSING
+# ==========================================
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream as UTF-8 (BOM optional) and yield its lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+        if len(pending) > MAX_RECORD_BYTES:
+            raise ImportFormatError(f"Line longer than {MAX_RECORD_BYTES} bytes")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (row number, dict) per CSV record; row 1 is the first line after
+    the header. Empty cells become None.
+    A quoted field may contain newlines: a record only ends at a newline
+    once its quotes are balanced (escaped quotes are doubled, so counting
+    them is enough).
+    """
+    header: Optional[List[str]] = None
+    record = ""
+    row_number = 0
+    async for line in _lines(chunks):
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            if len(record) > MAX_RECORD_BYTES:
+                raise ImportFormatError(f"Record longer than {MAX_RECORD_BYTES} bytes (unbalanced quote?)")
+            continue
+        text, record = record.rstrip("\r"), ""
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            missing = [name for name in REQUIRED_COLUMNS if name not in header]
+            if missing:
+                raise ImportFormatError(f"CSV header is missing columns: {', '.join(missing)}")
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row_number, {name: value or None for name, value in zip(header, values)}
+
+    if record:
+        raise ImportFormatError("Unterminated quoted field at end of file")
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (row number, object) per non-blank NDJSON line"""
+    row_number = 0
+    async for line in _lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, f"Invalid JSON: {e.msg}"
+
+
+# ==========================================
+# VALIDATION + INSERT
+# ==========================================
+
+def _validate(batch: List[Tuple[int, Any]]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, List[str]]]]:
+    """Split raw records into (row, values) for valid rows and (row, messages) for the rest"""
+    valid, errors = [], []
+    for row_number, record in batch:
+        if isinstance(record, str):
+            errors.append((row_number, [record]))
+            continue
+        if not isinstance(record, dict):
+            errors.append((row_number, ["Expected an object"]))
+            continue
+        try:
+            valid.append((row_number, PatientCreate.model_validate(record).model_dump()))
+        except ValidationError as e:
+            errors.append((row_number, [
+                f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+                for error in e.errors()
+            ]))
+    return valid, errors
+
+
+class ImportReport:
+    """Running totals for one import"""
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.aborted: Optional[str] = None
+
+    def add_error(self, row_number: int, messages: List[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "errors": messages})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "aborted": self.aborted,
+        }
+
+
+async def _insert(db: AsyncSession, tenant_id: int, rows: List[Dict[str, Any]]) -> None:
+    """Insert one batch and its rollup/search-index side effects, then commit"""
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        row.update(tenant_id=tenant_id, created_at=now, updated_at=now)
+
+    ids = (await db.scalars(
+        insert(Patient).returning(Patient.id, sort_by_parameter_order=True), rows
+    )).all()
+
+    def side_effects(session):
+        count_new_patients(session.connection(), tenant_id, (row["created_at"] for row in rows))
+        for patient_id, row in zip(ids, rows):
+            queue_index_update(session, tenant_id, patient_id, row)
+
+    await db.run_sync(side_effects)
+    await db.commit()
+
+
+async def _import_batch(db: AsyncSession, tenant_id: int, batch: List[Tuple[int, Any]], report: ImportReport) -> None:
+    valid, errors = await asyncio.get_running_loop().run_in_executor(None, _validate, batch)
+    for row_number, messages in errors:
+        report.add_error(row_number, messages)
+
+    # chip_number is unique across all tenants: drop duplicates within the
+    # batch and chips already stored (including earlier batches) up front,
+    # so one bad row doesn't fail the whole INSERT
+    chips = {values["chip_number"] for _, values in valid if values["chip_number"]}
+    taken = set()
+    if chips:
+        taken = set((await db.scalars(
+            select(Patient.chip_number).where(Patient.chip_number.in_(chips))
+        )).all())
+
+    rows = []
+    for row_number, values in valid:
+        chip = values["chip_number"]
+        if chip and chip in taken:
+            report.add_error(row_number, [f"chip_number: {chip} is already registered"])
+            continue
+        if chip:
+            taken.add(chip)
+        rows.append((row_number, values))
+    if not rows:
+        return
+
+    try:
+        await _insert(db, tenant_id, [values for _, values in rows])
+        report.imported += len(rows)
+    except IntegrityError:
+        # Lost a race with a concurrent write; find the offending rows one by one
+        await db.rollback()
+        for row_number, values in rows:
+            try:
+                await _insert(db, tenant_id, [values])
+                report.imported += 1
+            except IntegrityError as e:
+                await db.rollback()
+                report.add_error(row_number, [f"Rejected by database: {e.orig}"])
+
+
+async def import_patients(
+    db: AsyncSession,
+    tenant_id: int,
+    records: AsyncIterator[Tuple[int, Any]],
+    batch_size: int = BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Validate and insert every record from csv_records()/ndjson_records().
+    Batches are committed as they go. If parsing fails before any row,
+    ImportFormatError is raised; if it fails part-way, the rows read so far
+    are still imported and the report's `aborted` says why it stopped.
+    """
+    report = ImportReport()
+    batch: List[Tuple[int, Any]] = []
+    try:
+        async for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                await _import_batch(db, tenant_id, batch, report)
+                batch = []
+    except ImportFormatError as e:
+        if not (batch or report.imported or report.failed):
+            raise
+        report.aborted = str(e)
+    if batch:
+        await _import_batch(db, tenant_id, batch, report)
+    return report.as_dict()
@@ -0,0 +1,403 @@
+"""
+Patient Search Service
+Ranked search over pet name, owner names, phone, email and chip number
+
+PostgreSQL:
+- patients.search_vector: generated tsvector (pet name weight A, owner
+  names B, contact/chip C), GIN-indexed, for word-prefix matches
+- patients.search_text: generated lower-cased concatenation of the same
+  fields, GIN-indexed with pg_trgm, for substring matches
+  Both columns are created by Alembic and are not mapped on the model.
+
+SQLite (development):
+- No text indexes, so each worker keeps an in-process n-gram index per
+  tenant (PatientNgramIndex), built on first use and rebuilt after
+  search_index_ttl_seconds. Committed changes made through the ORM in
+  this process are applied right away.
+
+USAGE:
+    patients = await search_patients(db, tenant_id, "rex doe", skip=0, limit=50)
+"""
+
+import asyncio
+import re
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, event, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.config import settings
+from app.models.patient import Patient
+from app.utils.cache import TTLCache
+
+# Searchable columns, in index order
+SEARCH_FIELDS = (
+    "pet_name",
+    "owner_first_name",
+    "owner_last_name",
+    "owner_phone",
+    "owner_email",
+    "chip_number",
+)
+# Subset used by /patients/search/by_name
+NAME_FIELDS = ("pet_name", "owner_first_name", "owner_last_name")
+
+# Ranking weight per field (pet and owner names matter most)
+FIELD_WEIGHTS = (4, 3, 3, 2, 1, 2)
+
+_TERM_RE = re.compile(r"[^\s]+")
+_WORD_SPLIT_RE = re.compile(r"[\s@.\-_+()]+")
+
+
+def search_terms(query: str) -> List[str]:
+    """Lower-cased whitespace-separated terms; every term must match."""
+    return _TERM_RE.findall(query.lower())
+
+
+# ==========================================
+# POSTGRESQL
+# ==========================================
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _tsquery(terms: Sequence[str], weights: str) -> Optional[str]:
+    """'rex:*AB & doe:*AB' from the word characters of the terms"""
+    words = [word for term in terms for word in re.findall(r"\w+", term)]
+    if not words:
+        return None
+    return " & ".join(f"{word}:*{weights}" for word in words)
+
+
+async def _search_postgresql(
+    db: AsyncSession,
+    tenant_id: int,
+    terms: Sequence[str],
+    fields: Sequence[str],
+    skip: int,
+    limit: int,
+) -> List[Patient]:
+    search_vector = literal_column("patients.search_vector")
+    search_text = literal_column("patients.search_text")
+    names_only = tuple(fields) == NAME_FIELDS
+
+    # Substring arm: every term is somewhere in search_text (trigram GIN);
+    # for name searches it must also be in one of the name columns
+    substring_matches = []
+    for term in terms:
+        pattern = f"%{_escape_like(term)}%"
+        condition = search_text.ilike(pattern, escape="\\")
+        if names_only:
+            condition = and_(condition, or_(
+                *(getattr(Patient, field).ilike(pattern, escape="\\") for field in NAME_FIELDS)
+            ))
+        substring_matches.append(condition)
+    matches = and_(*substring_matches)
+    rank = func.similarity(search_text, " ".join(terms))
+
+    # Word-prefix arm: full-text match (tsvector GIN), weighted for ranking
+    tsquery = _tsquery(terms, "AB" if names_only else "")
+    if tsquery:
+        query_vector = func.to_tsquery("simple", tsquery)
+        matches = or_(search_vector.op("@@")(query_vector), matches)
+        rank = rank + func.ts_rank(search_vector, query_vector)
+
+    result = await db.scalars(
+        select(Patient)
+        .where(Patient.tenant_id == tenant_id, matches)
+        .order_by(rank.desc(), Patient.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(result.all())
+
+
+# ==========================================
+# IN-PROCESS N-GRAM INDEX (SQLite)
+# ==========================================
+
+class PatientNgramIndex:
+    """
+    Trigram index over one tenant's patients.
+
+    Values and terms are normalized the same way (lower-case, separators
+    collapsed to single spaces, leading space), so " term" in value means
+    "a word starts with term".
+
+    Long terms look up the rarest trigram, short (1-2 char) terms a
+    word-prefix posting; candidates are then verified by substring match,
+    so postings may safely contain stale ids (updated/deleted patients).
+    Ranked results are cached until the index changes, so paging through
+    a query doesn't re-score it.
+    """
+
+    RESULT_CACHE_SIZE = 128
+    # Keep intersecting posting lists while more candidates than this remain
+    INTERSECT_ABOVE = 1000
+    MAX_INTERSECTIONS = 4
+
+    def __init__(self):
+        self._docs: Dict[int, Tuple[str, ...]] = {}
+        self._postings: Dict[str, array] = defaultdict(lambda: array("q"))
+        self._has_duplicates = False
+        self._results: "OrderedDict[tuple, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_text(value: Optional[str]) -> str:
+        return " " + " ".join(_WORD_SPLIT_RE.split((value or "").lower())).strip()
+
+    @classmethod
+    def normalize(cls, values: Iterable[Optional[str]]) -> Tuple[str, ...]:
+        return tuple(cls.normalize_text(value) for value in values)
+
+    @staticmethod
+    def _grams(values: Tuple[str, ...]) -> set:
+        grams = set()
+        for value in values:
+            grams.update(value[i:i + 3] for i in range(1, len(value) - 2))
+            # Word prefixes for 1-2 character terms ("\x01" keeps them apart from trigrams)
+            for word in value.split():
+                grams.add("\x01" + word[:1])
+                grams.add("\x01" + word[:2])
+        return grams
+
+    def add(self, patient_id: int, values: Tuple[str, ...]) -> None:
+        with self._lock:
+            if patient_id in self._docs:
+                self._has_duplicates = True
+            self._docs[patient_id] = values
+            for gram in self._grams(values):
+                self._postings[gram].append(patient_id)
+            self._results.clear()
+
+    def remove(self, patient_id: int) -> None:
+        with self._lock:
+            if self._docs.pop(patient_id, None) is not None:
+                # A later add() appends the id to postings again
+                self._has_duplicates = True
+            self._results.clear()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _candidates(self, terms: Sequence[str]) -> Iterable[int]:
+        """
+        Ids every match must appear under: the smallest posting list,
+        intersected with the next smallest ones while it is still large.
+        """
+        postings = []
+        for term in terms:
+            if len(term) >= 3:
+                keys = [term[i:i + 3] for i in range(len(term) - 2)]
+            else:
+                keys = ["\x01" + term]
+            for key in keys:
+                posting = self._postings.get(key)
+                if posting is None:
+                    return ()
+                postings.append(posting)
+
+        postings.sort(key=len)
+        candidates = postings[0]
+        for posting in postings[1:self.MAX_INTERSECTIONS + 1]:
+            # Intersecting walks all of `posting`; verifying a candidate costs
+            # roughly 20x more per id, so only intersect comparable lists
+            if len(candidates) <= self.INTERSECT_ABOVE or len(posting) > 10 * len(candidates):
+                break
+            candidates = set(candidates).intersection(posting)
+        if isinstance(candidates, array) and self._has_duplicates:
+            return dict.fromkeys(candidates)
+        return candidates
+
+    def search(self, terms: Sequence[str], field_indexes: Sequence[int]) -> List[int]:
+        """Matching ids, best first (ties broken by id)"""
+        terms = [self.normalize_text(term)[1:] for term in terms]
+        terms = [term for term in terms if term]
+        if not terms:
+            return []
+        cache_key = (tuple(terms), tuple(field_indexes))
+
+        with self._lock:
+            cached = self._results.get(cache_key)
+            if cached is not None:
+                self._results.move_to_end(cache_key)
+                return cached
+
+            candidates = self._candidates(terms)
+
+            # (term, " term" = whole value or word start, only word starts count)
+            prepared = [(term, " " + term, len(term) < 3) for term in terms]
+            exact_scores = [weight * 3 for weight in FIELD_WEIGHTS]
+            word_start_scores = [weight * 2 for weight in FIELD_WEIGHTS]
+            docs = self._docs
+            scored = []
+            for patient_id in candidates:
+                values = docs.get(patient_id)
+                if values is None:
+                    continue
+                score = 0
+                for term, word_start, word_start_only in prepared:
+                    best = 0
+                    for i in field_indexes:
+                        value = values[i]
+                        if term not in value:
+                            continue
+                        if value == word_start:
+                            term_score = exact_scores[i]
+                        elif word_start in value:
+                            term_score = word_start_scores[i]
+                        elif word_start_only:
+                            continue
+                        else:
+                            term_score = FIELD_WEIGHTS[i]
+                        if term_score > best:
+                            best = term_score
+                    if not best:
+                        break
+                    score += best
+                else:
+                    scored.append((-score, patient_id))
+
+            scored.sort()
+            result = [patient_id for _, patient_id in scored]
+            self._results[cache_key] = result
+            if len(self._results) > self.RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+            return result
+
+
+# One index per tenant
+_indexes = TTLCache(
+    "patient_search",
+    ttl_seconds=settings.search_index_ttl_seconds,
+    max_size=settings.search_index_max_tenants,
+)
+_build_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+async def _tenant_index(db: AsyncSession, tenant_id: int) -> PatientNgramIndex:
+    index = _indexes.get(tenant_id)
+    if index is not None:
+        return index
+
+    async with _build_locks[tenant_id]:
+        index = _indexes.peek(tenant_id)
+        if index is not None:
+            return index
+
+        rows = (await db.execute(
+            select(Patient.id, *(getattr(Patient, field) for field in SEARCH_FIELDS))
+            .where(Patient.tenant_id == tenant_id)
+            .order_by(Patient.id)
+        )).all()
+
+        def build():
+            index = PatientNgramIndex()
+            for row in rows:
+                index.add(row[0], index.normalize(row[1:]))
+            return index
+
+        # Building is CPU-bound; keep it off the event loop
+        index = await asyncio.get_running_loop().run_in_executor(None, build)
+        _indexes.set(tenant_id, index)
+        return index
+
+
+async def _search_in_process(
+    db: AsyncSession,
+    tenant_id: int,
+    terms: Sequence[str],
+    fields: Sequence[str],
+    skip: int,
+    limit: int,
+) -> List[Patient]:
+    index = await _tenant_index(db, tenant_id)
+    field_indexes = [SEARCH_FIELDS.index(field) for field in fields]
+    # Scoring a broad query can take a while on large tenants
+    ranked_ids = await asyncio.get_running_loop().run_in_executor(None, index.search, terms, field_indexes)
+    page_ids = ranked_ids[skip:skip + limit]
+    if not page_ids:
+        return []
+
+    patients = (await db.scalars(
+        select(Patient).where(Patient.tenant_id == tenant_id, Patient.id.in_(page_ids))
+    )).all()
+    by_id = {patient.id: patient for patient in patients}
+    return [by_id[patient_id] for patient_id in page_ids if patient_id in by_id]
+
+
+# Keep in-process indexes current. Changes are collected per session and
+# applied only once the transaction commits.
+_PENDING_KEY = "patient_search_changes"
+
+
+def queue_index_update(session: Session, tenant_id: int, patient_id: int, fields) -> None:
+    """
+    Add/replace a patient in the tenant's index once `session` commits.
+    `fields` maps SEARCH_FIELDS to values. Only needed for writes that
+    bypass the ORM unit of work (bulk inserts); ORM flushes are tracked below.
+    """
+    values = PatientNgramIndex.normalize(fields.get(field) for field in SEARCH_FIELDS)
+    session.info.setdefault(_PENDING_KEY, []).append((tenant_id, patient_id, values))
+
+
+@event.listens_for(Patient, "after_insert")
+@event.listens_for(Patient, "after_update")
+def _queue_patient_upsert(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        queue_index_update(
+            session, target.tenant_id, target.id,
+            {field: getattr(target, field) for field in SEARCH_FIELDS},
+        )
+
+
+@event.listens_for(Patient, "after_delete")
+def _queue_patient_delete(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, []).append((target.tenant_id, target.id, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_patient_changes(session):
+    for tenant_id, patient_id, values in session.info.pop(_PENDING_KEY, ()):
+        index = _indexes.peek(tenant_id)
+        if index is None:
+            continue
+        index.remove(patient_id)
+        if values is not None:
+            index.add(patient_id, values)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_patient_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# ==========================================
+# ENTRY POINT
+# ==========================================
+
+async def search_patients(
+    db: AsyncSession,
+    tenant_id: int,
+    query: str,
+    fields: Sequence[str] = SEARCH_FIELDS,
+    skip: int = 0,
+    limit: int = 50,
+) -> List[Patient]:
+    """Ranked page of the tenant's patients matching every term of `query`."""
+    terms = search_terms(query)
+    if not terms or limit <= 0:
+        return []
+
+    if db.get_bind().dialect.name == "postgresql":
+        return await _search_postgresql(db, tenant_id, terms, fields, skip, limit)
+    return await _search_in_process(db, tenant_id, terms, fields, skip, limit)
@@ -0,0 +1,112 @@
+"""
+Recurrence Engine
+Expands recurring appointment templates into occurrence start times
+
+Built on dateutil.rrule (RFC 5545 RRULE semantics), so months and years
+are real calendar months/years rather than 30/365-day steps. Templates
+can narrow a pattern with:
+- by_weekday: ["MO", "TH"] - or, for monthly/yearly patterns, with an
+  ordinal: ["1MO"] = first Monday, ["-1FR"] = last Friday
+- by_month_day: [1, 15] or [-1] (last day of the month)
+- exception_dates: ["2026-12-25"] - dates whose occurrence is skipped
+
+Occurrences are generated lazily, so any window can be looked at without
+materialising Appointment rows.
+
+USAGE:
+    for start in occurrences(template, window_start, window_end):
+        ...
+"""
+
+import re
+from datetime import date, datetime, time
+from typing import Iterable, Iterator, Optional, Union
+
+from dateutil.rrule import DAILY, MONTHLY, WEEKLY, YEARLY, rrule, rruleset, weekday
+from dateutil.rrule import MO, TU, WE, TH, FR, SA, SU
+
+from app.models.recurring_appointment import RecurrencePattern, RecurringAppointment
+
+FREQUENCIES = {
+    RecurrencePattern.daily: DAILY,
+    RecurrencePattern.weekly: WEEKLY,
+    RecurrencePattern.monthly: MONTHLY,
+    RecurrencePattern.yearly: YEARLY,
+}
+
+WEEKDAYS = {"MO": MO, "TU": TU, "WE": WE, "TH": TH, "FR": FR, "SA": SA, "SU": SU}
+
+_WEEKDAY_RE = re.compile(r"^([+-]?\d{1,2})?(MO|TU|WE|TH|FR|SA|SU)$")
+
+
+def parse_weekday(token: str) -> weekday:
+    """'MO' -> every Monday, '2TU' -> second Tuesday, '-1FR' -> last Friday"""
+    match = _WEEKDAY_RE.match(token.strip().upper())
+    if not match:
+        raise ValueError(f"Invalid weekday {token!r}; use MO..SU, optionally prefixed by an ordinal like 1MO or -1FR")
+    ordinal, day = match.groups()
+    if ordinal is None:
+        return WEEKDAYS[day]
+    n = int(ordinal)
+    if n == 0 or abs(n) > 53:
+        raise ValueError(f"Invalid weekday ordinal in {token!r}")
+    return WEEKDAYS[day](n)
+
+
+def parse_time_of_day(value: str) -> time:
+    hour, minute = map(int, value.split(":"))
+    return time(hour, minute)
+
+
+def _as_date(value: Union[str, date]) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def build_rule(
+    pattern: RecurrencePattern,
+    start_date: datetime,
+    time_of_day: str,
+    interval: int = 1,
+    end_date: Optional[datetime] = None,
+    by_weekday: Optional[Iterable[str]] = None,
+    by_month_day: Optional[Iterable[int]] = None,
+    exception_dates: Optional[Iterable[Union[str, date]]] = None,
+) -> rruleset:
+    """The rule for one template. Occurrences are naive datetimes, like the DB columns."""
+    at = parse_time_of_day(time_of_day)
+    dtstart = datetime.combine(start_date.date(), at)
+
+    rule = rrule(
+        FREQUENCIES[RecurrencePattern(pattern)],
+        dtstart=dtstart,
+        interval=interval or 1,
+        until=end_date.replace(tzinfo=None) if end_date else None,
+        byweekday=[parse_weekday(token) for token in by_weekday] if by_weekday else None,
+        bymonthday=list(by_month_day) if by_month_day else None,
+    )
+    rules = rruleset()
+    rules.rrule(rule)
+    for day in exception_dates or ():
+        rules.exdate(datetime.combine(_as_date(day), at))
+    return rules
+
+
+def template_rule(template: RecurringAppointment) -> rruleset:
+    return build_rule(
+        template.pattern,
+        template.start_date,
+        template.time_of_day,
+        interval=template.interval,
+        end_date=template.end_date,
+        by_weekday=template.by_weekday,
+        by_month_day=template.by_month_day,
+        exception_dates=template.exception_dates,
+    )
+
+
+def occurrences(template: RecurringAppointment, start: datetime, end: datetime) -> Iterator[datetime]:
+    """Lazily yield the template's occurrence start times in [start, end), in order"""
+    for occurrence in template_rule(template).xafter(start, inc=True):
+        if occurrence >= end:
+            return
+        yield occurrence
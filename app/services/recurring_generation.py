@@ -0,0 +1,223 @@
+"""
+Recurring Appointment Generation
+Materialises upcoming occurrences of recurring templates as Appointment rows
+
+Runs in the background scheduler (see scheduler_service), never on the
+request path:
+- right after a template is created or its rule changes
+  (scheduler_service.enqueue_recurring_generation)
+- nightly, to top every active template up to a rolling horizon
+
+Generation is set-based and idempotent: one query for everything that
+could block an occurrence, one INSERT ... ON CONFLICT DO NOTHING for the
+rest. Progress is recorded on the template (generation_status etc.).
+
+USAGE:
+    with SessionLocal() as db:
+        count = generate_appointments(db, template)
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import List, Optional
+import logging
+
+from sqlalchemy import DateTime, and_, literal, or_, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.appointment import Appointment, AppointmentStatus, MAX_DURATION_MINUTES
+from app.models.recurring_appointment import GenerationStatus, RecurringAppointment
+from app.models.tenant_daily_stats import count_new_appointments
+from app.services import recurrence
+
+logger = logging.getLogger(__name__)
+
+# How far ahead occurrences are materialised; the calendar view shows
+# anything beyond this as virtual occurrences
+HORIZON_DAYS = 90
+
+# The nightly top-up skips templates already generated this far ahead
+TOP_UP_MARGIN_DAYS = 7
+
+# SQLite allows at most 500 SELECTs in one UNION
+OCCURRENCES_PER_QUERY = 400
+
+
+class _BookedIntervals:
+    """Sorted (start, end) intervals with the same overlap rule as check_time_conflict"""
+
+    def __init__(self, intervals):
+        self._intervals = sorted(intervals)
+        self._starts = [start for start, _ in self._intervals]
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        # Only bookings starting in (start - MAX_DURATION_MINUTES, end) can overlap
+        first = bisect_right(self._starts, start - timedelta(minutes=MAX_DURATION_MINUTES))
+        last = bisect_left(self._starts, end)
+        return any(existing_end > start for _, existing_end in self._intervals[first:last])
+
+    def add(self, start: datetime, end: datetime) -> None:
+        position = bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._intervals.insert(position, (start, end))
+
+
+def _blocking_appointments(db: Session, recurring: RecurringAppointment, occurrences: List[datetime], duration: timedelta):
+    """
+    Everything that could block an occurrence: the patient's own bookings
+    at those times (cancelled included, so a cancelled occurrence isn't
+    recreated) and anything overlapping one. The template's own cancelled
+    occurrences don't count: a rule change cancels them all, and the new
+    rule may book the same times again. Occurrences are joined in as a
+    derived table, so each overlap check is an index seek on
+    (tenant_id, appointment_time).
+    """
+    columns = (Appointment.patient_id, Appointment.appointment_time, Appointment.end_time, Appointment.status)
+    rows = []
+    for chunk_start in range(0, len(occurrences), OCCURRENCES_PER_QUERY):
+        chunk = occurrences[chunk_start:chunk_start + OCCURRENCES_PER_QUERY]
+        windows = union_all(*(
+            select(
+                literal(start - timedelta(minutes=MAX_DURATION_MINUTES), DateTime).label("earliest_start"),
+                literal(start, DateTime).label("start"),
+                literal(start + duration, DateTime).label("end"),
+            )
+            for start in chunk
+        )).cte("occurrences")
+        overlapping = select(*columns).join(windows, and_(
+            Appointment.tenant_id == recurring.tenant_id,
+            Appointment.appointment_time > windows.c.earliest_start,
+            Appointment.appointment_time < windows.c.end,
+            Appointment.end_time > windows.c.start,
+        )).where(Appointment.status != AppointmentStatus.cancelled)
+        own = select(*columns).where(
+            Appointment.tenant_id == recurring.tenant_id,
+            Appointment.patient_id == recurring.patient_id,
+            Appointment.appointment_time.in_(chunk),
+            or_(
+                Appointment.status != AppointmentStatus.cancelled,
+                Appointment.recurring_appointment_id.is_(None),
+                Appointment.recurring_appointment_id != recurring.id,
+            ),
+        )
+        rows += db.execute(union_all(overlapping, own)).all()
+    return rows
+
+
+def generate_appointments(
+    db: Session,
+    recurring: RecurringAppointment,
+    now: Optional[datetime] = None,
+    days_ahead: int = HORIZON_DAYS,
+) -> int:
+    """
+    Insert the template's missing occurrences between max(now,
+    generated_until) and now + days_ahead. Occurrences the patient already
+    has, or that overlap another booking, are skipped. Returns how many
+    appointments were created; the caller commits.
+    """
+    now = now or datetime.now()
+    horizon = now + timedelta(days=days_ahead)
+    window_start = max(now, recurring.generated_until or now)
+    occurrences = list(recurrence.occurrences(recurring, window_start, horizon))
+
+    generated_count = 0
+    if occurrences:
+        duration = timedelta(minutes=recurring.duration_minutes or 30)
+        existing = _blocking_appointments(db, recurring, occurrences, duration)
+
+        already_booked = {
+            appointment_time for patient_id, appointment_time, _, _ in existing
+            if patient_id == recurring.patient_id
+        }
+        busy = _BookedIntervals(
+            (appointment_time, end_time)
+            for _, appointment_time, end_time, status in existing
+            if status != AppointmentStatus.cancelled and end_time is not None
+        )
+
+        rows = []
+        for appointment_time in occurrences:
+            if appointment_time in already_booked:
+                continue
+            if busy.overlaps(appointment_time, appointment_time + duration):
+                logger.info(
+                    "Recurring appointment %s: skipped %s, slot is taken",
+                    recurring.id, appointment_time
+                )
+                continue
+            busy.add(appointment_time, appointment_time + duration)
+            rows.append(dict(
+                tenant_id=recurring.tenant_id,
+                patient_id=recurring.patient_id,
+                appointment_time=appointment_time,
+                end_time=appointment_time + duration,
+                duration_minutes=recurring.duration_minutes,
+                status=AppointmentStatus.scheduled,
+                notes=recurring.notes,
+                recurring_appointment_id=recurring.id,
+            ))
+
+        if rows:
+            insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+            inserted = db.scalars(
+                insert(Appointment).on_conflict_do_nothing().returning(Appointment.appointment_time),
+                rows
+            ).all()
+            generated_count = len(inserted)
+
+            # A bulk INSERT skips the mapper listeners that keep rollups current
+            count_new_appointments(db.connection(), (
+                (recurring.tenant_id, appointment_time, AppointmentStatus.scheduled, recurring.duration_minutes)
+                for appointment_time in inserted
+            ))
+
+    recurring.last_generated = now
+    recurring.generated_until = horizon
+    recurring.last_generated_count = generated_count
+    return generated_count
+
+
+def run_generation(db: Session, recurring_id: int, days_ahead: int = HORIZON_DAYS) -> Optional[int]:
+    """
+    Generate one template in its own transaction and record the outcome on
+    it. Returns the number created, or None if the template is gone,
+    inactive, or generation failed (generation_status = failed).
+    """
+    recurring = db.get(RecurringAppointment, recurring_id)
+    if recurring is None or not recurring.is_active:
+        return None
+
+    recurring.generation_status = GenerationStatus.running
+    db.commit()
+    try:
+        count = generate_appointments(db, recurring, days_ahead=days_ahead)
+        recurring.generation_status = GenerationStatus.done
+        recurring.generation_error = None
+        db.commit()
+        return count
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error generating recurring appointment {recurring_id}: {e}")
+        recurring = db.get(RecurringAppointment, recurring_id)
+        if recurring is not None:
+            recurring.generation_status = GenerationStatus.failed
+            recurring.generation_error = str(e)[:500]
+            db.commit()
+        return None
+
+
+def templates_due(db: Session, now: Optional[datetime] = None) -> List[int]:
+    """Active templates whose generated horizon is within TOP_UP_MARGIN_DAYS of the rolling one"""
+    now = now or datetime.now()
+    due_before = now + timedelta(days=HORIZON_DAYS - TOP_UP_MARGIN_DAYS)
+    return list(db.scalars(select(RecurringAppointment.id).where(
+        RecurringAppointment.is_active == True,
+        or_(RecurringAppointment.end_date.is_(None), RecurringAppointment.end_date > now),
+        or_(
+            RecurringAppointment.generated_until.is_(None),
+            RecurringAppointment.generated_until < due_before,
+            RecurringAppointment.generation_status != GenerationStatus.done,
+        ),
+    ).order_by(RecurringAppointment.id)))
@@ -0,0 +1,116 @@
+"""
+Appointment Reminder Sweep
+Emails owners about appointments starting in the next day
+
+Run hourly by the background scheduler (check_and_send_reminders). Each
+batch is one query (due appointments joined with their patients, served
+by the partial ix_appointments_reminder_due index), one bulk INSERT into
+the email outbox and one bulk UPDATE of reminder_sent_at, committed
+together. Delivery (concurrency, retries) is the outbox's job
+(app/services/email_outbox.py).
+
+Safe to run on several replicas at once: on PostgreSQL the batch is
+locked FOR UPDATE SKIP LOCKED until it's marked, so two sweeps never pick
+the same appointment, and the mark is conditional on reminder_sent_at
+still being NULL. (SQLite has a single writer; the job's max_instances=1
+keeps runs from overlapping within the process.)
+
+USAGE:
+    with SessionLocal() as db:
+        stats = send_due_reminders(db)
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+from sqlalchemy import insert, literal_column, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.appointment import Appointment
+from app.models.email_outbox import EmailKind, EmailOutbox
+from app.models.patient import Patient
+from app.utils.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+# Appointments starting between 23 and 25 hours from now get a reminder.
+# The window is wider than the hourly schedule, so one missed or slow run
+# doesn't skip anyone.
+REMINDER_WINDOW_START_HOURS = 23
+REMINDER_WINDOW_END_HOURS = 25
+
+
+def _due_batch(db: Session, now: datetime, skip_ids: Set[int], limit: int) -> List[Tuple[Appointment, Patient]]:
+    query = (
+        select(Appointment, Patient)
+        .join(Patient, Patient.id == Appointment.patient_id)
+        .where(
+            # Spelled like the partial index predicate, so the planner can use it
+            Appointment.reminder_sent_at.is_(None),
+            Appointment.status == literal_column("'scheduled'"),
+            Appointment.appointment_time >= now + timedelta(hours=REMINDER_WINDOW_START_HOURS),
+            Appointment.appointment_time < now + timedelta(hours=REMINDER_WINDOW_END_HOURS),
+            Patient.owner_email.is_not(None),
+            Patient.owner_email != "",
+        )
+        .order_by(Appointment.appointment_time, Appointment.id)
+        .limit(limit)
+    )
+    if skip_ids:
+        query = query.where(Appointment.id.not_in(skip_ids))
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(of=Appointment, skip_locked=True)
+    return list(db.execute(query).tuples())
+
+
+def send_due_reminders(
+    db: Session,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Queue every due reminder, one committed batch at a time.
+    Returns {"queued": n, "skipped": n}; skipped ones stay unmarked and
+    are looked at again next run.
+    """
+    now = now or datetime.now()
+    batch_size = batch_size or settings.reminder_batch_size
+    stats = {"queued": 0, "skipped": 0}
+    if not (email_service.enabled and email_service.sendgrid_configured):
+        return stats
+
+    skipped_ids: Set[int] = set()
+    while True:
+        batch = _due_batch(db, now, skipped_ids, batch_size)
+        if not batch:
+            break
+
+        messages, queued_ids = [], []
+        for appointment, patient in batch:
+            values = email_service.outbox_values(EmailKind.reminder, appointment, patient)
+            if values is None:
+                skipped_ids.add(appointment.id)
+                continue
+            messages.append(values)
+            queued_ids.append(appointment.id)
+
+        if messages:
+            db.execute(insert(EmailOutbox), messages)
+            db.execute(
+                update(Appointment)
+                .where(Appointment.id.in_(queued_ids), Appointment.reminder_sent_at.is_(None))
+                # Not a change calendar sync cares about; keep updated_at
+                .values(reminder_sent_at=now, updated_at=Appointment.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+        # Also releases the batch's row locks
+        db.commit()
+        db.expunge_all()
+
+        stats["queued"] += len(queued_ids)
+        stats["skipped"] += len(batch) - len(queued_ids)
+        if len(batch) < batch_size:
+            break
+    return stats
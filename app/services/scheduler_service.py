@@ -1,83 +1,284 @@
 """
 Background Job Scheduler Service
-Handles automated tasks like sending appointment reminders
+Handles automated tasks like sending appointment reminders and
+generating appointments from recurring templates
 
 USAGE:
 - Scheduler runs in background
 - Jobs execute at scheduled intervals
 - Perfect for sending reminders automatically
+
+Every uvicorn worker of every replica starts this scheduler, but the
+periodic jobs only run in the one process holding the "scheduler-leader"
+lease (app/models/scheduler_lease.py). Each process tries to take or renew
+the lease every SCHEDULER_LEASE_TTL_SECONDS / 3; if the leader dies,
+another process takes over once its lease expires. One-off jobs
+(enqueue_recurring_generation) run in the process that queued them.
+
+Job duration, start lag and outcomes are exported to Prometheus when
+prometheus_client is installed.
 """
 
+from apscheduler.events import EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from app.config import settings
 from app.database import SessionLocal
-from app.models.appointment import Appointment, AppointmentStatus
-from app.models.patient import Patient
-from app.utils.email_service import email_service
-from datetime import datetime, timedelta
+from app.models.scheduler_lease import release_lease, try_acquire_lease
+from app.models.tenant_daily_stats import rebuild_tenant_daily_stats
+from app.services import recurring_generation
+from app.services.calendar_sync import connected_tenants, sync_calendar
+from app.services.email_outbox import deliver_pending, purge_sent
+from app.services.reminders import send_due_reminders
+from datetime import datetime, timezone
+from functools import wraps
 import logging
+import os
+import socket
+import time
+import uuid
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram  # pyright: ignore[reportMissingImports]
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+if PROMETHEUS_AVAILABLE:
+    JOB_DURATION = Histogram(
+        "scheduler_job_duration_seconds",
+        "Background job run time",
+        ["job"],
+        buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+    )
+    JOB_LAG = Histogram(
+        "scheduler_job_lag_seconds",
+        "Delay between a job's scheduled time and its start",
+        ["job"],
+        buckets=(0.01, 0.1, 0.5, 1, 5, 15, 60, 300),
+    )
+    JOB_RUNS = Counter("scheduler_job_runs_total", "Background job runs by outcome (success, failure, skipped)", ["job", "outcome"])
+    IS_LEADER = Gauge("scheduler_is_leader", "1 if this process holds the scheduler lease")
 
 logger = logging.getLogger(__name__)
 
 scheduler = BackgroundScheduler()
 
+LEADER_LEASE = "scheduler-leader"
+# Identifies this process in scheduler_leases.holder
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# time.monotonic() until which this process may act as leader. Stops a
+# little before the lease does, so a stalled renewal gives up leadership
+# before anyone else can take it.
+_leader_until = 0.0
+
+
+def is_leader() -> bool:
+    return time.monotonic() < _leader_until
+
+
+def renew_leadership():
+    """Interval job, in every process: take or keep the leader lease"""
+    global _leader_until
+    ttl = settings.scheduler_lease_ttl_seconds
+    started = time.monotonic()
+    db = SessionLocal()
+    try:
+        acquired = try_acquire_lease(db, LEADER_LEASE, INSTANCE_ID, ttl)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error renewing scheduler lease: {e}")
+        acquired = False
+    finally:
+        db.close()
+
+    was_leader = is_leader()
+    _leader_until = started + ttl * 2 / 3 if acquired else 0.0
+    if acquired != was_leader:
+        logger.info(f"Scheduler leadership {'acquired' if acquired else 'lost'} by {INSTANCE_ID}")
+    if PROMETHEUS_AVAILABLE:
+        IS_LEADER.set(1 if acquired else 0)
+
+
+def _metric_label(job_id: str) -> str:
+    # One-off jobs are "<kind>:<id>"; label them by kind
+    return job_id.split(":", 1)[0]
+
+
+def _record_lag(event):
+    if PROMETHEUS_AVAILABLE and event.scheduled_run_times:
+        lag = (datetime.now(timezone.utc) - event.scheduled_run_times[0]).total_seconds()
+        JOB_LAG.labels(_metric_label(event.job_id)).observe(max(lag, 0))
+
+
+def _instrumented(job_id: str, leader_only: bool = True):
+    """
+    Wrap a job: skip it unless this process is the leader (leader_only),
+    log and count failures, and time it.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if leader_only and not is_leader():
+                if PROMETHEUS_AVAILABLE:
+                    JOB_RUNS.labels(job_id, "skipped").inc()
+                return
+            start = time.perf_counter()
+            outcome = "success"
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                outcome = "failure"
+                logger.error(f"Error in scheduler job {job_id}: {e}")
+            finally:
+                if PROMETHEUS_AVAILABLE:
+                    JOB_DURATION.labels(job_id).observe(time.perf_counter() - start)
+                    JOB_RUNS.labels(job_id, outcome).inc()
+        return wrapper
+    return decorator
+
 
+@_instrumented('send_appointment_reminders')
 def check_and_send_reminders():
-    """Background job that checks for appointments needing reminders."""
+    """Background job: email reminders for appointments starting in ~24 hours"""
     db = SessionLocal()
     try:
-        now = datetime.now()
-        reminder_window_start = now + timedelta(hours=23)
-        reminder_window_end = now + timedelta(hours=25)
-        
-        # TODO: Query appointments in reminder window
-        appointments_to_remind = []
-        
-        for appointment in appointments_to_remind:
+        stats = send_due_reminders(db)
+        if stats["queued"] or stats["skipped"]:
+            logger.info(f"Reminders: {stats['queued']} queued, {stats['skipped']} skipped")
+    finally:
+        db.close()
+
+
+@_instrumented('deliver_email_outbox')
+def deliver_email_outbox():
+    """Frequent job: send queued emails (see app/services/email_outbox.py)"""
+    db = SessionLocal()
+    try:
+        stats = deliver_pending(db)
+        if stats["retry"] or stats["dead"]:
+            logger.warning(f"Email outbox: {stats['sent']} sent, {stats['retry']} to retry, {stats['dead']} dead-lettered")
+    finally:
+        db.close()
+
+
+@_instrumented('purge_email_outbox')
+def purge_email_outbox():
+    """Nightly job: drop delivered emails older than 30 days"""
+    db = SessionLocal()
+    try:
+        purged = purge_sent(db)
+        logger.info(f"Email outbox: purged {purged} delivered messages")
+    finally:
+        db.close()
+
+
+@_instrumented('reconcile_daily_stats')
+def reconcile_daily_stats():
+    """
+    Nightly job: rebuild tenant_daily_stats from the raw tables.
+    The rollups are maintained incrementally; this corrects any drift.
+    """
+    db = SessionLocal()
+    try:
+        rebuild_tenant_daily_stats(db)
+        db.commit()
+        logger.info("Dashboard rollups reconciled")
+    finally:
+        db.close()
+
+
+@_instrumented('generate_recurring_appointment', leader_only=False)
+def generate_recurring_appointments(recurring_id: int):
+    """One-off job: generate a single template (queued by enqueue_recurring_generation)"""
+    db = SessionLocal()
+    try:
+        count = recurring_generation.run_generation(db, recurring_id)
+        if count is not None:
+            logger.info(f"Recurring appointment {recurring_id}: generated {count} appointments")
+    finally:
+        db.close()
+
+
+@_instrumented('top_up_recurring_appointments')
+def top_up_recurring_appointments():
+    """
+    Nightly job: extend every active template to the rolling horizon
+    (recurring_generation.HORIZON_DAYS ahead). Also picks up templates whose
+    queued generation failed or never ran (e.g. the process restarted).
+    Each template is committed on its own, so one failure doesn't stop the rest.
+    """
+    db = SessionLocal()
+    try:
+        due = recurring_generation.templates_due(db)
+        created = 0
+        for recurring_id in due:
+            created += recurring_generation.run_generation(db, recurring_id) or 0
+        logger.info(f"Recurring top-up: {len(due)} templates, {created} appointments created")
+    finally:
+        db.close()
+
+
+@_instrumented('sync_google_calendars')
+def sync_google_calendars():
+    """
+    Frequent job: push appointment changes to every connected Google Calendar
+    (see app/services/calendar_sync.py). One tenant failing doesn't stop the rest.
+    """
+    db = SessionLocal()
+    try:
+        for tenant_id in connected_tenants(db):
             try:
-                # TODO: Get patient for this appointment
-                
-                patient = None
-                
-                if patient and patient.owner_email:
-                    import asyncio
-                    try:
-                        loop = asyncio.get_event_loop()
-                    except RuntimeError:
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                    
-                    success = loop.run_until_complete(
-                        email_service.send_appointment_reminder(
-                            appointment,
-                            patient,
-                            reminder_hours=24
-                        )
-                    )
-                    
-                    if success:
-                        # TODO: Mark reminder as sent
-                        # HINT: appointment.reminder_sent_at = now
-                        # HINT: db.commit()
-                        logger.info(f"Reminder sent for appointment {appointment.id}")
-                    else:
-                        logger.warning(f"Failed to send reminder for appointment {appointment.id}")
-                else:
-                    logger.warning(f"No email for appointment {appointment.id}")
-                    
+                stats = sync_calendar(db, tenant_id)
             except Exception as e:
-                logger.error(f"Error sending reminder for appointment {appointment.id}: {e}")
+                db.rollback()
+                logger.warning(f"Calendar sync for tenant {tenant_id} failed: {e}")
                 continue
-                
-    except Exception as e:
-        logger.error(f"Error in reminder job: {e}")
+            if any(stats.values()):
+                logger.info(f"Calendar sync for tenant {tenant_id}: {stats}")
     finally:
         db.close()
 
 
+def enqueue_recurring_generation(recurring_id: int):
+    """
+    Generate a template's appointments in the background, as soon as
+    possible. Queuing the same template again before it has run replaces
+    the pending job. Without a running scheduler (scripts, failed start)
+    the template stays pending until the nightly top-up.
+    """
+    if not scheduler.running:
+        logger.warning(f"Scheduler not running; recurring appointment {recurring_id} left for the nightly top-up")
+        return
+    scheduler.add_job(
+        generate_recurring_appointments,
+        trigger=DateTrigger(),
+        args=[recurring_id],
+        id=f'generate_recurring_appointment:{recurring_id}',
+        name=f'Generate recurring appointment {recurring_id}',
+        replace_existing=True,
+        misfire_grace_time=None
+    )
+
+
 def start_scheduler():
     """Start the background scheduler"""
     if not scheduler.running:
+        # Settle leadership before the first periodic job can fire
+        renew_leadership()
+        scheduler.add_job(
+            renew_leadership,
+            trigger=IntervalTrigger(seconds=max(settings.scheduler_lease_ttl_seconds // 3, 1)),
+            id='renew_scheduler_lease',
+            name='Renew scheduler leader lease',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        
         scheduler.add_job(
             check_and_send_reminders,
             trigger=CronTrigger(minute=0),
@@ -87,16 +288,78 @@ def start_scheduler():
             max_instances=1
         )
         
+        scheduler.add_job(
+            deliver_email_outbox,
+            trigger=IntervalTrigger(seconds=settings.email_outbox_poll_seconds),
+            id='deliver_email_outbox',
+            name='Deliver queued emails',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        
+        scheduler.add_job(
+            purge_email_outbox,
+            trigger=CronTrigger(hour=4, minute=0),
+            id='purge_email_outbox',
+            name='Purge delivered emails',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        scheduler.add_job(
+            reconcile_daily_stats,
+            trigger=CronTrigger(hour=3, minute=30),
+            id='reconcile_daily_stats',
+            name='Reconcile dashboard rollups',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        scheduler.add_job(
+            top_up_recurring_appointments,
+            trigger=CronTrigger(hour=2, minute=0),
+            id='top_up_recurring_appointments',
+            name='Top up recurring appointments',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        scheduler.add_job(
+            sync_google_calendars,
+            trigger=IntervalTrigger(seconds=settings.calendar_sync_interval_seconds),
+            id='sync_google_calendars',
+            name='Sync Google Calendars',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        
+        scheduler.add_listener(_record_lag, EVENT_JOB_SUBMITTED)
         scheduler.start()
-        logger.info("Background scheduler started - reminders will run hourly")
+        logger.info(
+            f"Background scheduler started as {INSTANCE_ID} "
+            f"({'leader' if is_leader() else 'standby'}) - reminders will run hourly"
+        )
     else:
         logger.warning("Scheduler is already running")
 
 
 def stop_scheduler():
     """Stop the background scheduler"""
+    global _leader_until
     if scheduler.running:
         scheduler.shutdown()
+        if is_leader():
+            # Hand over now instead of when the lease expires
+            _leader_until = 0.0
+            db = SessionLocal()
+            try:
+                release_lease(db, LEADER_LEASE, INSTANCE_ID)
+            except Exception as e:
+                logger.error(f"Error releasing scheduler lease: {e}")
+            finally:
+                db.close()
         logger.info("Background scheduler stopped")
     else:
         logger.warning("Scheduler is not running")
@@ -110,7 +373,7 @@ def stop_scheduler():
 #
 # Other triggers:
 # - IntervalTrigger(hours=1) → Every hour
-# - DateTrigger(run_date=datetime) → Run once at specific time
+# - DateTrigger(run_date=datetime) → Run once at specific time (now if omitted)
 #
 # Job options:
 # - max_instances=1 → Prevent overlapping jobs
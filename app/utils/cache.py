@@ -0,0 +1,88 @@
+"""
+In-process TTL cache with an LRU size bound
+
+Used for small, hot lookups (tenant by subdomain, etc.) that would otherwise
+hit the database on every request. Each uvicorn worker has its own cache,
+so entries can be stale for at most `ttl_seconds` after a change made by
+another process.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+try:
+    from prometheus_client import Counter  # pyright: ignore[reportMissingImports]
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+if PROMETHEUS_AVAILABLE:
+    CACHE_HITS = Counter("app_cache_hits_total", "In-process cache hits", ["cache"])
+    CACHE_MISSES = Counter("app_cache_misses_total", "In-process cache misses", ["cache"])
+
+
+class TTLCache:
+    """
+    Thread-safe mapping whose entries expire after `ttl_seconds`.
+    When more than `max_size` entries are stored, the least recently used
+    entry is evicted.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_size: int):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                value = entry[1]
+            else:
+                if entry is not None:
+                    del self._data[key]
+                value = None
+
+        if PROMETHEUS_AVAILABLE:
+            (CACHE_HITS if value is not None else CACHE_MISSES).labels(cache=self.name).inc()
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Like get(), but doesn't refresh LRU order or count a hit/miss."""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> None:
+        """Drop every entry whose value matches `predicate`."""
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
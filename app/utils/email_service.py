@@ -5,11 +5,27 @@ Handles sending email notifications for appointments, reminders, etc.
 Uses SendGrid for email delivery.
 For free tier: Use Single Sender Verification (verify your personal email)
 No domain required!
+
+Emails are never sent from a request. queue_* adds an EmailOutbox row
+(recipient, subject and the template values) to the caller's session, so
+it commits (or rolls back) together with the appointment change;
+app/services/email_outbox.py renders it with the tenant's template
+(app/utils/email_templates.py) and delivers it in the background. Set
+EMAIL_TRANSPORT=fake to deliver to an in-memory FakeTransport instead of
+SendGrid (offline development, tests).
+
+Queued messages of one tenant and kind can go out as one SendGrid request
+with up to MAX_PERSONALIZATIONS personalizations (send_batch): the
+template's shared HTML plus per-recipient substitutions.
 """
 
-from typing import Optional
+import asyncio
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
 from datetime import datetime, timedelta
 from app.models.appointment import Appointment
+from app.models.email_outbox import EmailKind, EmailOutbox
 from app.models.patient import Patient
 from app.config import settings
 
@@ -23,6 +39,164 @@ except ImportError:
     print("[WARNING] SendGrid not installed. Run: pip install sendgrid")
 
 
+class EmailDeliveryError(Exception):
+    """
+    A send failed. permanent=True means retrying won't help (e.g. rejected
+    address). For a batch request, rejected holds the indexes of the
+    recipients the provider named as the cause.
+    """
+    
+    def __init__(self, message: str, permanent: bool = False, rejected: Iterable[int] = ()):
+        super().__init__(message)
+        self.permanent = permanent
+        self.rejected = set(rejected)
+
+
+# ==========================================
+# BATCH SENDS
+# ==========================================
+
+# SendGrid accepts at most this many personalizations (recipients) per request
+MAX_PERSONALIZATIONS = 1000
+
+# Tokens of a batch's shared HTML, e.g. -pet_name- (see email_templates)
+_TOKEN_RE = re.compile(r"-[a-z_]+-")
+
+
+def render(html: str, substitutions: Dict[str, str]) -> str:
+    """Fill tokens the way SendGrid does, in one pass (values are never re-scanned)"""
+    return _TOKEN_RE.sub(lambda match: substitutions.get(match.group(0), match.group(0)), html)
+
+
+# ==========================================
+# TRANSPORTS
+# ==========================================
+
+class SendGridTransport:
+    """
+    Delivers through the SendGrid v3 API (the client blocks, so it runs in
+    a thread). send_batch puts up to MAX_PERSONALIZATIONS recipients of
+    one template in a single request.
+    """
+    
+    _REJECTED_FIELD_RE = re.compile(r"^personalizations\.(\d+)\.")
+    
+    def __init__(self, api_key: str, host: str = "https://api.sendgrid.com"):
+        self.client = SendGridAPIClient(api_key, host=host)
+    
+    async def _post(self, html: str, personalizations: List[Dict[str, Any]]) -> None:
+        payload = {
+            "from": {"email": settings.email_from_address},
+            "personalizations": personalizations,
+            "content": [{"type": "text/html", "value": html}],
+        }
+        try:
+            response = await asyncio.to_thread(self.client.send, payload)
+        except Exception as e:
+            # python_http_client raises HTTPError subclasses carrying the status and body
+            status_code = getattr(e, "status_code", None) or 0
+            raise EmailDeliveryError(
+                f"SendGrid error {status_code or ''}: {e}".strip(),
+                permanent=400 <= status_code < 500 and status_code != 429,
+                rejected=self._rejected_personalizations(getattr(e, "body", None))
+            )
+        
+        # 202 = accepted
+        if response.status_code != 202:
+            raise EmailDeliveryError(f"SendGrid returned status {response.status_code}")
+    
+    def _rejected_personalizations(self, body) -> Set[int]:
+        """Indexes named in a 400 response, e.g. field "personalizations.3.to.0.email" -> 3"""
+        try:
+            errors = json.loads(body or b"{}").get("errors") or []
+        except (ValueError, AttributeError):
+            return set()
+        return {
+            int(match.group(1))
+            for error in errors
+            if (match := self._REJECTED_FIELD_RE.match(str(error.get("field") or "")))
+        }
+    
+    async def send(self, recipient: str, subject: str, html_body: str) -> None:
+        await self._post(html_body, [{"to": [{"email": recipient}], "subject": subject}])
+    
+    async def send_batch(self, html: str, messages: List[Dict[str, Any]]) -> Dict[int, EmailDeliveryError]:
+        """
+        Send `messages` ({"recipient", "subject", "substitutions"}) sharing
+        `html` in one request. SendGrid accepts or rejects a request as
+        a whole: if it names bad recipients, those are reported as failed
+        (permanently) and the rest are resent once without them. Returns
+        {index in messages: error} for the failed ones; raises
+        EmailDeliveryError if the whole batch failed.
+        """
+        pending = list(range(len(messages)))
+        failed: Dict[int, EmailDeliveryError] = {}
+        for _ in range(2):
+            try:
+                await self._post(html, [
+                    {
+                        "to": [{"email": messages[i]["recipient"]}],
+                        "subject": messages[i]["subject"],
+                        "substitutions": messages[i]["substitutions"],
+                    }
+                    for i in pending
+                ])
+                return failed
+            except EmailDeliveryError as e:
+                rejected = {pending[position] for position in e.rejected if position < len(pending)}
+                if not rejected:
+                    raise
+                for i in rejected:
+                    failed[i] = EmailDeliveryError(f"Rejected by SendGrid: {e}", permanent=True)
+                pending = [i for i in pending if i not in rejected]
+                if not pending:
+                    return failed
+        raise EmailDeliveryError("SendGrid rejected the batch again after dropping the named recipients")
+
+
+class FakeTransport:
+    """
+    Offline stand-in for SendGrid: records messages in memory.
+    Recipients in fail_for are rejected (permanently if permanent_failures),
+    to exercise retries and dead-lettering. requests counts API calls.
+    """
+    
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.sent: List[Dict[str, str]] = []
+        self.fail_for: Set[str] = set()
+        self.permanent_failures = False
+        self.requests = 0
+    
+    async def send(self, recipient: str, subject: str, html_body: str) -> None:
+        self.requests += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if recipient in self.fail_for:
+            raise EmailDeliveryError(f"Fake transport rejected {recipient}", permanent=self.permanent_failures)
+        self.sent.append({"recipient": recipient, "subject": subject, "html_body": html_body})
+    
+    async def send_batch(self, html: str, messages: List[Dict[str, Any]]) -> Dict[int, EmailDeliveryError]:
+        self.requests += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        failed = {}
+        for i, message in enumerate(messages):
+            if message["recipient"] in self.fail_for:
+                failed[i] = EmailDeliveryError(f"Fake transport rejected {message['recipient']}", permanent=self.permanent_failures)
+            else:
+                self.sent.append({
+                    "recipient": message["recipient"],
+                    "subject": message["subject"],
+                    "html_body": render(html, message["substitutions"]),
+                })
+        return failed
+
+
+# ==========================================
+# SERVICE
+# ==========================================
+
 class EmailService:
     """
     Email notification service using SendGrid.
@@ -38,43 +212,101 @@ class EmailService:
     
     def __init__(self):
         self.enabled = settings.email_enabled
+        self.transport = None
         
+        if settings.email_transport == "fake":
+            self.transport = FakeTransport()
+            print("[EMAIL] Using the fake transport; nothing leaves this process")
         # Initialize SendGrid client if API key is provided
-        if SENDGRID_AVAILABLE and settings.sendgrid_api_key:
+        elif SENDGRID_AVAILABLE and settings.sendgrid_api_key:
             try:
-                self.sendgrid_client = SendGridAPIClient(settings.sendgrid_api_key)
-                self.sendgrid_configured = True
+                self.transport = SendGridTransport(settings.sendgrid_api_key, settings.sendgrid_api_host)
                 print("[EMAIL] SendGrid initialized successfully")
             except Exception as e:
                 print(f"[EMAIL ERROR] Failed to initialize SendGrid: {e}")
-                self.sendgrid_configured = False
         else:
-            self.sendgrid_configured = False
             if not SENDGRID_AVAILABLE:
                 print("[EMAIL] SendGrid package not installed")
             elif not settings.sendgrid_api_key:
                 print("[EMAIL] SendGrid API key not configured")
     
-    async def send_appointment_reminder(
+    @property
+    def sendgrid_configured(self) -> bool:
+        return self.transport is not None
+    
+    def outbox_values(
+        self,
+        kind: EmailKind,
+        appointment: Appointment,
+        patient: Patient
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Column values for an EmailOutbox row, or None if the email can't or
+        shouldn't go out (email disabled, no transport, no address).
+        """
+        if not self.enabled:
+            return None
+        
+        recipient_email = patient.owner_email
+        if not recipient_email:
+            # No email address, can't send
+            return None
+        
+        when = appointment.appointment_time.strftime('%B %d, %Y at %I:%M %p')
+        if kind == EmailKind.reminder:
+            subject = f"Appointment Reminder: {when}"
+        elif kind == EmailKind.confirmation:
+            subject = f"Appointment Confirmed: {when}"
+        else:
+            subject = f"Appointment Cancelled: {when}"
+        
+        values = {
+            "owner_first_name": patient.owner_first_name or "",
+            "pet_name": patient.pet_name or "",
+            "appointment_time": when,
+            "duration_minutes": str(appointment.duration_minutes),
+        }
+        
+        if not self.sendgrid_configured:
+            print(f"[EMAIL] SendGrid not configured. Would send {kind.value} to {recipient_email}")
+            return None
+        
+        return dict(
+            tenant_id=appointment.tenant_id,
+            appointment_id=appointment.id,
+            kind=kind,
+            recipient=recipient_email,
+            subject=subject,
+            substitutions=values,
+        )
+    
+    def _queue(self, db, kind: EmailKind, appointment: Appointment, patient: Patient) -> bool:
+        values = self.outbox_values(kind, appointment, patient)
+        if values is None:
+            return False
+        db.add(EmailOutbox(**values))
+        return True
+    
+    def queue_appointment_reminder(
         self,
+        db,
         appointment: Appointment,
         patient: Patient,
         reminder_hours: int = 24
     ) -> bool:
         """
-        Send appointment reminder email to patient.
+        Queue an appointment reminder email to the patient.
         
         Args:
+            db: Session (sync or async) the outbox row is added to; commit it
+                together with the appointment change
             appointment: The appointment to remind about
             patient: The patient (pet owner) to notify
             reminder_hours: How many hours before appointment to send reminder
         
         Returns:
-            True if email sent successfully, False otherwise
+            True if the email was queued, False otherwise
         """
-        if not self.enabled:
-            return False
-        
         # Check if reminder should be sent (e.g., 24 hours before)
         appointment_time = appointment.appointment_time
         reminder_time = appointment_time - timedelta(hours=reminder_hours)
@@ -84,188 +316,16 @@ class EmailService:
         if now < reminder_time or now > appointment_time:
             return False
         
-        # Get patient email
-        recipient_email = patient.owner_email
-        if not recipient_email:
-            # No email address, can't send
-            return False
-        
-        # Prepare email content
-        subject = f"Appointment Reminder: {appointment_time.strftime('%B %d, %Y at %I:%M %p')}"
-        body = self._generate_reminder_email_body(appointment, patient)
-        
-        # Send email using SendGrid
-        try:
-            if not self.sendgrid_configured:
-                print(f"[EMAIL] SendGrid not configured. Would send reminder to {recipient_email}")
-                return False
-            
-            # Create SendGrid mail message
-            message = Mail(
-                from_email=settings.email_from_address,
-                to_emails=recipient_email,
-                subject=subject,
-                html_content=body
-            )
-            
-            # Send email
-            response = self.sendgrid_client.send(message)
-            
-            # Check if successful (202 = accepted)
-            if response.status_code == 202:
-                print(f"[EMAIL] Reminder sent successfully to {recipient_email}")
-                return True
-            else:
-                print(f"[EMAIL ERROR] SendGrid returned status {response.status_code}")
-                return False
-                
-        except Exception as e:
-            print(f"[EMAIL ERROR] Failed to send reminder: {e}")
-            return False
+        return self._queue(db, EmailKind.reminder, appointment, patient)
     
-    async def send_appointment_confirmation(
-        self,
-        appointment: Appointment,
-        patient: Patient
-    ) -> bool:
-        """Send appointment confirmation email"""
-        if not self.enabled:
-            return False
-        
-        recipient_email = patient.owner_email
-        if not recipient_email:
-            return False
-        
-        subject = f"Appointment Confirmed: {appointment.appointment_time.strftime('%B %d, %Y at %I:%M %p')}"
-        body = self._generate_confirmation_email_body(appointment, patient)
-        
-        try:
-            if not self.sendgrid_configured:
-                print(f"[EMAIL] SendGrid not configured. Would send confirmation to {recipient_email}")
-                return False
-            
-            message = Mail(
-                from_email=settings.email_from_address,
-                to_emails=recipient_email,
-                subject=subject,
-                html_content=body
-            )
-            
-            response = self.sendgrid_client.send(message)
-            
-            if response.status_code == 202:
-                print(f"[EMAIL] Confirmation sent successfully to {recipient_email}")
-                return True
-            else:
-                print(f"[EMAIL ERROR] SendGrid returned status {response.status_code}")
-                return False
-                
-        except Exception as e:
-            print(f"[EMAIL ERROR] Failed to send confirmation: {e}")
-            return False
+    def queue_appointment_confirmation(self, db, appointment: Appointment, patient: Patient) -> bool:
+        """Queue an appointment confirmation email (appointment must be flushed, for its id)"""
+        return self._queue(db, EmailKind.confirmation, appointment, patient)
     
-    async def send_appointment_cancellation(
-        self,
-        appointment: Appointment,
-        patient: Patient
-    ) -> bool:
-        """Send appointment cancellation email"""
-        if not self.enabled:
-            return False
-        
-        recipient_email = patient.owner_email
-        if not recipient_email:
-            return False
-        
-        subject = f"Appointment Cancelled: {appointment.appointment_time.strftime('%B %d, %Y at %I:%M %p')}"
-        body = self._generate_cancellation_email_body(appointment, patient)
-        
-        try:
-            if not self.sendgrid_configured:
-                print(f"[EMAIL] SendGrid not configured. Would send cancellation to {recipient_email}")
-                return False
-            
-            message = Mail(
-                from_email=settings.email_from_address,
-                to_emails=recipient_email,
-                subject=subject,
-                html_content=body
-            )
-            
-            response = self.sendgrid_client.send(message)
-            
-            if response.status_code == 202:
-                print(f"[EMAIL] Cancellation sent successfully to {recipient_email}")
-                return True
-            else:
-                print(f"[EMAIL ERROR] SendGrid returned status {response.status_code}")
-                return False
-                
-        except Exception as e:
-            print(f"[EMAIL ERROR] Failed to send cancellation: {e}")
-            return False
-    
-    def _generate_reminder_email_body(self, appointment: Appointment, patient: Patient) -> str:
-        """Generate HTML email body for appointment reminder"""
-        appointment_time = appointment.appointment_time
-        return f"""
-        <html>
-        <body>
-            <h2>Appointment Reminder</h2>
-            <p>Dear {patient.owner_first_name},</p>
-            <p>This is a reminder that you have an appointment scheduled:</p>
-            <ul>
-                <li><strong>Pet:</strong> {patient.pet_name}</li>
-                <li><strong>Date & Time:</strong> {appointment_time.strftime('%B %d, %Y at %I:%M %p')}</li>
-                <li><strong>Duration:</strong> {appointment.duration_minutes} minutes</li>
-            </ul>
-            <p>Please arrive 10 minutes early.</p>
-            <p>If you need to reschedule or cancel, please contact us.</p>
-            <p>Best regards,<br>Clinic Team</p>
-        </body>
-        </html>
-        """
-    
-    def _generate_confirmation_email_body(self, appointment: Appointment, patient: Patient) -> str:
-        """Generate HTML email body for appointment confirmation"""
-        appointment_time = appointment.appointment_time
-        return f"""
-        <html>
-        <body>
-            <h2>Appointment Confirmed</h2>
-            <p>Dear {patient.owner_first_name},</p>
-            <p>Your appointment has been confirmed:</p>
-            <ul>
-                <li><strong>Pet:</strong> {patient.pet_name}</li>
-                <li><strong>Date & Time:</strong> {appointment_time.strftime('%B %d, %Y at %I:%M %p')}</li>
-                <li><strong>Duration:</strong> {appointment.duration_minutes} minutes</li>
-            </ul>
-            <p>We look forward to seeing you!</p>
-            <p>Best regards,<br>Clinic Team</p>
-        </body>
-        </html>
-        """
-    
-    def _generate_cancellation_email_body(self, appointment: Appointment, patient: Patient) -> str:
-        """Generate HTML email body for appointment cancellation"""
-        appointment_time = appointment.appointment_time
-        return f"""
-        <html>
-        <body>
-            <h2>Appointment Cancelled</h2>
-            <p>Dear {patient.owner_first_name},</p>
-            <p>Your appointment has been cancelled:</p>
-            <ul>
-                <li><strong>Pet:</strong> {patient.pet_name}</li>
-                <li><strong>Date & Time:</strong> {appointment_time.strftime('%B %d, %Y at %I:%M %p')}</li>
-            </ul>
-            <p>If you would like to reschedule, please contact us.</p>
-            <p>Best regards,<br>Clinic Team</p>
-        </body>
-        </html>
-        """
+    def queue_appointment_cancellation(self, db, appointment: Appointment, patient: Patient) -> bool:
+        """Queue an appointment cancellation email"""
+        return self._queue(db, EmailKind.cancellation, appointment, patient)
 
 
 # Global email service instance
 email_service = EmailService()
-
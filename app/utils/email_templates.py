@@ -0,0 +1,143 @@
+"""
+Email Templates
+Compiled Mako templates for the appointment emails, with per-tenant overrides
+
+The default bodies are app/templates/email/<kind>.html, compiled once at
+import. A tenant can replace any of them (PUT /email-templates/{kind}).
+An override is compiled the first time it's used and then kept in a
+per-process TTLCache. The process that changes it drops its cached copy
+straight away; other processes pick up the change within
+EMAIL_TEMPLATE_CACHE_TTL_SECONDS.
+
+Every ${name} is HTML-escaped. The names a template can use are
+VARIABLES. Mako compiles templates to Python, so an override may only
+contain plain ${name} expressions: no <% %> tags, no % control lines and
+no filters.
+
+A compiled template can render a whole batch in a tight loop
+(render_many). It can also render once with -name- tokens in place of the
+values (shared_html); SendGrid then fills that HTML in for each recipient
+from substitutions(values).
+
+USAGE:
+    template = get_template(db, tenant_id, EmailKind.reminder)
+    bodies = template.render_many([values, ...])
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from mako.exceptions import MakoException
+from mako.filters import html_escape
+from mako.template import Template
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.email_outbox import EmailKind
+from app.models.email_template import EmailTemplateOverride
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+# Per-recipient values a template can use
+VARIABLES = ("owner_first_name", "pet_name", "appointment_time", "duration_minutes")
+
+# Each value as the -name- token SendGrid substitutes
+_TOKENS = {name: f"-{name}-" for name in VARIABLES}
+
+_EXPRESSION_RE = re.compile(r"\$\{(.*?)\}", re.S)
+
+
+class EmailTemplateError(ValueError):
+    """Template source is invalid (bad syntax or a disallowed construct)"""
+
+
+class EmailTemplate:
+    """A compiled, autoescaping template for one kind of email"""
+
+    def __init__(self, source: str, name: str):
+        self.source = source
+        try:
+            self._template = Template(source, uri=name, default_filters=["h"], strict_undefined=True)
+            self.shared_html = self._template.render(**_TOKENS)
+        except (MakoException, NameError, SyntaxError) as e:
+            raise EmailTemplateError(f"{name}: {e}") from e
+
+    def render(self, values: Dict[str, str]) -> str:
+        return self._template.render(**values)
+
+    def render_many(self, batch: List[Dict[str, str]]) -> List[str]:
+        """Render one body per values dict"""
+        render = self._template.render
+        return [render(**values) for values in batch]
+
+
+def substitutions(values: Dict[str, str]) -> Dict[str, str]:
+    """SendGrid substitutions for shared_html, escaped like ${name} in the template"""
+    return {f"-{name}-": str(html_escape(value)) for name, value in values.items()}
+
+
+def validate_override(source: str) -> None:
+    """Raise EmailTemplateError unless `source` only uses plain ${name} expressions"""
+    if "<%" in source or "</%" in source or "%>" in source:
+        raise EmailTemplateError("Template tags (<% ... %>) are not allowed")
+    for line in source.splitlines():
+        stripped = line.lstrip()
+        if stripped.startswith("%") and not stripped.startswith("%%"):
+            raise EmailTemplateError("Control lines (starting with %) are not allowed")
+    for expression in _EXPRESSION_RE.findall(source):
+        if expression.strip() not in VARIABLES:
+            raise EmailTemplateError(
+                f"Unsupported expression ${{{expression}}}; use one of " + ", ".join(f"${{{name}}}" for name in VARIABLES)
+            )
+
+
+def compile_override(source: str, name: str) -> EmailTemplate:
+    validate_override(source)
+    return EmailTemplate(source, name)
+
+
+DEFAULT_TEMPLATES: Dict[EmailKind, EmailTemplate] = {
+    kind: EmailTemplate((TEMPLATE_DIR / f"{kind.value}.html").read_text(encoding="utf-8"), f"email/{kind.value}.html")
+    for kind in EmailKind
+}
+
+# (tenant_id, kind) -> the tenant's compiled override, or the default
+_templates = TTLCache(
+    "email_template",
+    ttl_seconds=settings.email_template_cache_ttl_seconds,
+    max_size=settings.email_template_cache_max_size,
+)
+
+
+def get_template(db: Session, tenant_id: int, kind: EmailKind) -> EmailTemplate:
+    """The tenant's template for `kind`; one query on a cache miss"""
+    key = (tenant_id, kind)
+    template = _templates.get(key)
+    if template is not None:
+        return template
+
+    source: Optional[str] = db.scalar(
+        select(EmailTemplateOverride.body).where(
+            EmailTemplateOverride.tenant_id == tenant_id,
+            EmailTemplateOverride.kind == kind,
+        )
+    )
+    template = DEFAULT_TEMPLATES[kind]
+    if source is not None:
+        try:
+            template = compile_override(source, f"tenant-{tenant_id}/{kind.value}")
+        except EmailTemplateError as e:
+            # Validated when saved; only reachable if the rules got stricter since
+            logger.error(f"Invalid email template override, using the default: {e}")
+    _templates.set(key, template)
+    return template
+
+
+def invalidate_template(tenant_id: int, kind: EmailKind) -> None:
+    _templates.invalidate((tenant_id, kind))
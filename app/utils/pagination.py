@@ -0,0 +1,61 @@
+"""
+Keyset (cursor) pagination helpers
+
+A cursor is the sort key of the last row on the previous page, encoded
+as an opaque URL-safe string. The next page is fetched with
+`WHERE (sort key) > (cursor values)`, which the DB answers straight from
+a composite index instead of scanning and discarding `skip` rows.
+
+List endpoints return the cursor for the next page in the X-Next-Cursor
+response header (absent on the last page).
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode sort-key values (ints, strings, datetimes) as an opaque cursor."""
+    payload = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor made by encode_cursor().
+    Raises ValueError if it is malformed or doesn't hold `size` values.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(payload, list) or len(payload) != size:
+        raise ValueError("Invalid cursor")
+
+    values = []
+    for value in payload:
+        if isinstance(value, dict):
+            try:
+                value = datetime.fromisoformat(value["dt"])
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError("Invalid cursor") from e
+        values.append(value)
+    return values
+
+
+def next_cursor(rows: Sequence[Any], limit: int, *attrs: str):
+    """Cursor after the last row, or None if this was the last page."""
+    if limit <= 0 or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(*(getattr(last, attr) for attr in attrs))
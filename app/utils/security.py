@@ -23,7 +23,11 @@ Create security functions for authentication
 from passlib.context import CryptContext
 
 # JWT token creation and verification
-from jose import JWTError, jwt
+from jose import jwk, jwt
+from jose.exceptions import JOSEError
+
+# Symmetric encryption for secrets at rest (installed with python-jose[cryptography])
+from cryptography.fernet import Fernet
 
 # Date/time handling for token expiration
 from datetime import datetime, timedelta, timezone
@@ -31,6 +35,17 @@ from datetime import datetime, timedelta, timezone
 # Type hints for better code quality
 from typing import Optional
 
+# Cache the verification key object
+from functools import lru_cache
+
+# Key derivation for secrets at rest
+import base64
+import hashlib
+
+# Run bcrypt off the event loop
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 # Our app configuration (SECRET_KEY, etc.)
 from app.config import settings
 
@@ -90,6 +105,52 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# ============================================================================
+# PART 1b: NON-BLOCKING PASSWORD HASHING (for async endpoints)
+# ============================================================================
+
+# bcrypt takes ~250 ms of CPU on purpose. Running it directly in an
+# `async def` endpoint blocks the event loop (and every other request on
+# this worker) for that long, so async code uses the *_async versions
+# below, which run on a small dedicated thread pool (bcrypt releases the GIL).
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="password-hash"
+)
+
+# Hashes running or waiting in the pool. Only touched from the event loop.
+_password_jobs_in_flight = 0
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many password hashes are already queued; maps to 429."""
+
+
+async def _run_password_job(func, *args):
+    global _password_jobs_in_flight
+
+    limit = settings.password_hash_workers + settings.password_hash_queue_limit
+    if _password_jobs_in_flight >= limit:
+        raise PasswordHashingBusy()
+
+    _password_jobs_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs_in_flight -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Awaitable hash_password(). Raises PasswordHashingBusy when overloaded."""
+    return await _run_password_job(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Awaitable verify_password(). Raises PasswordHashingBusy when overloaded."""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """    
      WHAT IS A JWT TOKEN?
@@ -129,6 +190,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+@lru_cache(maxsize=1)
+def _verification_key():
+    """
+    Build the jose key object once.
+    Passing a raw string to jwt.decode makes jose try to parse it as JSON
+    and construct a new key object on every call.
+    """
+    return jwk.construct(settings.secret_key, settings.algorithm)
+
+
+def create_access_token_for_user(user, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Create an access token carrying everything needed to authorize a request:
+    user id, tenant id, role flag and the user's current token_version.
+    Bumping User.token_version invalidates every token issued before.
+    """
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "user_id": user.id,
+            "tenant_id": user.tenant_id,
+            "is_superuser": bool(user.is_superuser),
+            "token_version": user.token_version or 0,
+        },
+        expires_delta=expires_delta
+    )
+
+
 def verify_token(token: str) -> Optional[TokenData]:
     """
      SECURITY CHECKS:
@@ -139,11 +228,11 @@ def verify_token(token: str) -> Optional[TokenData]:
     try:
         # Decode the JWT token
         # - token: the token string to decode
-        # - settings.secret_key: must match the key used to create it
+        # - _verification_key(): prebuilt key for settings.secret_key
         # - algorithms: only accept HS256 (prevents algorithm switching attacks)
         payload = jwt.decode(
             token,
-            settings.secret_key,
+            _verification_key(),
             algorithms=[settings.algorithm]
         )
         
@@ -157,10 +246,41 @@ def verify_token(token: str) -> Optional[TokenData]:
         
         # At this point, email is guaranteed to be str (not None)
         # Return TokenData with the email (TokenData.email is required, not Optional)
-        return TokenData(email=email)
+        # plus the identity claims added by create_access_token_for_user
+        return TokenData(
+            email=email,
+            user_id=payload.get("user_id"),
+            tenant_id=payload.get("tenant_id"),
+            is_superuser=bool(payload.get("is_superuser", False)),
+            token_version=payload.get("token_version"),
+        )
         
-    except JWTError:
+    except JOSEError:
         # Token is invalid (bad signature, expired, malformed, etc.)
+        # JOSEError also covers a key that can't be constructed
         return None
 
 
+
+
+# ============================================================================
+# PART 3: SECRETS AT REST (third-party tokens stored in the database)
+# ============================================================================
+
+@lru_cache(maxsize=1)
+def _fernet():
+    """
+    Fernet (AES + HMAC) keyed from SECRET_KEY.
+    Changing SECRET_KEY makes stored secrets unreadable (tenants reconnect).
+    """
+    key = hashlib.sha256(f"secrets-at-rest:{settings.secret_key}".encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+def encrypt_secret(plaintext: str) -> str:
+    return _fernet().encrypt(plaintext.encode()).decode()
+
+
+def decrypt_secret(ciphertext: str) -> str:
+    """Raises cryptography.fernet.InvalidToken if it wasn't encrypted with the current key"""
+    return _fernet().decrypt(ciphertext.encode()).decode()
@@ -0,0 +1,64 @@
+"""
+Shared test setup
+
+Every test run gets its own SQLite file: DATABASE_URL is pointed at it
+before anything from `app` is imported (Settings and the engines are
+created at import). Email and Google Calendar use their in-memory fakes.
+
+Fixtures:
+- `database`: fresh tables for one test
+- `client`: TestClient for the API (scheduler not started)
+- `auth_headers`: a tenant "clinic1", one active user logged in, and the
+  headers (Authorization, X-Tenant-ID) to call the API as them
+"""
+
+import os
+import tempfile
+
+_DATABASE_DIR = tempfile.mkdtemp(prefix="clinic-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DATABASE_DIR}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-that-is-at-least-32-characters")
+os.environ["EMAIL_TRANSPORT"] = "fake"
+os.environ["GOOGLE_CALENDAR_TRANSPORT"] = "fake"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.auth.dependencies import principal_cache
+from app.database import Base, SessionLocal, engine
+from app.middleware.tenant import tenant_cache
+from app.models.tenant import Tenant
+
+PASSWORD = "Passw0rdX"
+
+
+@pytest.fixture
+def database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    tenant_cache.clear()
+    principal_cache.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client(database):
+    # Not used as a context manager, so startup (the scheduler) doesn't run
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers(client):
+    with SessionLocal() as db:
+        db.add(Tenant(name="Clinic", subdomain="clinic1"))
+        db.commit()
+    headers = {"X-Tenant-ID": "clinic1"}
+    response = client.post("/auth/register", json={
+        "email": "vet@clinic1.example.com", "password": PASSWORD, "full_name": "Vet", "tenant_id": 1
+    })
+    assert response.status_code == 201, response.text
+    response = client.post("/auth/login", data={"username": "vet@clinic1.example.com", "password": PASSWORD})
+    headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return headers
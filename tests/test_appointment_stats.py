@@ -0,0 +1,137 @@
+"""
+Appointment Statistics Tests
+
+GET /appointments/stats computes every counter in one aggregate query
+(_count_where). These tests seed a SQLite database and check it returns
+exactly what the previous implementation (one query per counter) did.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import app.main  # noqa: F401  (maps every model, including the ones only the routers import)
+from app.api.appointments import AppointmentStats, get_appointment_statistics
+from app.auth.dependencies import Principal
+from app.database import Base
+from app.models.appointment import Appointment, AppointmentStatus
+from app.models.patient import Patient
+from app.models.tenant import Tenant
+
+APPOINTMENTS_PER_TENANT = 3000
+
+
+async def _previous_statistics(db: AsyncSession, tenant_id: int) -> AppointmentStats:
+    """The implementation _count_where replaced: one query per counter"""
+    now = datetime.now()
+    today_start = datetime(now.year, now.month, now.day, 0, 0, 0)
+    month_start = datetime(now.year, now.month, 1, 0, 0, 0)
+    week_start = today_start - timedelta(days=now.weekday())
+
+    base_query = select(func.count(Appointment.id)).where(Appointment.tenant_id == tenant_id)
+
+    total_appointments = await db.scalar(base_query)
+    scheduled_count = await db.scalar(base_query.where(Appointment.status == AppointmentStatus.scheduled))
+    completed_count = await db.scalar(base_query.where(Appointment.status == AppointmentStatus.completed))
+    cancelled_count = await db.scalar(base_query.where(Appointment.status == AppointmentStatus.cancelled))
+    no_show_count = await db.scalar(base_query.where(Appointment.status == AppointmentStatus.no_show))
+
+    total_attended = completed_count + no_show_count
+    no_show_rate = (no_show_count / total_attended * 100) if total_attended > 0 else 0.0
+
+    avg_duration = await db.scalar(select(func.avg(Appointment.duration_minutes)).where(
+        Appointment.tenant_id == tenant_id
+    ))
+    average_duration_minutes = float(avg_duration) if avg_duration else None
+
+    appointments_this_month = await db.scalar(base_query.where(Appointment.appointment_time >= month_start))
+    appointments_this_week = await db.scalar(base_query.where(Appointment.appointment_time >= week_start))
+    upcoming_appointments = await db.scalar(base_query.where(
+        Appointment.status == AppointmentStatus.scheduled,
+        Appointment.appointment_time > now
+    ))
+
+    return AppointmentStats(
+        total_appointments=total_appointments,
+        scheduled_count=scheduled_count,
+        completed_count=completed_count,
+        cancelled_count=cancelled_count,
+        no_show_count=no_show_count,
+        no_show_rate=round(no_show_rate, 2),
+        average_duration_minutes=average_duration_minutes,
+        appointments_this_month=appointments_this_month,
+        appointments_this_week=appointments_this_week,
+        upcoming_appointments=upcoming_appointments
+    )
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    """
+    SQLite file with two tenants of random appointments (statuses, durations,
+    times from 60 days ago to 60 days ahead) and a third with none
+    """
+    path = tmp_path / "stats.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(20261017)
+    now = datetime.now().replace(second=0, microsecond=0)
+    with engine.begin() as connection:
+        connection.execute(Tenant.__table__.insert(), [
+            dict(id=tenant_id, name=f"Clinic {tenant_id}", subdomain=f"clinic{tenant_id}")
+            for tenant_id in (1, 2, 3)
+        ])
+        connection.execute(Patient.__table__.insert(), [
+            dict(id=tenant_id, tenant_id=tenant_id, pet_name="Rex", species="dog",
+                 owner_first_name="Jo", owner_last_name="Doe")
+            for tenant_id in (1, 2)
+        ])
+        # Distinct minutes: (tenant_id, patient_id, appointment_time) is unique
+        connection.execute(Appointment.__table__.insert(), [
+            dict(
+                tenant_id=tenant_id,
+                patient_id=tenant_id,
+                appointment_time=now + timedelta(minutes=offset),
+                duration_minutes=rng.choice([None, 15, 30, 45, 60, 90]),
+                status=rng.choice(list(AppointmentStatus)),
+            )
+            for tenant_id in (1, 2)
+            for offset in rng.sample(range(-60 * 24 * 60, 60 * 24 * 60), APPOINTMENTS_PER_TENANT)
+        ])
+    engine.dispose()
+    return path
+
+
+@pytest.mark.asyncio
+async def test_statistics_match_previous_implementation(database_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    try:
+        async with AsyncSession(engine) as db:
+            for tenant_id in (1, 2, 3):
+                principal = Principal(
+                    id=tenant_id, email=f"vet@clinic{tenant_id}.test", tenant_id=tenant_id,
+                    is_active=True, is_superuser=False
+                )
+
+                statements.clear()
+                expected = await _previous_statistics(db, tenant_id)
+                assert len(statements) == 9
+
+                statements.clear()
+                actual = await get_appointment_statistics(db=db, current_user=principal)
+                assert len(statements) == 1
+
+                assert actual == expected
+                if tenant_id == 3:
+                    assert actual.total_appointments == 0
+                    assert actual.average_duration_minutes is None
+                else:
+                    assert actual.total_appointments == APPOINTMENTS_PER_TENANT
+    finally:
+        await engine.dispose()
@@ -0,0 +1,36 @@
+"""
+Appointments API Tests
+"""
+
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.models.appointment import Appointment
+from app.models.email_outbox import EmailKind, EmailOutbox
+
+
+def test_create_appointment_queues_one_confirmation(client, auth_headers):
+    response = client.post("/patients/", headers=auth_headers, json={
+        "pet_name": "Rex", "species": "dog", "owner_first_name": "Jo", "owner_last_name": "Doe",
+        "owner_email": "jo@example.com",
+    })
+    assert response.status_code == 201, response.text
+    patient_id = response.json()["id"]
+    start = (datetime.now() + timedelta(days=7)).replace(hour=10, minute=0, second=0, microsecond=0)
+
+    response = client.post("/appointments/", headers=auth_headers, json={
+        "patient_id": patient_id, "appointment_time": start.isoformat(), "duration_minutes": 30
+    })
+    assert response.status_code == 201, response.text
+    assert response.json()["patient_id"] == patient_id
+
+    # Overlaps the first one: rejected, and nothing is announced
+    response = client.post("/appointments/", headers=auth_headers, json={
+        "patient_id": patient_id, "appointment_time": (start + timedelta(minutes=15)).isoformat()
+    })
+    assert response.status_code == 400, response.text
+
+    with SessionLocal() as db:
+        assert db.query(Appointment).count() == 1
+        email = db.query(EmailOutbox).one()
+        assert (email.kind, email.recipient) == (EmailKind.confirmation, "jo@example.com")
@@ -0,0 +1,67 @@
+"""
+Dashboard Statistics Tests
+
+GET /stats/dashboard reads tenant_daily_stats: each tenant's all-time
+totals row plus its day rows from this month on. The rows are kept
+current by mapper listeners and rebuilt nightly; both must agree.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models.appointment import Appointment, AppointmentStatus
+from app.models.patient import Patient
+from app.models.tenant_daily_stats import TOTALS_DAY, TenantDailyStats, rebuild_tenant_daily_stats
+
+
+def _rows(db):
+    db.expire_all()
+    return sorted(
+        (row.tenant_id, row.day, row.scheduled_count, row.completed_count, row.cancelled_count,
+         row.no_show_count, row.completed_duration_minutes, row.new_patients)
+        for row in db.scalars(select(TenantDailyStats))
+        if any((row.scheduled_count, row.completed_count, row.cancelled_count, row.no_show_count, row.new_patients))
+    )
+
+
+def test_dashboard_counts_all_time_patients_from_the_totals_row(client, auth_headers):
+    now = datetime.now()
+    with SessionLocal() as db:
+        patients = [
+            Patient(tenant_id=1, pet_name=f"Pet {age}", species="dog", owner_first_name="Jo",
+                    owner_last_name="Doe", created_at=now - timedelta(days=age))
+            for age in (0, 400, 800)
+        ]
+        db.add_all(patients)
+        db.flush()
+        db.add_all([
+            Appointment(tenant_id=1, patient_id=patients[1].id, appointment_time=now - timedelta(days=500),
+                        status=AppointmentStatus.completed),
+            Appointment(tenant_id=1, patient_id=patients[1].id, appointment_time=now + timedelta(days=3)),
+        ])
+        db.commit()
+
+        # An appointment moved to another day, and a patient deleted
+        moved = db.scalars(select(Appointment).where(Appointment.status == AppointmentStatus.completed)).one()
+        moved.appointment_time = now - timedelta(days=600)
+        db.delete(patients[2])
+        db.commit()
+
+        totals = db.scalars(select(TenantDailyStats).where(TenantDailyStats.day == TOTALS_DAY)).one()
+        assert (totals.new_patients, totals.completed_count, totals.scheduled_count) == (2, 1, 1)
+
+        # The nightly rebuild arrives at the same rows
+        maintained = _rows(db)
+        rebuild_tenant_daily_stats(db)
+        db.commit()
+        assert _rows(db) == maintained
+
+    response = client.get("/stats/dashboard", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    stats = response.json()
+    assert stats["total_patients"] == 2
+    assert stats["patients_this_month"] == 1
+    assert stats["pending_appointments"] == 1
+    assert stats["revenue_this_month"] == 0
@@ -0,0 +1,104 @@
+"""
+Email Outbox Delivery Tests
+
+deliver_pending() against the in-memory FakeTransport: retries with
+backoff, dead-lettering, and permanent failures.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.email_outbox import EmailKind, EmailOutbox, OutboxStatus
+from app.models.tenant import Tenant
+from app.services.email_outbox import deliver_pending, retry_delay
+from app.utils.email_service import FakeTransport
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def db(database):
+    with SessionLocal() as session:
+        session.add(Tenant(id=1, name="Clinic", subdomain="clinic1"))
+        session.add_all([
+            EmailOutbox(tenant_id=1, kind=EmailKind.reminder, recipient=recipient,
+                        subject="Reminder", html_body="<p>See you tomorrow</p>")
+            for recipient in ("ok@example.com", "bad@example.com")
+        ])
+        session.commit()
+        yield session
+
+
+def _outbox(db, recipient: str) -> EmailOutbox:
+    db.expire_all()
+    return db.query(EmailOutbox).filter_by(recipient=recipient).one()
+
+
+def _make_due(db) -> None:
+    db.execute(update(EmailOutbox).values(next_attempt_at=_utcnow() - timedelta(seconds=1)))
+    db.commit()
+
+
+def test_retry_delay_backs_off_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(settings, "email_retry_base_seconds", 30)
+    monkeypatch.setattr(settings, "email_retry_max_seconds", 3600)
+    for attempts, seconds in ((1, 30), (2, 60), (4, 240), (20, 3600)):
+        delay = retry_delay(attempts).total_seconds()
+        # +-20% jitter
+        assert seconds * 0.8 <= delay <= seconds * 1.2
+
+
+def test_failed_sends_are_retried_then_dead_lettered(db, monkeypatch):
+    monkeypatch.setattr(settings, "email_max_attempts", 3)
+    transport = FakeTransport()
+    transport.fail_for.add("bad@example.com")
+
+    assert deliver_pending(db, transport) == {"sent": 1, "retry": 1, "dead": 0}
+    assert [message["recipient"] for message in transport.sent] == ["ok@example.com"]
+    assert _outbox(db, "ok@example.com").status == OutboxStatus.sent
+    failed = _outbox(db, "bad@example.com")
+    assert (failed.status, failed.attempts) == (OutboxStatus.pending, 1)
+    assert "rejected" in failed.last_error
+    assert failed.next_attempt_at > _utcnow() + timedelta(seconds=settings.email_retry_base_seconds * 0.7)
+
+    # Not due yet
+    assert deliver_pending(db, transport) == {"sent": 0, "retry": 0, "dead": 0}
+
+    _make_due(db)
+    assert deliver_pending(db, transport) == {"sent": 0, "retry": 1, "dead": 0}
+    _make_due(db)
+    assert deliver_pending(db, transport) == {"sent": 0, "retry": 0, "dead": 1}
+    failed = _outbox(db, "bad@example.com")
+    assert (failed.status, failed.attempts) == (OutboxStatus.dead, 3)
+
+    # Dead letters stay put
+    _make_due(db)
+    assert deliver_pending(db, transport) == {"sent": 0, "retry": 0, "dead": 0}
+    assert transport.requests == 4
+
+
+def test_retry_succeeds_once_the_transport_recovers(db):
+    transport = FakeTransport()
+    transport.fail_for.add("bad@example.com")
+    deliver_pending(db, transport)
+
+    transport.fail_for.clear()
+    _make_due(db)
+    assert deliver_pending(db, transport) == {"sent": 1, "retry": 0, "dead": 0}
+    delivered = _outbox(db, "bad@example.com")
+    assert (delivered.status, delivered.attempts, delivered.last_error) == (OutboxStatus.sent, 2, None)
+
+
+def test_permanent_failures_are_dead_lettered_straight_away(db):
+    transport = FakeTransport()
+    transport.fail_for.add("bad@example.com")
+    transport.permanent_failures = True
+
+    assert deliver_pending(db, transport) == {"sent": 1, "retry": 0, "dead": 1}
+    assert _outbox(db, "bad@example.com").status == OutboxStatus.dead
@@ -0,0 +1,120 @@
+"""
+Recurrence Engine and Generation Tests
+
+occurrences() expands a template's rule (app/services/recurrence.py);
+generate_appointments() materialises it up to the horizon, skipping
+slots that are already booked (app/services/recurring_generation.py).
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models.appointment import Appointment, AppointmentStatus
+from app.models.patient import Patient
+from app.models.recurring_appointment import RecurrencePattern, RecurringAppointment
+from app.models.tenant import Tenant
+from app.services.recurrence import occurrences
+from app.services.recurring_generation import HORIZON_DAYS, generate_appointments
+
+# A Monday, before the clinic opens
+NOW = datetime(2027, 1, 4, 8, 0)
+
+
+def _template(**fields) -> RecurringAppointment:
+    defaults = dict(pattern=RecurrencePattern.daily, interval=1, start_date=NOW, time_of_day="10:00")
+    return RecurringAppointment(**{**defaults, **fields})
+
+
+def _days(template, end=datetime(2028, 1, 1)):
+    return [start.date() for start in occurrences(template, NOW, end)]
+
+
+def test_last_day_of_the_month():
+    template = _template(pattern=RecurrencePattern.monthly, by_month_day=[-1])
+    assert _days(template)[:4] == [date(2027, 1, 31), date(2027, 2, 28), date(2027, 3, 31), date(2027, 4, 30)]
+
+
+def test_monthly_on_the_31st_skips_shorter_months():
+    template = _template(pattern=RecurrencePattern.monthly, start_date=datetime(2027, 1, 31))
+    assert _days(template)[:3] == [date(2027, 1, 31), date(2027, 3, 31), date(2027, 5, 31)]
+
+
+def test_last_and_first_weekday_of_the_month():
+    template = _template(pattern=RecurrencePattern.monthly, by_weekday=["-1FR"])
+    assert _days(template)[:3] == [date(2027, 1, 29), date(2027, 2, 26), date(2027, 3, 26)]
+
+    template = _template(pattern=RecurrencePattern.monthly, by_weekday=["1MO"], interval=2)
+    assert _days(template)[:3] == [date(2027, 1, 4), date(2027, 3, 1), date(2027, 5, 3)]
+
+
+def test_exception_dates_and_end_date():
+    template = _template(
+        pattern=RecurrencePattern.weekly, by_weekday=["MO", "TH"],
+        exception_dates=["2027-01-07", date(2027, 1, 11)], end_date=datetime(2027, 1, 18, 10, 0),
+    )
+    assert _days(template) == [date(2027, 1, 4), date(2027, 1, 14), date(2027, 1, 18)]
+    assert all(start.hour == 10 for start in occurrences(template, NOW, datetime(2028, 1, 1)))
+
+
+@pytest.fixture
+def db(database):
+    with SessionLocal() as session:
+        session.add(Tenant(id=1, name="Clinic", subdomain="clinic1"))
+        session.add_all([
+            Patient(id=patient_id, tenant_id=1, pet_name=name, species="dog",
+                    owner_first_name="Jo", owner_last_name="Doe")
+            for patient_id, name in ((1, "Rex"), (2, "Fido"))
+        ])
+        session.commit()
+        yield session
+
+
+def _booked(db, recurring):
+    return db.scalars(select(Appointment.appointment_time).where(
+        Appointment.recurring_appointment_id == recurring.id
+    ).order_by(Appointment.appointment_time)).all()
+
+
+def test_generation_stops_at_the_horizon_and_is_idempotent(db):
+    recurring = _template(tenant_id=1, patient_id=1)
+    db.add(recurring)
+    db.commit()
+
+    assert generate_appointments(db, recurring, now=NOW) == HORIZON_DAYS
+    db.commit()
+    booked = _booked(db, recurring)
+    assert booked[0] == datetime(2027, 1, 4, 10, 0)
+    assert booked[-1] == datetime(2027, 1, 4, 10, 0) + timedelta(days=HORIZON_DAYS - 1)
+    assert recurring.generated_until == NOW + timedelta(days=HORIZON_DAYS)
+
+    # Nothing new until the horizon moves
+    assert generate_appointments(db, recurring, now=NOW) == 0
+    assert generate_appointments(db, recurring, now=NOW + timedelta(days=1)) == 1
+    db.commit()
+    assert len(_booked(db, recurring)) == HORIZON_DAYS + 1
+
+
+def test_generation_skips_booked_slots(db):
+    db.add_all([
+        # The patient already has this slot (booked directly)
+        Appointment(tenant_id=1, patient_id=1, appointment_time=datetime(2027, 1, 5, 10, 0)),
+        # ...and cancelled this one themselves: not recreated
+        Appointment(tenant_id=1, patient_id=1, appointment_time=datetime(2027, 1, 6, 10, 0),
+                    status=AppointmentStatus.cancelled),
+        # Another patient's booking runs into this one
+        Appointment(tenant_id=1, patient_id=2, appointment_time=datetime(2027, 1, 7, 9, 0),
+                    duration_minutes=90),
+        # Another patient's cancelled booking doesn't block anything
+        Appointment(tenant_id=1, patient_id=2, appointment_time=datetime(2027, 1, 8, 10, 0),
+                    status=AppointmentStatus.cancelled),
+    ])
+    recurring = _template(tenant_id=1, patient_id=1)
+    db.add(recurring)
+    db.commit()
+
+    assert generate_appointments(db, recurring, now=NOW, days_ahead=5) == 2
+    db.commit()
+    assert _booked(db, recurring) == [datetime(2027, 1, 4, 10, 0), datetime(2027, 1, 8, 10, 0)]
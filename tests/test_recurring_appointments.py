@@ -0,0 +1,78 @@
+"""
+Recurring Appointments API Tests
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.database import SessionLocal
+from app.models.appointment import Appointment, AppointmentStatus, MAX_DURATION_MINUTES
+
+
+@pytest.fixture
+def template(client, auth_headers):
+    """A weekly Monday 10:00 template for a new patient; returns its JSON"""
+    response = client.post("/patients/", headers=auth_headers, json={
+        "pet_name": "Rex", "species": "dog", "owner_first_name": "Jo", "owner_last_name": "Doe"
+    })
+    assert response.status_code == 201, response.text
+    start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(microsecond=0)
+    response = client.post("/recurring-appointments/", headers=auth_headers, json={
+        "patient_id": response.json()["id"], "pattern": "weekly", "start_date": start.isoformat(),
+        "time_of_day": "10:00", "by_weekday": ["MO"],
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+@pytest.mark.parametrize("body", [
+    {"duration_minutes": MAX_DURATION_MINUTES + 1},
+    {"duration_minutes": 0},
+    {"interval": 0},
+    {"time_of_day": "25:00"},
+    {"pattern": None},
+    {"by_weekday": ["1MO"]},
+])
+def test_update_rejects_what_create_rejects(client, auth_headers, template, body):
+    response = client.patch(f"/recurring-appointments/{template['id']}", headers=auth_headers, json=body)
+    assert response.status_code == 422, response.text
+
+    response = client.get(f"/recurring-appointments/{template['id']}", headers=auth_headers)
+    assert response.json()["duration_minutes"] == 30
+    assert response.json()["by_weekday"] == ["MO"]
+
+
+def test_update_checks_ordinals_against_the_stored_pattern(client, auth_headers, template):
+    response = client.patch(f"/recurring-appointments/{template['id']}", headers=auth_headers, json={
+        "pattern": "monthly", "by_weekday": ["-1FR"]
+    })
+    assert response.status_code == 200, response.text
+
+    # Weekly with the stored "-1FR" is meaningless
+    response = client.patch(f"/recurring-appointments/{template['id']}", headers=auth_headers, json={
+        "pattern": "weekly"
+    })
+    assert response.status_code == 422, response.text
+    with SessionLocal() as db:
+        assert db.query(Appointment).count() == 0
+
+
+def test_resending_unchanged_rule_is_not_a_rule_change(client, auth_headers, template):
+    with SessionLocal() as db:
+        db.add(Appointment(
+            tenant_id=1, patient_id=template["patient_id"], recurring_appointment_id=template["id"],
+            appointment_time=datetime.now() + timedelta(days=7), duration_minutes=30
+        ))
+        db.commit()
+
+    # Same instant, spelt with a different offset
+    start = datetime.fromisoformat(template["start_date"]).replace(tzinfo=timezone.utc)
+    response = client.patch(f"/recurring-appointments/{template['id']}", headers=auth_headers, json={
+        "start_date": start.astimezone(timezone(timedelta(hours=2))).isoformat(),
+        "time_of_day": template["time_of_day"],
+        "notes": "Bring the vaccination card",
+    })
+    assert response.status_code == 200, response.text
+    with SessionLocal() as db:
+        assert db.query(Appointment).one().status == AppointmentStatus.scheduled
@@ -0,0 +1,106 @@
+"""
+Scheduler Leader Lease Tests
+
+Two processes share one database: only the lease holder runs the
+periodic jobs, and the other takes over once the lease expires.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.models.scheduler_lease import SchedulerLease, release_lease, try_acquire_lease
+from app.services import scheduler_service
+
+TTL = 30
+NOW = datetime(2027, 1, 4, 8, 0)
+
+
+@pytest.fixture
+def db(database):
+    with SessionLocal() as session:
+        yield session
+
+
+def test_lease_has_one_holder_until_it_expires(db):
+    assert try_acquire_lease(db, "leader", "a", TTL, now=NOW)
+    assert not try_acquire_lease(db, "leader", "b", TTL, now=NOW + timedelta(seconds=1))
+
+    # Renewal extends it, and keeps acquired_at
+    assert try_acquire_lease(db, "leader", "a", TTL, now=NOW + timedelta(seconds=20))
+    lease = db.get(SchedulerLease, "leader")
+    assert (lease.acquired_at, lease.expires_at) == (NOW, NOW + timedelta(seconds=20 + TTL))
+    assert not try_acquire_lease(db, "leader", "b", TTL, now=NOW + timedelta(seconds=40))
+
+    # Expired: b takes over, a can't get it back
+    assert try_acquire_lease(db, "leader", "b", TTL, now=NOW + timedelta(seconds=50))
+    assert not try_acquire_lease(db, "leader", "a", TTL, now=NOW + timedelta(seconds=51))
+    db.expire_all()
+    assert (lease.holder, lease.acquired_at) == ("b", NOW + timedelta(seconds=50))
+
+
+def test_released_lease_can_be_taken_straight_away(db):
+    assert try_acquire_lease(db, "leader", "a", TTL, now=NOW)
+    release_lease(db, "leader", "b")  # not b's to release
+    assert not try_acquire_lease(db, "leader", "b", TTL, now=NOW)
+    release_lease(db, "leader", "a")
+    assert try_acquire_lease(db, "leader", "b", TTL, now=NOW)
+
+
+class _Process:
+    """One scheduler process: its INSTANCE_ID and leadership state"""
+
+    def __init__(self, monkeypatch, instance_id: str):
+        self.monkeypatch = monkeypatch
+        self.instance_id = instance_id
+        self.leader_until = 0.0
+
+    def run(self, func):
+        """Run func as this process would"""
+        self.monkeypatch.setattr(scheduler_service, "INSTANCE_ID", self.instance_id)
+        self.monkeypatch.setattr(scheduler_service, "_leader_until", self.leader_until)
+        try:
+            return func()
+        finally:
+            self.leader_until = scheduler_service._leader_until
+
+
+def test_only_the_leader_runs_periodic_jobs(database, monkeypatch):
+    monkeypatch.setattr(scheduler_service.settings, "scheduler_lease_ttl_seconds", TTL)
+    first, second = _Process(monkeypatch, "host:1:first"), _Process(monkeypatch, "host:2:second")
+    runs = []
+
+    @scheduler_service._instrumented("test_job")
+    def job():
+        runs.append(scheduler_service.INSTANCE_ID)
+
+    @scheduler_service._instrumented("test_one_off", leader_only=False)
+    def one_off():
+        runs.append(scheduler_service.INSTANCE_ID)
+
+    for process in (first, second):
+        process.run(scheduler_service.renew_leadership)
+    assert first.run(scheduler_service.is_leader)
+    assert not second.run(scheduler_service.is_leader)
+
+    for process in (first, second):
+        process.run(job)
+    assert runs == ["host:1:first"]
+
+    # Renewals keep the leader; one-off jobs run wherever they were queued
+    for process in (second, first, second):
+        process.run(scheduler_service.renew_leadership)
+    second.run(job)
+    second.run(one_off)
+    assert runs == ["host:1:first", "host:2:second"]
+
+    # The leader crashes; the other takes over once its lease expires
+    second.run(scheduler_service.renew_leadership)
+    assert not second.run(scheduler_service.is_leader)
+    with SessionLocal() as db:
+        db.query(SchedulerLease).update({SchedulerLease.expires_at: datetime(2000, 1, 1)})
+        db.commit()
+    second.run(scheduler_service.renew_leadership)
+    second.run(job)
+    assert runs == ["host:1:first", "host:2:second", "host:2:second"]